@@ -1,7 +1,18 @@
 
 import os
 import re
+import shutil
+import tempfile
+import json
+import base64
+import hashlib
+import threading
+import time
+import operator
 import unicodedata
+import click
+from contextlib import contextmanager
+from itertools import islice
 from functools import wraps
 from datetime import datetime, date
 from flask import (
@@ -15,16 +26,47 @@ from flask import (
     send_file,
     session,
     abort,
+    stream_with_context,
 )
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin, current_user
-from sqlalchemy import create_engine, select, text, func
+from sqlalchemy import select, text, func, or_, and_, update, insert, delete, tuple_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.orm import sessionmaker, scoped_session
 from jinja2 import TemplateNotFound
-from models import Base, Partner, Brand, Store, Connection, ReportEntry, ReceiptImage, User
+from werkzeug.datastructures import FileStorage
+from models import Base, Partner, Brand, Store, Connection, ReportEntry, ReceiptImage, User, DataVersion, ImportDigest
+from export_cache import ExportCache
 from export_utils import ExportManager
-import pandas as pd
+from report_export import EXPORT_COLUMNS, ReportRenderPool, export_report, report_export_query
+import numpy as np
+from import_utils import TabularFileError, file_digest, read_tabular_file
+from jobs import JobError, JobRunner, serialize_job
+from report_ingest import (
+    ReportIngestError,
+    check_decimal,
+    detect_format,
+    ingest_report_entries,
+    read_report_records,
+)
+from reporting import (
+    aggregate_report_entries,
+    apply_rollup,
+    can_use_rollup,
+    parse_group_by,
+    rebuild_rollup,
+    rollup_needs_backfill,
+)
+from config.settings import (
+    AUTH_CACHE_TTL,
+    EXPORT_JOB_WORKERS,
+    EXPORT_JOBS_PER_USER,
+    JOB_WORKERS,
+    PDF_WORKERS,
+    STORAGE_PROFILE,
+)
+from storage import create_storage_engine
 
 BASE_DIR = os.path.dirname(__file__)
 DB_PATH = os.path.join(BASE_DIR, "disagua.db")
@@ -32,11 +74,15 @@ UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 FRONTEND_DIST_DIR = os.path.join(BASE_DIR, "frontend", "dist")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Tables whose writes are tracked in ``data_versions`` (see ``bump_data_version``).
+VERSIONED_TABLES = ("partners", "brands", "stores", "connections", "receipt_images", "report_entries")
+
 def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["JSON_AS_ASCII"] = False
     app.config["JSON_SORT_KEYS"] = False
     app.config["UPLOAD_FOLDER"] = UPLOAD_DIR
+    app.config["AUTH_CACHE_TTL"] = AUTH_CACHE_TTL
 
     default_frontend_origins = {
         "http://localhost:5173",
@@ -96,7 +142,7 @@ def create_app():
                 return abort(404)
             return send_from_directory(FRONTEND_DIST_DIR, "favicon.svg")
 
-    engine = create_engine(f"sqlite:///{DB_PATH}", future=True)
+    engine = create_storage_engine(DB_PATH, STORAGE_PROFILE)
     Base.metadata.create_all(engine)
 
     def ensure_schema(conn_engine):
@@ -110,10 +156,45 @@ def create_app():
             ensure_column("partners", "banco", "VARCHAR")
             ensure_column("partners", "agencia_conta", "VARCHAR")
             ensure_column("partners", "pix", "VARCHAR")
+            ensure_column("partners", "content_hash", "VARCHAR")
+            ensure_column("stores", "content_hash", "VARCHAR")
+
+            # ``create_all`` only builds indexes together with new tables, so
+            # databases created before an index was declared get it here.
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+            for table_name in VERSIONED_TABLES:
+                conn.execute(
+                    text("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (:name, 0)"),
+                    {"name": table_name},
+                )
 
     ensure_schema(engine)
     Session = scoped_session(sessionmaker(bind=engine, autoflush=False, future=True))
 
+    with Session() as s:
+        if rollup_needs_backfill(s):
+            rebuild_rollup(s)
+            s.commit()
+
+    # Import jobs run on their own pool; bookkeeping uses plain sessions so it
+    # never commits the scoped session a job is working with.
+    job_runner = JobRunner(sessionmaker(bind=engine, future=True), JOB_WORKERS)
+    # Export jobs get a pool of their own, so long exports never hold up
+    # imports. Their leftovers are flagged first, with their own message.
+    export_job_runner = JobRunner(sessionmaker(bind=engine, future=True), EXPORT_JOB_WORKERS)
+    export_job_runner.mark_interrupted(
+        kinds=("report_export",),
+        message="Exportação interrompida pela reinicialização do servidor. Solicite-a novamente.",
+    )
+    job_runner.mark_interrupted()
+    app.extensions["job_runner"] = job_runner
+    app.extensions["export_job_runner"] = export_job_runner
+    report_renderer = ReportRenderPool(DB_PATH, STORAGE_PROFILE, PDF_WORKERS)
+    app.extensions["report_renderer"] = report_renderer
+
     def normalize_decimal_input(value):
         if value is None:
             return value
@@ -135,6 +216,93 @@ def create_app():
             value = str(value)
         return re.sub(r"\D", "", value)
 
+    # Column-wise counterparts of the helpers above, used to validate import
+    # rows one chunk at a time. A column is the list of one field's stripped
+    # values; numbers are coerced with a single numpy cast (see
+    # ``convert_column``).
+    non_digit_pattern = re.compile(r"\D")
+    plain_decimal_pattern = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+    plain_integer_pattern = re.compile(r"[+-]?[0-9]{1,18}")
+
+    def normalize_decimal_column(column):
+        return [normalize_decimal_input(value) for value in column]
+
+    def digits_column(column):
+        return [non_digit_pattern.sub("", value) for value in column]
+
+    def column_values(rows, fields):
+        """Return the stripped values of each of ``fields``, one list per field.
+
+        Every row must carry all of ``fields``.
+        """
+        if len(fields) == 1:
+            raw_columns = [map(operator.itemgetter(fields[0]), rows)]
+        else:
+            raw_columns = zip(*map(operator.itemgetter(*fields), rows))
+        return [list(map(str.strip, raw_column)) for raw_column in raw_columns]
+
+    def blank_to_none(column):
+        return [value or None for value in column]
+
+    def is_none(values):
+        return np.equal(np.array(values, dtype=object), None)
+
+    def convert_column(column, pattern, convert):
+        """Apply ``convert`` (``float`` or ``int``) to the non-empty values.
+
+        Returns ``(values, invalid)``: an object array with the converted
+        values (``None`` where the value is empty or rejected) and a boolean
+        mask of the rejected ones. The numpy cast follows ``convert`` itself,
+        so a column is cast in one go; when that fails, the plain numbers
+        matching ``pattern`` are still cast together and only the remaining
+        values are converted one by one to find the rejected ones.
+        """
+        size = len(column)
+        values = np.full(size, None, dtype=object)
+        invalid = np.zeros(size, dtype=bool)
+        strings = np.array(column, dtype=object)
+        filled = strings != ""
+        dtype = np.float64 if convert is float else np.int64
+        try:
+            values[filled] = strings[filled].astype(dtype).tolist()
+            return values, invalid
+        except (ValueError, OverflowError):
+            pass
+        plain = filled & np.fromiter(map(bool, map(pattern.fullmatch, column)), dtype=bool, count=size)
+        values[plain] = strings[plain].astype(dtype).tolist()
+        for position in np.flatnonzero(filled & ~plain):
+            try:
+                values[position] = convert(column[position])
+            except ValueError:
+                invalid[position] = True
+        return values, invalid
+
+    def first_errors(size, checks):
+        """Return the message of the first failing check of every row.
+
+        ``checks`` is an ordered list of ``(mask, message)``; ``message`` is a
+        string or an array holding one message per row.
+        """
+        messages = np.full(size, None, dtype=object)
+        for mask, message in reversed(checks):
+            messages[mask] = message if isinstance(message, str) else message[mask]
+        return messages.tolist()
+
+    def missing_messages(columns, size, required_fields, prefix):
+        """Column-wise ``normalize_required``: ``(mask, messages)`` of the rows
+        missing a required field. ``columns`` maps fields to value lists, with
+        ``None`` for empty values; absent fields are missing on every row."""
+        missing = {
+            field: is_none(columns[field]) if field in columns else np.ones(size, dtype=bool)
+            for field in required_fields
+        }
+        any_missing = np.logical_or.reduce(list(missing.values()))
+        messages = np.full(size, None, dtype=object)
+        for position in np.flatnonzero(any_missing):
+            fields = sorted(field for field, mask in missing.items() if mask[position])
+            messages[position] = prefix + ", ".join(fields)
+        return any_missing, messages
+
     def normalize_header_name(value):
         normalized = unicodedata.normalize("NFKD", str(value or ""))
         normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
@@ -142,48 +310,6 @@ def create_app():
         normalized = re.sub(r"[^a-z0-9]+", "_", normalized)
         return normalized.strip("_")
 
-    def load_tabular_file(upload_file):
-        filename = (upload_file.filename or "").lower()
-        if not filename:
-            raise ValueError("Selecione um arquivo válido para importar.")
-
-        upload_file.stream.seek(0)
-        try:
-            if filename.endswith((".xlsx", ".xls")):
-                frame = pd.read_excel(upload_file, dtype=str, keep_default_na=False)
-            else:
-                frame = pd.read_csv(
-                    upload_file,
-                    dtype=str,
-                    keep_default_na=False,
-                    sep=None,
-                    engine="python",
-                )
-        except Exception as exc:  # pragma: no cover - leitura de arquivo depende da entrada
-            raise ValueError("Não foi possível ler o arquivo. Use um CSV ou Excel válido.") from exc
-        finally:
-            upload_file.stream.seek(0)
-
-        frame = frame.fillna("")
-        columns = [str(col).strip() for col in frame.columns if str(col).strip()]
-        records = []
-        for raw in frame.to_dict(orient="records"):
-            normalized_row = {}
-            for key, raw_value in raw.items():
-                header = str(key).strip()
-                if not header:
-                    continue
-                if isinstance(raw_value, str):
-                    value = raw_value.strip()
-                elif raw_value is None:
-                    value = ""
-                else:
-                    value = str(raw_value).strip()
-                normalized_row[header] = value
-            if normalized_row:
-                records.append(normalized_row)
-        return columns, records
-
     partner_fields = {
         "cidade", "estado", "parceiro", "distribuidora", "cnpj_cpf", "telefone", "email",
         "dia_pagamento", "banco", "agencia_conta", "pix",
@@ -300,14 +426,32 @@ def create_app():
             "created_at": record.created_at.isoformat() if record.created_at else None,
         }
 
-    def serialize_brand(record):
+    partner_sort_columns = {
+        "id": Partner.id,
+        "parceiro": Partner.parceiro,
+        "cidade": Partner.cidade,
+        "estado": Partner.estado,
+        "cnpj_cpf": Partner.cnpj_cpf,
+    }
+
+    def serialize_brand(record, store_count, store_value_total):
         return {
             "id": record.id,
             "marca": record.marca,
             "cod_disagua": record.cod_disagua,
-            "store_count": len(record.stores),
+            "store_count": store_count,
+            "store_value_total": float(store_value_total or 0),
         }
 
+    store_value_sum = func.sum(
+        Store.valor_20l + Store.valor_10l + Store.valor_1500ml + Store.valor_cx_copo + Store.valor_vasilhame
+    )
+
+    def brand_store_totals(s, brand_id):
+        return s.execute(
+            select(func.count(Store.id), store_value_sum).where(Store.marca_id == brand_id)
+        ).one()
+
     def serialize_store(store, brand):
         return {
             "id": store.id,
@@ -326,6 +470,36 @@ def create_app():
             "valor_vasilhame": store.valor_vasilhame,
         }
 
+    store_list_columns = (
+        Store.id,
+        Store.marca_id,
+        Brand.marca,
+        Store.loja,
+        Store.cod_disagua,
+        Store.local_entrega,
+        Store.endereco,
+        Store.municipio,
+        Store.uf,
+        Store.valor_20l,
+        Store.valor_10l,
+        Store.valor_1500ml,
+        Store.valor_cx_copo,
+        Store.valor_vasilhame,
+    )
+
+    store_sort_columns = {
+        "id": Store.id,
+        "loja": Store.loja,
+        "municipio": Store.municipio,
+        "uf": Store.uf,
+        "marca": Brand.marca,
+    }
+
+    def serialize_store_row(row):
+        # Rows come from ``select(*store_list_columns)`` and already carry the
+        # same keys as ``serialize_store``.
+        return dict(row._mapping)
+
     store_fields = {
         "marca_id", "loja", "cod_disagua", "local_entrega", "endereco", "municipio", "uf",
         "valor_20l", "valor_10l", "valor_1500ml", "valor_cx_copo", "valor_vasilhame"
@@ -412,6 +586,49 @@ def create_app():
         response.status_code = status
         return response
 
+    stream_batch_size = 1000
+
+    def streaming_response(query, serialize, *, meta=None):
+        """Stream a ``{"data": [...]}`` envelope while ``query`` is iterated.
+
+        Rows are fetched ``stream_batch_size`` at a time (``yield_per``) and
+        written out batch by batch, so memory stays bounded regardless of how
+        many rows match and the first bytes leave before the query finishes.
+
+        The query runs and its first batch is fetched before the response is
+        built, so a failing query surfaces as an error response instead of a
+        ``200`` with a truncated body.
+        """
+        dumps = app.json.dumps
+        # A dedicated session: the scoped one may be reused and closed by other
+        # code running in this thread before the body has been consumed.
+        s = Session.session_factory()
+        try:
+            result = s.execute(query.execution_options(yield_per=stream_batch_size))
+            partitions = result.partitions()
+            first_batch = next(partitions, None)
+        except Exception:
+            s.close()
+            raise
+
+        def generate():
+            yield '{"data": ['
+            batch = first_batch
+            separator = ""
+            while batch is not None:
+                chunk = ", ".join(dumps(serialize(row)) for row in batch)
+                yield separator + chunk
+                separator = ", "
+                batch = next(partitions, None)
+            yield "]"
+            if meta is not None:
+                yield ', "meta": ' + dumps(meta)
+            yield "}"
+
+        response = app.response_class(stream_with_context(generate()), mimetype="application/json")
+        response.call_on_close(s.close)
+        return response
+
     def error_response(message, *, status=400, code=None, details=None):
         payload = {"error": {"message": message}}
         if code is not None:
@@ -422,11 +639,188 @@ def create_app():
         response.status_code = status
         return response
 
+    default_page_size = 50
+    max_page_size = 500
+
+    # Range of SQLite's INTEGER; binding anything outside it raises OverflowError.
+    sqlite_integer_min = -(2**63)
+    sqlite_integer_max = 2**63 - 1
+
+    def is_sqlite_integer(value):
+        return type(value) is int and sqlite_integer_min <= value <= sqlite_integer_max
+
+    def sqlite_integer(text):
+        """``int(text)``; raises ``ValueError`` for values SQLite cannot store."""
+        value = int(text)
+        if not is_sqlite_integer(value):
+            raise ValueError(f"Inteiro fora do intervalo: {text}")
+        return value
+
+    def encode_cursor(values):
+        raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(token):
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        except (ValueError, UnicodeError):
+            raise ValueError("Cursor de paginação inválido.")
+        # The cursor comes from the client: only ids and column values of the
+        # types ``page_meta`` writes may reach the query.
+        if (
+            not isinstance(values, dict)
+            or not is_sqlite_integer(values.get("id"))
+            or not (values.get("value") is None or isinstance(values["value"], str) or is_sqlite_integer(values["value"]))
+        ):
+            raise ValueError("Cursor de paginação inválido.")
+        return values
+
+    def parse_page_args(sort_columns, default_sort="id"):
+        """Read ``limit``, ``cursor`` and ``sort`` from the query string.
+
+        Pagination is only enabled when the client sends ``limit`` or
+        ``cursor``; otherwise callers keep receiving the full (filtered) list.
+        """
+        args = request.args
+        sort = (args.get("sort") or default_sort).strip()
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in sort_columns:
+            raise ValueError(
+                "Ordenação inválida. Use um dos campos: " + ", ".join(sorted(sort_columns)) + "."
+            )
+
+        paginate = "limit" in args or "cursor" in args
+        limit = default_page_size
+        if args.get("limit"):
+            try:
+                limit = int(args["limit"])
+            except (TypeError, ValueError):
+                raise ValueError("Parâmetro 'limit' deve ser numérico.")
+            if limit < 1:
+                raise ValueError("Parâmetro 'limit' deve ser maior que zero.")
+            limit = min(limit, max_page_size)
+
+        cursor = None
+        if args.get("cursor"):
+            cursor = decode_cursor(args["cursor"])
+            if cursor.get("sort") != sort:
+                raise ValueError("Cursor não corresponde à ordenação solicitada.")
+
+        return {
+            "paginate": paginate,
+            "limit": limit,
+            "cursor": cursor,
+            "sort": sort,
+            "column": sort_columns[sort_key],
+            "descending": descending,
+        }
+
+    def apply_keyset(query, page, tiebreaker):
+        """Order ``query`` by the requested column (plus ``tiebreaker``) and
+        resume after the row referenced by the cursor, if any."""
+        column = page["column"]
+        descending = page["descending"]
+        same_column = column is tiebreaker
+        if descending:
+            ordering = [column.desc()] if same_column else [column.desc(), tiebreaker.desc()]
+        else:
+            ordering = [column.asc()] if same_column else [column.asc(), tiebreaker.asc()]
+        query = query.order_by(*ordering)
+
+        cursor = page["cursor"]
+        if cursor is not None:
+            last_id = cursor["id"]
+            if same_column:
+                query = query.where(tiebreaker < last_id if descending else tiebreaker > last_id)
+            else:
+                last_value = cursor.get("value")
+                if descending:
+                    condition = or_(column < last_value, and_(column == last_value, tiebreaker < last_id))
+                else:
+                    condition = or_(column > last_value, and_(column == last_value, tiebreaker > last_id))
+                query = query.where(condition)
+
+        if page["paginate"]:
+            query = query.limit(page["limit"] + 1)
+        return query
+
+    def page_meta(page, items, sort_field):
+        """Trim the look-ahead row and build the ``meta`` block for a page."""
+        has_more = len(items) > page["limit"]
+        if has_more:
+            items = items[: page["limit"]]
+        next_cursor = None
+        if has_more and items:
+            last = items[-1]
+            next_cursor = encode_cursor({"sort": page["sort"], "value": last[sort_field], "id": last["id"]})
+        meta = {
+            "limit": page["limit"],
+            "sort": page["sort"],
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
+        return items, meta
+
+    def bump_data_version(s, *tables):
+        """Increment the version counter of ``tables`` inside the caller's
+        transaction, so the bump is committed (or rolled back) with the write."""
+        s.execute(
+            update(DataVersion)
+            .where(DataVersion.table_name.in_(tables))
+            .values(version=DataVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def read_data_versions(s, tables):
+        rows = s.execute(
+            select(DataVersion.table_name, DataVersion.version).where(DataVersion.table_name.in_(tables))
+        ).all()
+        versions = {name: version for name, version in rows}
+        return {table: versions.get(table, 0) for table in tables}
+
+    def conditional_on(*tables):
+        """Tag list responses with a strong ETag built from the data version of
+        ``tables`` and answer ``If-None-Match`` with 304 before running the view."""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with Session() as s:
+                    versions = read_data_versions(s, tables)
+                fingerprint = json.dumps(
+                    {
+                        "path": request.path,
+                        "args": sorted(request.args.items(multi=True)),
+                        "versions": versions,
+                    },
+                    sort_keys=True,
+                )
+                etag = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+                if request.if_none_match.contains(etag):
+                    response = app.response_class(status=304)
+                else:
+                    response = app.make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
+            return wrapper
+        return decorator
+
     class _LoginUser(UserMixin):
+        """Identity snapshot shared by ``current_user`` and the role decorators.
+
+        It holds plain values only, so it can be cached across requests without
+        keeping a detached ORM instance around.
+        """
+
         def __init__(self, db_user):
-            self.db_user = db_user
+            self.user_id = db_user.id
             self.id = str(db_user.id)
             self.username = db_user.username
+            self.role = db_user.role
             self._active = getattr(db_user, "is_active", True)
 
         @property
@@ -436,11 +830,35 @@ def create_app():
     login_manager = LoginManager(app)
     login_manager.login_view = 'login'
 
+    identity_cache = {}
+    identity_cache_lock = threading.Lock()
+
+    def invalidate_identity(user_id):
+        with identity_cache_lock:
+            identity_cache.pop(int(user_id), None)
+
     @login_manager.user_loader
     def load_user(user_id):
+        # Flask-Login calls this once per request and memoizes the result as
+        # ``current_user``; the TTL cache below avoids the lookup entirely for
+        # back-to-back requests of the same user.
+        user_id = int(user_id)
+        ttl = app.config.get("AUTH_CACHE_TTL") or 0
+        now = time.monotonic()
+        if ttl > 0:
+            with identity_cache_lock:
+                cached = identity_cache.get(user_id)
+            if cached and cached[0] > now:
+                return cached[1]
+
         with Session() as s:
-            u = s.get(User, int(user_id))
-            return _LoginUser(u) if u else None
+            u = s.get(User, user_id)
+            identity = _LoginUser(u) if u else None
+
+        if ttl > 0 and identity is not None:
+            with identity_cache_lock:
+                identity_cache[user_id] = (now + ttl, identity)
+        return identity
 
     def admin_required(f):
         @wraps(f)
@@ -450,13 +868,11 @@ def create_app():
                     return error_response("Não autenticado.", status=401, code="unauthorized")
                 from flask import abort
                 return abort(401)
-            with Session() as s:
-                u = s.get(User, int(current_user.id))
-                if not u or u.role != 'admin':
-                    if request.path.startswith("/api/"):
-                        return error_response("Acesso restrito ao administrador.", status=403, code="forbidden")
-                    from flask import abort
-                    return abort(403)
+            if current_user.role != 'admin':
+                if request.path.startswith("/api/"):
+                    return error_response("Acesso restrito ao administrador.", status=403, code="forbidden")
+                from flask import abort
+                return abort(403)
             return f(*args, **kwargs)
         return wrapper
 
@@ -470,18 +886,11 @@ def create_app():
                         return error_response("Não autenticado.", status=401, code="unauthorized")
                     from flask import abort
                     return abort(401)
-                with Session() as s:
-                    u = s.get(User, int(current_user.id))
-                    if not u:
-                        if request.path.startswith("/api/"):
-                            return error_response("Não autenticado.", status=401, code="unauthorized")
-                        from flask import abort
-                        return abort(401)
-                    if u.role != 'admin' and u.role not in roles:
-                        if request.path.startswith("/api/"):
-                            return error_response("Permissões insuficientes.", status=403, code="forbidden")
-                        from flask import abort
-                        return abort(403)
+                if current_user.role != 'admin' and current_user.role not in roles:
+                    if request.path.startswith("/api/"):
+                        return error_response("Permissões insuficientes.", status=403, code="forbidden")
+                    from flask import abort
+                    return abort(403)
                 return f(*args, **kwargs)
             return wrapper
         return decorator
@@ -616,6 +1025,7 @@ def create_app():
             from werkzeug.security import generate_password_hash
             u.password_hash = generate_password_hash(new_pwd)
             s.commit()
+        invalidate_identity(current_user.id)
         return render_frontend_or_template(
             "account.html",
             username=current_user.username,
@@ -634,18 +1044,54 @@ def create_app():
     @app.get("/api/me")
     @login_required
     def whoami():
-        with Session() as s:
-            u = s.get(User, int(current_user.id))
-            return success_response({"id": u.id, "username": u.username, "role": u.role})
+        return success_response(
+            {"id": current_user.user_id, "username": current_user.username, "role": current_user.role}
+        )
 
     # Partners
     @app.get("/api/partners")
     @login_required
+    @conditional_on("partners")
     def get_partners():
+        args = request.args
+        try:
+            page = parse_page_args(partner_sort_columns)
+        except ValueError as exc:
+            return error_response(str(exc))
+
+        query = select(Partner)
+        estado = (args.get("estado") or "").strip()
+        if estado:
+            query = query.where(Partner.estado == estado.upper())
+        cidade = (args.get("cidade") or "").strip()
+        if cidade:
+            query = query.where(func.casefold(Partner.cidade) == cidade.casefold())
+        distribuidora = (args.get("distribuidora") or "").strip()
+        if distribuidora:
+            query = query.where(func.casefold(Partner.distribuidora) == distribuidora.casefold())
+        dia_pagamento = (args.get("dia_pagamento") or "").strip()
+        if dia_pagamento:
+            try:
+                query = query.where(Partner.dia_pagamento == sqlite_integer(dia_pagamento))
+            except ValueError:
+                return error_response("Parâmetro 'dia_pagamento' deve ser um número inteiro.")
+        search = (args.get("q") or "").strip()
+        if search:
+            conditions = [func.casefold(Partner.parceiro).contains(search.casefold(), autoescape=True)]
+            digits = only_digits(search)
+            if digits:
+                conditions.append(Partner.cnpj_cpf.contains(digits, autoescape=True))
+            query = query.where(or_(*conditions))
+
+        query = apply_keyset(query, page, Partner.id)
+        if not page["paginate"]:
+            return streaming_response(query, lambda row: serialize_partner(row[0]))
+
         with Session() as s:
-            rows = s.execute(select(Partner)).scalars().all()
+            rows = s.execute(query).scalars().all()
             partners = [serialize_partner(r) for r in rows]
-            return success_response(partners)
+        partners, meta = page_meta(page, partners, page["sort"].lstrip("-"))
+        return success_response(partners, meta=meta)
 
     @app.post("/api/partners")
     @login_required
@@ -670,47 +1116,42 @@ def create_app():
         with Session() as s:
             p = Partner(**payload)
             s.add(p)
+            bump_data_version(s, "partners")
             s.commit()
             s.refresh(p)
             return success_response(serialize_partner(p), status=201)
 
-    @app.post("/api/partners/import")
-    @login_required
-    @roles_allowed("operator")
-    def import_partners():
-        upload = request.files.get("file")
-        if not upload or not upload.filename:
-            return error_response("Selecione um arquivo para importar.")
+    import_batch_size = 1000
 
-        try:
-            columns, rows = load_tabular_file(upload)
-        except ValueError as exc:
-            return error_response(str(exc))
+    def chunked(items, size):
+        """Yield lists of up to ``size`` items; ``items`` may be a lazy iterator."""
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, size))
+            if not batch:
+                return
+            yield batch
 
-        if not columns:
-            return error_response("Não foi possível identificar o cabeçalho do arquivo.")
+    def content_fingerprint(values):
+        """Fingerprint of the values an import writes to a record.
+
+        Stored as ``content_hash``; a record whose fingerprint matches the
+        incoming values is left untouched. Manual edits clear it.
+        """
+        encoded = json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
 
+    def map_partner_columns(columns):
         column_map = {}
         for header in columns:
             normalized = normalize_header_name(header)
             target = partner_header_aliases.get(normalized)
             if target:
                 column_map[header] = target
-
         missing_columns = [field for field in partner_required if field not in column_map.values()]
-        if missing_columns:
-            return error_response(
-                "Arquivo de importação não possui todas as colunas obrigatórias.",
-                details={"missing_columns": sorted(missing_columns)},
-            )
-
-        processed_rows = 0
-        errors = []
-        created_ids = set()
-        updated_ids = set()
-        successful_rows = set()
-        prepared_rows = []
+        return column_map, missing_columns
 
+    def prepare_partner_rows(rows, column_map):
         for index, raw_row in enumerate(rows, start=2):
             mapped = {}
             for original, value in raw_row.items():
@@ -722,100 +1163,349 @@ def create_app():
             if not any(mapped.values()):
                 continue
 
-            processed_rows += 1
             mapped["__row_number"] = index
-            prepared_rows.append(mapped)
+            yield mapped
+
+    def validate_partner_batch(rows):
+        """Validate a chunk of prepared partner rows column by column.
+
+        Returns one ``(error, doc_key, payload)`` per row, where ``error`` is
+        the message reported back to the user (or ``None``). The rules and the
+        order they are checked in match ``parse_partner_payload`` followed by
+        the import checks, so every row reports the same first error as if it
+        were validated on its own. Rows of a chunk come from the same file and
+        carry the same fields.
+        """
+        size = len(rows)
+        fields = [field for field in partner_fields if field in rows[0]]
+        doc_keys = digits_column([row.get("cnpj_cpf") or "" for row in rows])
+
+        columns = {}
+        parse_checks = []
+        bad_estado = bad_dia = np.zeros(size, dtype=bool)
+        for field, column in zip(fields, column_values(rows, fields)):
+            if field in partner_float_fields:
+                values, invalid = convert_column(normalize_decimal_column(column), plain_decimal_pattern, float)
+                parse_checks.append((invalid, f"Campo '{field}' deve ser numérico."))
+                values[is_none(values)] = 0.0
+                columns[field] = values.tolist()
+            elif field == "dia_pagamento":
+                values, invalid = convert_column(column, plain_integer_pattern, int)
+                parse_checks.append((invalid, "Campo 'dia_pagamento' deve ser um número inteiro."))
+                filled = ~is_none(values)
+                bad_dia = filled.copy()
+                bad_dia[filled] = (values[filled] < 1) | (values[filled] > 31)
+                columns[field] = values.tolist()
+            elif field == "estado":
+                estados = [value.upper() for value in column]
+                lengths = np.fromiter(map(len, estados), dtype=np.int64, count=size)
+                bad_estado = (lengths != 0) & (lengths != 2)
+                columns[field] = blank_to_none(estados)
+            elif field == "cnpj_cpf":
+                # Stripping only removes non-digits, so these are the doc keys.
+                columns[field] = blank_to_none(doc_keys)
+            elif field == "telefone":
+                columns[field] = blank_to_none(digits_column(column))
+            else:
+                columns[field] = blank_to_none(column)
+        for field in partner_float_fields:
+            columns.setdefault(field, [0.0] * size)
+
+        missing, missing_message = missing_messages(columns, size, partner_required, "Campos obrigatórios ausentes: ")
+        errors = first_errors(
+            size,
+            [
+                (np.fromiter(map(operator.not_, doc_keys), dtype=bool, count=size), "Informe o CPF ou CNPJ do parceiro."),
+                *parse_checks,
+                (missing, missing_message),
+                (bad_estado, "Informe a UF com dois caracteres."),
+                (bad_dia, "Campo 'dia_pagamento' deve estar entre 1 e 31."),
+            ],
+        )
+        keys = list(columns)
+        payloads = [dict(zip(keys, values)) for values in zip(*columns.values())]
+        return list(zip(errors, doc_keys, payloads))
+
+    def load_partner_document_index(s):
+        """Map each document to ``(id, content_hash)`` of its oldest partner."""
+        index = {}
+        for partner_id, document, content_hash in s.execute(
+            select(Partner.id, Partner.cnpj_cpf, Partner.content_hash).order_by(Partner.id)
+        ):
+            key = only_digits(document)
+            if key and key not in index:
+                index[key] = (partner_id, content_hash)
+        return index
+
+    def plan_partner_import(prepared_rows, document_index, progress=None):
+        """Validate every row and match it against ``document_index``.
+
+        Rows repeating a document are merged in file order, exactly as if they
+        had been applied one after the other. Partners whose merged values
+        match their ``content_hash`` are left out of ``updates`` and their rows
+        count as skipped. ``prepared_rows`` is consumed once, lazily, and
+        validated ``import_batch_size`` rows at a time. Nothing is written here.
+        """
+        inserts = {}
+        updates = {}
+        update_rows = {}
+        stored_hashes = {}
+        errors = []
+        successful_rows = set()
+        total = 0
+        for chunk in chunked(prepared_rows, import_batch_size):
+            row_numbers = [row.pop("__row_number") for row in chunk]
+            for row_number, (error, doc_key, payload) in zip(row_numbers, validate_partner_batch(chunk)):
+                if error:
+                    errors.append({"row": row_number, "message": error})
+                    continue
 
-        if not prepared_rows:
-            return success_response(
-                {
-                    "total": 0,
-                    "created": 0,
-                    "updated": 0,
-                    "skipped": 0,
-                    "error_count": 0,
-                    "errors": [],
-                }
-            )
+                match = document_index.get(doc_key)
+                if match is not None:
+                    partner_id, stored_hashes[partner_id] = match
+                    updates.setdefault(partner_id, {}).update(payload)
+                    update_rows.setdefault(partner_id, []).append(row_number)
+                else:
+                    inserts.setdefault(doc_key, {}).update(payload)
+                successful_rows.add(row_number)
+            total += len(chunk)
+            if progress:
+                progress.advance(total, errors=len(errors))
+
+        for payload in inserts.values():
+            payload["content_hash"] = content_fingerprint(payload)
+        for partner_id in list(updates):
+            payload = updates[partner_id]
+            fingerprint = content_fingerprint(payload)
+            if fingerprint == stored_hashes[partner_id]:
+                del updates[partner_id]
+                successful_rows.difference_update(update_rows[partner_id])
+            else:
+                payload["content_hash"] = fingerprint
 
-        with Session() as s:
-            existing_by_document = {}
-            for partner in s.query(Partner).all():
-                key = only_digits(partner.cnpj_cpf)
-                if key and key not in existing_by_document:
-                    existing_by_document[key] = partner
-
-            for row in prepared_rows:
-                row_number = row.pop("__row_number", None)
-                if row_number is None:
-                    row_number = processed_rows
-                doc_key = only_digits(row.get("cnpj_cpf"))
-                if not doc_key:
-                    errors.append({"row": row_number, "message": "Informe o CPF ou CNPJ do parceiro."})
-                    continue
+        return {
+            "total": total,
+            "inserts": inserts,
+            "updates": updates,
+            "errors": errors,
+            "successful_rows": successful_rows,
+        }
 
-                payload_source = {key: value for key, value in row.items() if key in partner_fields}
-                try:
-                    payload = parse_partner_payload(payload_source)
-                except ValueError as exc:
-                    errors.append({"row": row_number, "message": str(exc)})
-                    continue
+    def apply_partner_import(s, plan):
+        inserts = list(plan["inserts"].values())
+        for batch in chunked(inserts, import_batch_size):
+            s.execute(insert(Partner), batch)
+        updates = [{"id": partner_id, **payload} for partner_id, payload in plan["updates"].items()]
+        for batch in chunked(updates, import_batch_size):
+            s.execute(update(Partner), batch)
+        if inserts or updates:
+            bump_data_version(s, "partners")
+
+    def partner_import_summary(plan):
+        errors = plan["errors"]
+        return {
+            "total": plan["total"],
+            "created": len(plan["inserts"]),
+            "updated": len(plan["updates"]),
+            "skipped": max(plan["total"] - len(plan["successful_rows"]) - len(errors), 0),
+            "error_count": len(errors),
+            "errors": errors,
+        }
 
-                missing = normalize_required(payload, partner_required)
-                if missing:
-                    errors.append(
-                        {
-                            "row": row_number,
-                            "message": "Campos obrigatórios ausentes: " + ", ".join(sorted(missing)),
-                        }
-                    )
-                    continue
+    import_digest_tables = {"partners_import": ("partners",), "brands_import": ("brands", "stores")}
+
+    def previous_import_summary(s, kind, digest):
+        """Return the summary of the last ``kind`` import when it read the same
+        file (``digest``) and nothing changed the imported tables since."""
+        previous = s.get(ImportDigest, kind)
+        if previous is None or previous.digest != digest:
+            return None
+        if json.loads(previous.data_versions) != read_data_versions(s, import_digest_tables[kind]):
+            return None
+        summary = json.loads(previous.summary)
+        # Importing it again would only skip the rows already imported.
+        counts = {key: 0 for key in summary if key.startswith(("created", "updated"))}
+        return {**summary, **counts, "skipped": summary["total"] - summary["error_count"], "unchanged_file": True}
+
+    def remember_import(s, kind, digest, summary):
+        """Record ``digest`` as the last ``kind`` import, in the import's own
+        transaction and after its writes (so the data versions include them)."""
+        record = s.get(ImportDigest, kind) or ImportDigest(kind=kind)
+        record.digest = digest
+        record.data_versions = json.dumps(read_data_versions(s, import_digest_tables[kind]))
+        record.summary = json.dumps(summary, ensure_ascii=False)
+        record.imported_at = datetime.utcnow()
+        s.add(record)
+
+    def import_option(name):
+        value = request.args.get(name) or request.form.get(name) or ""
+        return value.strip().lower() in {"1", "true", "yes", "sim"}
+
+    # Entries listed per section of an import preview diff.
+    import_preview_limit = 100
+
+    @contextmanager
+    def read_only_session():
+        """Session for work that must not write anything (import previews).
+
+        SQLite rejects any write on the connection (``PRAGMA query_only``) and
+        reads never open a write transaction, so other writers are not blocked.
+        """
+        with Session() as s:
+            connection = s.connection()
+            connection.exec_driver_sql("PRAGMA query_only = ON")
+            try:
+                yield s
+            finally:
+                connection.exec_driver_sql("PRAGMA query_only = OFF")
+                s.rollback()
 
-                estado = payload.get("estado")
-                if estado and len(estado) != 2:
-                    errors.append({"row": row_number, "message": "Informe a UF com dois caracteres."})
-                    continue
+    def value_changes(original, current, fields):
+        return {
+            field: {"from": original.get(field), "to": current.get(field)}
+            for field in fields
+            if original.get(field) != current.get(field)
+        }
 
-                dia_pagamento = payload.get("dia_pagamento")
-                if dia_pagamento is not None and (dia_pagamento < 1 or dia_pagamento > 31):
-                    errors.append({"row": row_number, "message": "Campo 'dia_pagamento' deve estar entre 1 e 31."})
-                    continue
+    def partner_import_diff(s, plan):
+        """Values to create and fields to change (first ``import_preview_limit`` of each)."""
+        creates = [
+            {key: value for key, value in payload.items() if key != "content_hash"}
+            for payload in islice(plan["inserts"].values(), import_preview_limit)
+        ]
+        update_ids = list(islice(plan["updates"], import_preview_limit))
+        columns = [getattr(Partner, field) for field in sorted(partner_fields)]
+        originals = {
+            row["id"]: row
+            for row in s.execute(select(Partner.id, *columns).where(Partner.id.in_(update_ids))).mappings()
+        }
+        updates = []
+        for partner_id in update_ids:
+            payload = plan["updates"][partner_id]
+            fields = [field for field in payload if field != "content_hash"]
+            updates.append(
+                {
+                    "id": partner_id,
+                    "parceiro": originals[partner_id]["parceiro"],
+                    "changes": value_changes(originals[partner_id], payload, fields),
+                }
+            )
+        return {"partners": {"create": creates, "update": updates}}
+
+    import_spool_size = 8 * 1024 * 1024
+
+    def start_import_job(kind, upload, **options):
+        """Queue ``upload`` for ``import_job_runners[kind]`` (called with
+        ``options``) and answer with the job."""
+        # The request's file is closed with the response, so the worker gets a
+        # copy (kept in memory up to ``import_spool_size``, then on disk).
+        spool = tempfile.SpooledTemporaryFile(max_size=import_spool_size)
+        upload.stream.seek(0)
+        shutil.copyfileobj(upload.stream, spool)
+        spool.seek(0)
+        stored = FileStorage(spool, filename=upload.filename)
+        run_import = import_job_runners[kind]
+
+        def work(progress):
+            try:
+                return run_import(stored, progress, **options)
+            finally:
+                spool.close()
+
+        job = job_runner.create(kind, created_by=current_user.user_id, filename=upload.filename)
+        job_runner.submit(job["id"], work)
+        return success_response(job, status=202)
+
+    def read_import_file(upload, progress):
+        """Return the header and the lazy row iterator of ``upload``.
+
+        Rows are only read while the plan consumes them, so a malformed line
+        further down raises ``TabularFileError`` from inside the plan.
+        """
+        if progress:
+            progress.phase("reading")
+        columns, rows = read_tabular_file(upload)
+        if not columns:
+            raise JobError("Não foi possível identificar o cabeçalho do arquivo.")
+        return columns, rows
+
+    def run_partner_import(upload, progress=None):
+        """Import partners from ``upload`` and return the summary.
+
+        Raises ``JobError`` (or ``TabularFileError``) when the file itself
+        cannot be imported.
+        ``progress`` is the ``JobProgress`` of a background job, if any.
+        A file identical to the last one imported is not read again.
+        """
+        digest = file_digest(upload)
+        with Session() as s:
+            summary = previous_import_summary(s, "partners_import", digest)
+        if summary is None:
+            summary = import_partner_file(upload, digest, progress)
+        if progress:
+            progress.advance(
+                summary["total"],
+                created=summary["created"],
+                updated=summary["updated"],
+                errors=summary["error_count"],
+                force=True,
+            )
+        return summary
 
-                for field in partner_float_fields:
-                    payload.setdefault(field, 0.0)
-
-                partner = existing_by_document.get(doc_key)
-                if partner:
-                    for key, value in payload.items():
-                        setattr(partner, key, value)
-                    if partner.id not in created_ids:
-                        if partner.id not in updated_ids:
-                            updated_ids.add(partner.id)
-                    existing_by_document[doc_key] = partner
-                    if row_number is not None:
-                        successful_rows.add(row_number)
-                else:
-                    partner = Partner(**payload)
-                    s.add(partner)
-                    s.flush()
-                    existing_by_document[doc_key] = partner
-                    created_ids.add(partner.id)
-                    if row_number is not None:
-                        successful_rows.add(row_number)
+    def read_partner_rows(upload, progress=None):
+        columns, rows = read_import_file(upload, progress)
+
+        column_map, missing_columns = map_partner_columns(columns)
+        if missing_columns:
+            raise JobError(
+                "Arquivo de importação não possui todas as colunas obrigatórias.",
+                details={"missing_columns": sorted(missing_columns)},
+            )
+        return prepare_partner_rows(rows, column_map)
 
+    def import_partner_file(upload, digest, progress):
+        prepared_rows = read_partner_rows(upload, progress)
+        with Session() as s:
+            if progress:
+                progress.phase("validating")
+            plan = plan_partner_import(prepared_rows, load_partner_document_index(s), progress)
+            if progress:
+                # No progress writes from here on: the import holds the write lock.
+                progress.phase("writing", total_rows=plan["total"])
+            apply_partner_import(s, plan)
+            summary = partner_import_summary(plan)
+            remember_import(s, "partners_import", digest, summary)
             s.commit()
+        return summary
 
-        skipped_rows = max(processed_rows - len(successful_rows) - len(errors), 0)
+    def preview_partner_import(upload):
+        """Run the partner import of ``upload`` without writing and return
+        its summary plus the diff it would apply."""
+        prepared_rows = read_partner_rows(upload)
+        with read_only_session() as s:
+            plan = plan_partner_import(prepared_rows, load_partner_document_index(s))
+            diff = partner_import_diff(s, plan)
+        return {**partner_import_summary(plan), "preview": True, "diff": diff}
 
-        summary = {
-            "total": processed_rows,
-            "created": len(created_ids),
-            "updated": len(updated_ids),
-            "skipped": skipped_rows,
-            "error_count": len(errors),
-            "errors": errors,
-        }
+    @app.post("/api/partners/import")
+    @login_required
+    @roles_allowed("operator")
+    def import_partners():
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            return error_response("Selecione um arquivo para importar.")
 
+        if import_option("preview"):
+            run_import = preview_partner_import
+        elif import_option("async"):
+            return start_import_job("partners_import", upload)
+        else:
+            run_import = run_partner_import
+
+        try:
+            summary = run_import(upload)
+        except (JobError, TabularFileError) as exc:
+            return error_response(str(exc), details=getattr(exc, "details", None))
         return success_response(summary)
 
     @app.put("/api/partners/<int:pid>")
@@ -837,6 +1527,8 @@ def create_app():
                 return error_response("Parceiro não encontrado.", status=404, code="not_found")
             for key, value in payload.items():
                 setattr(p, key, value)
+            p.content_hash = None
+            bump_data_version(s, "partners")
             s.commit()
             s.refresh(p)
             return success_response(serialize_partner(p))
@@ -850,16 +1542,38 @@ def create_app():
             if not p:
                 return error_response("Parceiro não encontrado.", status=404, code="not_found")
             s.delete(p)
+            bump_data_version(s, "partners")
             s.commit()
             return success_response({"ok": True})
 
     # Brands
     @app.get("/api/brands")
     @login_required
+    @conditional_on("brands", "stores")
     def get_brands():
+        store_counts = (
+            select(
+                Store.marca_id,
+                func.count(Store.id).label("store_count"),
+                store_value_sum.label("store_value_total"),
+            )
+            .group_by(Store.marca_id)
+            .subquery()
+        )
+        query = (
+            select(
+                Brand.id,
+                Brand.marca,
+                Brand.cod_disagua,
+                func.coalesce(store_counts.c.store_count, 0),
+                store_counts.c.store_value_total,
+            )
+            .outerjoin(store_counts, store_counts.c.marca_id == Brand.id)
+            .order_by(Brand.id)
+        )
         with Session() as s:
-            rows = s.execute(select(Brand)).scalars().all()
-            return success_response([serialize_brand(b) for b in rows])
+            rows = s.execute(query).all()
+            return success_response([serialize_brand(row, row[3], row[4]) for row in rows])
 
     @app.post("/api/brands")
     @login_required
@@ -873,6 +1587,7 @@ def create_app():
         with Session() as s:
             b = Brand(marca=marca, cod_disagua=cod_disagua)
             s.add(b)
+            bump_data_version(s, "brands")
             try:
                 s.commit()
             except IntegrityError:
@@ -881,7 +1596,7 @@ def create_app():
                     "Não foi possível salvar a marca. Verifique se o nome já está cadastrado.",
                 )
             s.refresh(b)
-            return success_response(serialize_brand(b), status=201)
+            return success_response(serialize_brand(b, 0, 0), status=201)
 
     @app.put("/api/brands/<int:bid>")
     @login_required
@@ -904,6 +1619,7 @@ def create_app():
                 if isinstance(cod_disagua, str):
                     cod_disagua = cod_disagua.strip()
                 b.cod_disagua = cod_disagua or None
+            bump_data_version(s, "brands")
             try:
                 s.commit()
             except IntegrityError:
@@ -912,7 +1628,7 @@ def create_app():
                     "Não foi possível atualizar a marca. Verifique se o nome já está cadastrado.",
                 )
             s.refresh(b)
-            return success_response(serialize_brand(b))
+            return success_response(serialize_brand(b, *brand_store_totals(s, b.id)))
 
     @app.delete("/api/brands/<int:bid>")
     @login_required
@@ -923,17 +1639,49 @@ def create_app():
             if not b:
                 return error_response("Marca não encontrada.", status=404, code="not_found")
             s.delete(b)
+            bump_data_version(s, "brands", "stores")
             s.commit()
             return success_response({"ok": True})
 
     # Stores
     @app.get("/api/stores")
     @login_required
+    @conditional_on("stores", "brands")
     def get_stores():
+        args = request.args
+        try:
+            page = parse_page_args(store_sort_columns)
+        except ValueError as exc:
+            return error_response(str(exc))
+
+        query = select(*store_list_columns).join(Brand, Store.marca_id == Brand.id)
+        marca_id = (args.get("marca_id") or "").strip()
+        if marca_id:
+            try:
+                query = query.where(Store.marca_id == sqlite_integer(marca_id))
+            except ValueError:
+                return error_response("Parâmetro 'marca_id' deve ser numérico.")
+        uf = (args.get("uf") or "").strip()
+        if uf:
+            query = query.where(Store.uf == uf.upper())
+        municipio = (args.get("municipio") or "").strip()
+        if municipio:
+            query = query.where(func.casefold(Store.municipio) == municipio.casefold())
+        cod_disagua = (args.get("cod_disagua") or "").strip()
+        if cod_disagua:
+            query = query.where(Store.cod_disagua == cod_disagua)
+        search = (args.get("q") or "").strip()
+        if search:
+            query = query.where(func.casefold(Store.loja).contains(search.casefold(), autoescape=True))
+
+        query = apply_keyset(query, page, Store.id)
+        if not page["paginate"]:
+            return streaming_response(query, serialize_store_row)
+
         with Session() as s:
-            rows = s.execute(select(Store, Brand).join(Brand, Store.marca_id == Brand.id)).all()
-            stores = [serialize_store(store, brand) for store, brand in rows]
-            return success_response(stores)
+            stores = [serialize_store_row(row) for row in s.execute(query)]
+        stores, meta = page_meta(page, stores, page["sort"].lstrip("-"))
+        return success_response(stores, meta=meta)
 
     @app.post("/api/stores")
     @login_required
@@ -960,6 +1708,7 @@ def create_app():
                 return error_response("Marca não encontrada.")
             st = Store(**payload)
             s.add(st)
+            bump_data_version(s, "stores")
             s.commit()
             s.refresh(st)
             brand = s.get(Brand, st.marca_id)
@@ -986,6 +1735,8 @@ def create_app():
                 return error_response("Marca não encontrada.")
             for key, value in payload.items():
                 setattr(st, key, value)
+            st.content_hash = None
+            bump_data_version(s, "stores")
             s.commit()
             brand = s.get(Brand, st.marca_id)
             return success_response(serialize_store(st, brand))
@@ -999,25 +1750,13 @@ def create_app():
             if not st:
                 return error_response("Loja não encontrada.", status=404, code="not_found")
             s.delete(st)
+            bump_data_version(s, "stores")
             s.commit()
             return success_response({"ok": True})
 
-    @app.post("/api/brands/import")
-    @login_required
-    @roles_allowed("operator")
-    def import_brands_and_stores():
-        upload = request.files.get("file")
-        if not upload or not upload.filename:
-            return error_response("Selecione um arquivo para importar.")
-
-        try:
-            columns, rows = load_tabular_file(upload)
-        except ValueError as exc:
-            return error_response(str(exc))
-
-        if not columns:
-            return error_response("Não foi possível identificar o cabeçalho do arquivo.")
+    store_record_fields = tuple(sorted(store_fields))
 
+    def map_brand_store_columns(columns):
         column_map = {}
         for header in columns:
             normalized = normalize_header_name(header)
@@ -1025,19 +1764,10 @@ def create_app():
                 column_map[header] = ("brand", brand_header_aliases[normalized])
             elif normalized in store_header_aliases:
                 column_map[header] = ("store", store_header_aliases[normalized])
+        has_brand_name = any(bucket == "brand" and field == "marca" for bucket, field in column_map.values())
+        return column_map, has_brand_name
 
-        if not any(bucket == "brand" and field == "marca" for bucket, field in column_map.values()):
-            return error_response("O arquivo precisa conter a coluna 'marca'.")
-
-        processed_rows = 0
-        errors = []
-        created_brand_ids = set()
-        updated_brand_ids = set()
-        created_store_ids = set()
-        updated_store_ids = set()
-        successful_rows = set()
-        prepared_rows = []
-
+    def prepare_brand_store_rows(rows, column_map):
         for index, raw_row in enumerate(rows, start=2):
             brand_data = {}
             store_data = {}
@@ -1054,80 +1784,196 @@ def create_app():
             if not any(brand_data.values()) and not any(store_data.values()):
                 continue
 
-            processed_rows += 1
-            prepared_rows.append({"brand": brand_data, "store": store_data, "__row_number": index})
+            yield {"brand": brand_data, "store": store_data, "__row_number": index}
 
-        if not prepared_rows:
-            return success_response(
-                {
-                    "total": 0,
-                    "created_brands": 0,
-                    "updated_brands": 0,
-                    "created_stores": 0,
-                    "updated_stores": 0,
-                    "skipped": 0,
-                    "error_count": 0,
-                    "errors": [],
-                }
-            )
+    def validate_store_batch(stores):
+        """Validate the store values of a chunk of import rows column by column.
 
-        with Session() as s:
-            brand_cache_by_name = {}
-            brand_cache_by_code = {}
+        Returns one ``(error, payload)`` per store with the message and values
+        ``parse_store_payload`` and the required-field check give for it.
+        ``marca_id`` is left to the caller, as it depends on the brand each row
+        resolves to. Stores of a chunk come from the same file and carry the
+        same fields.
+        """
+        size = len(stores)
+        present = [field for field in store_fields if field in stores[0] and field != "marca_id"]
+        raw_columns = dict(zip(present, column_values(stores, present)))
+
+        columns = {}
+        parse_checks = []
+        for field in store_fields:
+            if field == "marca_id" or (field not in raw_columns and field not in ("loja", "uf")):
+                continue
+            # ``loja`` and ``uf`` are always set, even when the file lacks them.
+            column = raw_columns.get(field, [""] * size)
+            if field in store_float_fields:
+                values, invalid = convert_column(normalize_decimal_column(column), plain_decimal_pattern, float)
+                parse_checks.append((invalid, f"Campo '{field}' deve ser numérico."))
+                values[is_none(values)] = 0.0
+                columns[field] = values.tolist()
+            elif field == "uf":
+                columns[field] = blank_to_none([value.upper() for value in column])
+            else:
+                columns[field] = blank_to_none(column)
+        for field in store_float_fields:
+            columns.setdefault(field, [0.0] * size)
+
+        missing, missing_message = missing_messages(
+            columns, size, store_required - {"marca_id"}, "Campos obrigatórios da loja ausentes: "
+        )
+        errors = first_errors(size, [*parse_checks, (missing, missing_message)])
+        keys = list(columns)
+        payloads = [dict(zip(keys, values)) for values in zip(*columns.values())]
+        return list(zip(errors, payloads))
+
+    def sqlite_lower(value):
+        # SQLite's lower() only folds ASCII letters; the in-memory keys must
+        # match what ``func.lower(...)`` comparisons used to find.
+        return "".join(ch.lower() if ch.isascii() else ch for ch in value or "")
+
+    def import_record_order(record):
+        # Existing rows first by id, then rows created by the import in order.
+        return (0, record["id"]) if record["id"] > 0 else (1, -record["id"])
+
+    def index_add(index, key, record):
+        bucket = index.setdefault(key, [])
+        bucket.append(record)
+        bucket.sort(key=import_record_order)
+
+    def index_remove(index, key, record):
+        bucket = index.get(key, [])
+        bucket[:] = [item for item in bucket if item is not record]
+        if not bucket:
+            index.pop(key, None)
+
+    def index_first(index, key):
+        bucket = index.get(key)
+        return bucket[0] if bucket else None
+
+    def load_brand_store_indexes(s):
+        """Load brand and store keys once so every import row is resolved in memory.
+
+        Records are plain dicts and every lookup index maps a key to all the
+        records sharing it; the first one (lowest id) is the match, like the
+        ``.first()`` queries they replace.
+        """
+        brands = {}
+        brands_by_name = {}
+        brands_by_code = {}
+        for brand_id, marca, cod_disagua in s.execute(
+            select(Brand.id, Brand.marca, Brand.cod_disagua).order_by(Brand.id)
+        ):
+            record = {"id": brand_id, "marca": marca, "cod_disagua": cod_disagua}
+            brands[brand_id] = record
+            brands_by_name.setdefault(sqlite_lower(marca), []).append(record)
+            if cod_disagua is not None:
+                brands_by_code.setdefault(cod_disagua, []).append(record)
+
+        stores = {}
+        stores_by_code = {}
+        stores_by_name = {}
+        columns = [Store.id, Store.content_hash] + [getattr(Store, field) for field in store_record_fields]
+        for row in s.execute(select(*columns).order_by(Store.id)):
+            record = dict(row._mapping)
+            stores[record["id"]] = record
+            if record["cod_disagua"] is not None:
+                stores_by_code.setdefault(record["cod_disagua"], []).append(record)
+            stores_by_name.setdefault((record["marca_id"], sqlite_lower(record["loja"])), []).append(record)
+
+        return {
+            "brands": brands,
+            "brands_by_name": brands_by_name,
+            "brands_by_code": brands_by_code,
+            "stores": stores,
+            "stores_by_code": stores_by_code,
+            "stores_by_name": stores_by_name,
+        }
 
-            for row in prepared_rows:
-                row_number = row.pop("__row_number", None)
-                if row_number is None:
-                    row_number = processed_rows
+    def reindex_record(index, old_key, new_key, record):
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            index_remove(index, old_key, record)
+        if new_key is not None:
+            index_add(index, new_key, record)
+
+    def plan_brand_store_import(prepared_rows, indexes, progress=None):
+        """Resolve every row against ``indexes`` and collect the writes.
+
+        New brands and stores get temporary negative ids so that later rows can
+        reference them; ``apply_brand_store_import`` swaps the brand ids for the
+        real ones. ``*_originals`` keep the values of every existing record
+        before its first change. A store whose ``content_hash`` matches the
+        row (and that stays under the same brand) is skipped without comparing
+        its fields; ``rehashed_stores`` are unchanged stores that only get
+        their missing fingerprint written.
+        """
+        brands_by_name = indexes["brands_by_name"]
+        brands_by_code = indexes["brands_by_code"]
+        stores_by_code = indexes["stores_by_code"]
+        stores_by_name = indexes["stores_by_name"]
+        # Brands already used by this file take precedence over the indexes.
+        brand_cache_by_name = {}
+        brand_cache_by_code = {}
 
-                brand_raw = row.get("brand", {})
-                store_raw = row.get("store", {})
+        errors = []
+        successful_rows = set()
+        new_brands = []
+        new_stores = []
+        brand_originals = {}
+        store_originals = {}
+        rehashed_stores = set()
+
+        total = 0
+        for chunk in chunked(prepared_rows, import_batch_size):
+            # Store values do not depend on the brand a row resolves to, so
+            # they are validated for the whole chunk up front.
+            with_store = [position for position, row in enumerate(chunk) if any(row["store"].values())]
+            if with_store:
+                stores = validate_store_batch([chunk[position]["store"] for position in with_store])
+                validated_stores = dict(zip(with_store, stores))
+            else:
+                validated_stores = {}
+            for position, row in enumerate(chunk):
+                row_number = row.pop("__row_number")
+                brand_raw = row["brand"]
 
                 brand_name = (brand_raw.get("marca") or "").strip()
                 if not brand_name:
                     errors.append({"row": row_number, "message": "Informe o nome da marca."})
                     continue
 
-                brand_code_value = (brand_raw.get("cod_disagua") or "").strip()
-                brand_code = brand_code_value or None
+                brand_code = (brand_raw.get("cod_disagua") or "").strip() or None
                 normalized_brand_key = brand_name.lower()
 
-                brand = brand_cache_by_name.get(normalized_brand_key)
-                if not brand:
-                    brand = (
-                        s.query(Brand)
-                        .filter(func.lower(Brand.marca) == normalized_brand_key)
-                        .first()
-                    )
+                brand = brand_cache_by_name.get(normalized_brand_key) or index_first(brands_by_name, normalized_brand_key)
                 if not brand and brand_code:
-                    brand = brand_cache_by_code.get(brand_code)
-                    if not brand:
-                        brand = s.query(Brand).filter(Brand.cod_disagua == brand_code).first()
+                    brand = brand_cache_by_code.get(brand_code) or index_first(brands_by_code, brand_code)
 
                 brand_changed = False
                 previous_code = None
                 previous_name_key = None
                 if brand:
-                    previous_code = brand.cod_disagua
-                    previous_name_key = brand.marca.lower()
-                    if brand.marca != brand_name:
-                        brand.marca = brand_name
+                    previous_code = brand["cod_disagua"]
+                    previous_name_key = brand["marca"].lower()
+                    changes = {}
+                    if brand["marca"] != brand_name:
+                        changes["marca"] = brand_name
+                    if brand["cod_disagua"] != brand_code:
+                        changes["cod_disagua"] = brand_code
+                    if changes:
+                        if brand["id"] > 0:
+                            brand_originals.setdefault(brand["id"], dict(brand))
+                        reindex_record(brands_by_name, sqlite_lower(brand["marca"]), sqlite_lower(brand_name), brand)
+                        reindex_record(brands_by_code, brand["cod_disagua"], brand_code, brand)
+                        brand.update(changes)
                         brand_changed = True
-                    if brand_code is not None:
-                        if brand.cod_disagua != brand_code:
-                            brand.cod_disagua = brand_code
-                            brand_changed = True
-                    else:
-                        if brand.cod_disagua is not None:
-                            brand.cod_disagua = None
-                            brand_changed = True
-                    if brand_changed and brand.id not in created_brand_ids and brand.id not in updated_brand_ids:
-                        updated_brand_ids.add(brand.id)
                 else:
-                    brand = Brand(marca=brand_name, cod_disagua=brand_code)
-                    s.add(brand)
-                    s.flush()
-                    created_brand_ids.add(brand.id)
+                    brand = {"id": -(len(new_brands) + 1), "marca": brand_name, "cod_disagua": brand_code}
+                    new_brands.append(brand)
+                    index_add(brands_by_name, sqlite_lower(brand_name), brand)
+                    if brand_code is not None:
+                        index_add(brands_by_code, brand_code, brand)
                     brand_changed = True
 
                 brand_cache_by_name[normalized_brand_key] = brand
@@ -1138,94 +1984,444 @@ def create_app():
                 if brand_code:
                     brand_cache_by_code[brand_code] = brand
 
-                has_store_data = any(store_raw.values())
                 store_changed = False
-
-                if has_store_data:
-                    store_source = {key: (value.strip() if isinstance(value, str) else value) for key, value in store_raw.items()}
-                    store_source["marca_id"] = brand.id
-                    store_source["loja"] = (store_source.get("loja") or "").strip()
-                    store_source["uf"] = (store_source.get("uf") or "").strip().upper()
-
-                    try:
-                        parsed_store = parse_store_payload(store_source)
-                    except ValueError as exc:
-                        errors.append({"row": row_number, "message": str(exc)})
-                        continue
-
-                    missing_store = normalize_required(parsed_store, store_required)
-                    if missing_store:
-                        errors.append(
-                            {
-                                "row": row_number,
-                                "message": "Campos obrigatórios da loja ausentes: " + ", ".join(sorted(missing_store)),
-                            }
-                        )
+                if position in validated_stores:
+                    store_error, parsed_store = validated_stores[position]
+                    if store_error:
+                        errors.append({"row": row_number, "message": store_error})
                         continue
-
-                    for field in store_float_fields:
-                        parsed_store.setdefault(field, 0.0)
+                    # The brand is left out: it may still have a temporary id.
+                    fingerprint = content_fingerprint(parsed_store)
+                    parsed_store["marca_id"] = brand["id"]
 
                     store_code = parsed_store.get("cod_disagua")
-                    store = None
-                    if store_code:
-                        store = s.query(Store).filter(Store.cod_disagua == store_code).first()
+                    store = index_first(stores_by_code, store_code) if store_code else None
                     if not store:
-                        store = (
-                            s.query(Store)
-                            .filter(Store.marca_id == brand.id)
-                            .filter(func.lower(Store.loja) == parsed_store["loja"].lower())
-                            .first()
-                        )
+                        store = index_first(stores_by_name, (brand["id"], parsed_store["loja"].lower()))
 
                     if store:
-                        current_changes = False
-                        for key, value in parsed_store.items():
-                            current_value = getattr(store, key)
-                            if current_value != value:
-                                current_changes = True
-                            setattr(store, key, value)
-                        if current_changes and store.id not in created_store_ids and store.id not in updated_store_ids:
-                            updated_store_ids.add(store.id)
-                        if current_changes:
+                        # A matching fingerprint means the store still holds
+                        # these values, so there is nothing to compare.
+                        unchanged = store["content_hash"] == fingerprint and store["marca_id"] == brand["id"]
+                        if unchanged:
+                            changes = {}
+                        else:
+                            changes = {key: value for key, value in parsed_store.items() if store.get(key) != value}
+                        if changes:
+                            if store["id"] > 0:
+                                store_originals.setdefault(store["id"], dict(store))
+                            old_name_key = (store["marca_id"], sqlite_lower(store["loja"]))
+                            old_code = store["cod_disagua"]
+                            store.update(changes)
+                            reindex_record(stores_by_name, old_name_key, (store["marca_id"], sqlite_lower(store["loja"])), store)
+                            reindex_record(stores_by_code, old_code, store["cod_disagua"], store)
                             store_changed = True
+                        elif not unchanged and store["id"] > 0:
+                            rehashed_stores.add(store["id"])
+                        store["content_hash"] = fingerprint
                     else:
-                        store = Store(**parsed_store)
-                        s.add(store)
-                        s.flush()
-                        created_store_ids.add(store.id)
+                        store = {
+                            **{field: None for field in store_record_fields},
+                            **parsed_store,
+                            "id": -(len(new_stores) + 1),
+                            "content_hash": fingerprint,
+                        }
+                        new_stores.append(store)
+                        index_add(stores_by_name, (store["marca_id"], sqlite_lower(store["loja"])), store)
+                        if store["cod_disagua"] is not None:
+                            index_add(stores_by_code, store["cod_disagua"], store)
                         store_changed = True
 
-                if (brand_changed or store_changed) and row_number is not None:
+                if brand_changed or store_changed:
                     successful_rows.add(row_number)
 
-            s.commit()
+            total += len(chunk)
+            if progress:
+                progress.advance(total, errors=len(errors))
 
-        skipped_rows = max(processed_rows - len(successful_rows) - len(errors), 0)
+        return {
+            "total": total,
+            "new_brands": new_brands,
+            "new_stores": new_stores,
+            "brand_originals": brand_originals,
+            "store_originals": store_originals,
+            "rehashed_stores": rehashed_stores,
+            "indexes": indexes,
+            "errors": errors,
+            "successful_rows": successful_rows,
+        }
 
-        summary = {
-            "total": processed_rows,
-            "created_brands": len(created_brand_ids),
-            "updated_brands": len(updated_brand_ids),
-            "created_stores": len(created_store_ids),
-            "updated_stores": len(updated_store_ids),
-            "skipped": skipped_rows,
+    def apply_brand_store_import(s, plan):
+        indexes = plan["indexes"]
+        new_brands = plan["new_brands"]
+
+        # Brand names are unique and the plan only holds their final values:
+        # a row may rename a brand and a later row reuse (or swap) its old
+        # name. Renames are written before new brands are inserted, and a
+        # renamed brand whose old name goes to another renamed brand first
+        # moves to a placeholder no import can produce.
+        brand_updates = []
+        for brand_id in plan["brand_originals"]:
+            brand = indexes["brands"][brand_id]
+            brand_updates.append({"id": brand_id, "marca": brand["marca"], "cod_disagua": brand["cod_disagua"]})
+        new_names = {values["marca"] for values in brand_updates}
+        placeholders = [
+            {"id": brand_id, "marca": f"\0{brand_id}"}
+            for brand_id, original in plan["brand_originals"].items()
+            if original["marca"] in new_names and indexes["brands"][brand_id]["marca"] != original["marca"]
+        ]
+        for updates in (placeholders, brand_updates):
+            for batch in chunked(updates, import_batch_size):
+                s.execute(update(Brand), batch)
+
+        real_ids = {}
+        for batch in chunked(new_brands, import_batch_size):
+            ids = s.execute(
+                insert(Brand).returning(Brand.id, sort_by_parameter_order=True),
+                [{"marca": brand["marca"], "cod_disagua": brand["cod_disagua"]} for brand in batch],
+            ).scalars().all()
+            for brand, real_id in zip(batch, ids):
+                real_ids[brand["id"]] = real_id
+                brand["id"] = real_id
+
+        def store_values(store):
+            values = {field: store[field] for field in store_record_fields}
+            values["marca_id"] = real_ids.get(values["marca_id"], values["marca_id"])
+            values["content_hash"] = store["content_hash"]
+            return values
+
+        for batch in chunked(plan["new_stores"], import_batch_size):
+            s.execute(insert(Store), [store_values(store) for store in batch])
+        store_updates = [
+            {"id": store_id, **store_values(indexes["stores"][store_id])}
+            for store_id in plan["store_originals"]
+        ]
+        for batch in chunked(store_updates, import_batch_size):
+            s.execute(update(Store), batch)
+        rehashed = [
+            {"id": store_id, "content_hash": indexes["stores"][store_id]["content_hash"]}
+            for store_id in plan["rehashed_stores"]
+            if store_id not in plan["store_originals"]
+        ]
+        for batch in chunked(rehashed, import_batch_size):
+            s.execute(update(Store), batch)
+
+        if new_brands or brand_updates or plan["new_stores"] or store_updates:
+            bump_data_version(s, "brands", "stores")
+
+    def brand_store_import_summary(plan):
+        errors = plan["errors"]
+        return {
+            "total": plan["total"],
+            "created_brands": len(plan["new_brands"]),
+            "updated_brands": len(plan["brand_originals"]),
+            "created_stores": len(plan["new_stores"]),
+            "updated_stores": len(plan["store_originals"]),
+            "skipped": max(plan["total"] - len(plan["successful_rows"]) - len(errors), 0),
             "error_count": len(errors),
             "errors": errors,
         }
 
+    def run_brand_store_import(upload, progress=None):
+        """Import brands and stores from ``upload`` and return the summary.
+
+        Same contract as ``run_partner_import``.
+        """
+        digest = file_digest(upload)
+        with Session() as s:
+            summary = previous_import_summary(s, "brands_import", digest)
+        if summary is None:
+            summary = import_brand_store_file(upload, digest, progress)
+        if progress:
+            progress.advance(
+                summary["total"],
+                created=summary["created_brands"] + summary["created_stores"],
+                updated=summary["updated_brands"] + summary["updated_stores"],
+                errors=summary["error_count"],
+                force=True,
+            )
+        return summary
+
+    def read_brand_store_rows(upload, progress=None):
+        columns, rows = read_import_file(upload, progress)
+
+        column_map, has_brand_name = map_brand_store_columns(columns)
+        if not has_brand_name:
+            raise JobError("O arquivo precisa conter a coluna 'marca'.")
+        return prepare_brand_store_rows(rows, column_map)
+
+    def import_brand_store_file(upload, digest, progress):
+        prepared_rows = read_brand_store_rows(upload, progress)
+        with Session() as s:
+            if progress:
+                progress.phase("validating")
+            plan = plan_brand_store_import(prepared_rows, load_brand_store_indexes(s), progress)
+            if progress:
+                progress.phase("writing", total_rows=plan["total"])
+            apply_brand_store_import(s, plan)
+            summary = brand_store_import_summary(plan)
+            remember_import(s, "brands_import", digest, summary)
+            s.commit()
+        return summary
+
+    def brand_store_import_diff(plan):
+        """Same as ``partner_import_diff``; stores name their brand instead of ``marca_id``."""
+        indexes = plan["indexes"]
+        brand_fields = ("marca", "cod_disagua")
+        store_fields_shown = [field for field in store_record_fields if field != "marca_id"]
+        brand_names = {brand["id"]: brand["marca"] for brand in plan["new_brands"]}
+        brand_names.update((brand_id, brand["marca"]) for brand_id, brand in indexes["brands"].items())
+        original_brand_names = {brand_id: brand["marca"] for brand_id, brand in plan["brand_originals"].items()}
+
+        def store_changes(store_id, original):
+            store = indexes["stores"][store_id]
+            changes = value_changes(original, store, store_fields_shown)
+            if original["marca_id"] != store["marca_id"]:
+                old_brand = original_brand_names.get(original["marca_id"], brand_names.get(original["marca_id"]))
+                changes["marca"] = {"from": old_brand, "to": brand_names[store["marca_id"]]}
+            return {"id": store_id, "loja": original["loja"], "changes": changes}
+
+        return {
+            "brands": {
+                "create": [
+                    {field: brand[field] for field in brand_fields}
+                    for brand in islice(plan["new_brands"], import_preview_limit)
+                ],
+                "update": [
+                    {
+                        "id": brand_id,
+                        "marca": original["marca"],
+                        "changes": value_changes(original, indexes["brands"][brand_id], brand_fields),
+                    }
+                    for brand_id, original in islice(plan["brand_originals"].items(), import_preview_limit)
+                ],
+            },
+            "stores": {
+                "create": [
+                    {"marca": brand_names[store["marca_id"]], **{field: store[field] for field in store_fields_shown}}
+                    for store in islice(plan["new_stores"], import_preview_limit)
+                ],
+                "update": [
+                    store_changes(store_id, original)
+                    for store_id, original in islice(plan["store_originals"].items(), import_preview_limit)
+                ],
+            },
+        }
+
+    def preview_brand_store_import(upload):
+        """Same as ``preview_partner_import`` for brands and stores."""
+        prepared_rows = read_brand_store_rows(upload)
+        with read_only_session() as s:
+            plan = plan_brand_store_import(prepared_rows, load_brand_store_indexes(s))
+        return {**brand_store_import_summary(plan), "preview": True, "diff": brand_store_import_diff(plan)}
+
+    def run_report_entry_import(upload, progress=None, file_format=None, decimal=None):
+        """Ingest report entries from the CSV/JSON Lines ``upload``.
+
+        Raises ``ReportIngestError`` when the file cannot be read. Accepted
+        rows are committed every ``report_ingest.TRANSACTION_SIZE`` rows.
+        ``decimal`` overrides the decimal separator chosen from the file.
+        """
+        file_format = detect_format(upload.filename, file_format)
+        upload.stream.seek(0)
+        records = read_report_records(upload.stream, file_format, decimal)
+        if progress:
+            progress.phase("writing")
+
+        def report_progress(processed, inserted, rejected):
+            if progress:
+                progress.advance(processed, created=inserted, errors=rejected)
+
+        with Session() as s:
+            summary = ingest_report_entries(
+                s,
+                records,
+                before_commit=lambda session: bump_data_version(session, "report_entries"),
+                progress=report_progress,
+            )
+        if progress:
+            progress.advance(summary["total"], created=summary["inserted"], errors=summary["rejected"], force=True)
+        return summary
+
+    import_job_runners = {
+        "partners_import": run_partner_import,
+        "brands_import": run_brand_store_import,
+        "report_entries_import": run_report_entry_import,
+    }
+
+    @app.post("/api/brands/import")
+    @login_required
+    @roles_allowed("operator")
+    def import_brands_and_stores():
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            return error_response("Selecione um arquivo para importar.")
+
+        if import_option("preview"):
+            run_import = preview_brand_store_import
+        elif import_option("async"):
+            return start_import_job("brands_import", upload)
+        else:
+            run_import = run_brand_store_import
+
+        try:
+            summary = run_import(upload)
+        except (JobError, TabularFileError) as exc:
+            return error_response(str(exc), details=getattr(exc, "details", None))
         return success_response(summary)
 
+    @app.get("/api/import-jobs/<job_id>")
+    @login_required
+    def get_import_job(job_id):
+        job = job_runner.get(job_id)
+        if (
+            job is None
+            or job.kind not in import_job_runners
+            or (job.created_by != current_user.user_id and current_user.role != "admin")
+        ):
+            return error_response("Importação não encontrada.", status=404, code="not_found")
+        return success_response(serialize_job(job))
+
     # Connections
     @app.get("/api/connections")
     @login_required
+    @conditional_on("connections")
     def get_connections():
-        with Session() as s:
-            rows = s.execute(select(Connection)).scalars().all()
-            return success_response([
-                {"id": c.id, "partner_id": c.partner_id, "store_id": c.store_id}
-                for c in rows
-            ])
+        query = select(Connection.id, Connection.partner_id, Connection.store_id).order_by(Connection.id)
+        return streaming_response(query, lambda row: dict(row._mapping))
+
+    # Pairs accepted by one batch request, and pairs per lookup query (two
+    # bound parameters each, below SQLite's historical limit of 999).
+    connection_batch_limit = 5000
+    connection_lookup_size = 400
+
+    def parse_connection_pair(item):
+        """Return ``(partner_id, store_id)`` or ``None`` when ``item`` is not a valid pair."""
+        if not isinstance(item, dict):
+            return None
+        ids = []
+        for field in ("partner_id", "store_id"):
+            value = item.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                return None
+            try:
+                number = int(value)
+            except ValueError:
+                return None
+            if number < 1:
+                return None
+            ids.append(number)
+        return tuple(ids)
+
+    def existing_ids(s, column, ids):
+        found = set()
+        for batch in chunked(sorted(ids), connection_lookup_size):
+            found.update(s.execute(select(column).where(column.in_(batch))).scalars())
+        return found
+
+    def connection_ids(s, pairs):
+        """Map each existing ``(partner_id, store_id)`` of ``pairs`` to its connection id."""
+        ids = {}
+        for batch in chunked(sorted(pairs), connection_lookup_size):
+            rows = s.execute(
+                select(Connection.id, Connection.partner_id, Connection.store_id).where(
+                    tuple_(Connection.partner_id, Connection.store_id).in_(batch)
+                )
+            )
+            ids.update(((partner_id, store_id), connection_id) for connection_id, partner_id, store_id in rows)
+        return ids
+
+    def apply_connection_changes(s, connect, disconnect):
+        """Delete the ``disconnect`` pairs, then create the ``connect`` pairs.
+
+        Existence and duplicates are checked with a few set-based queries and
+        the writes are batched; nothing is committed here. Returns one outcome
+        per requested pair, in request order.
+        """
+        connect_pairs = [parse_connection_pair(item) for item in connect]
+        disconnect_pairs = [parse_connection_pair(item) for item in disconnect]
+        requested = {pair for pair in connect_pairs + disconnect_pairs if pair}
+
+        current = connection_ids(s, requested)
+        connect_valid = {pair for pair in connect_pairs if pair}
+        partners = existing_ids(s, Partner.id, {partner_id for partner_id, _ in connect_valid})
+        stores = existing_ids(s, Store.id, {store_id for _, store_id in connect_valid})
+
+        def outcome(pair, status, **extra):
+            if pair is None:
+                return {"status": status, **extra}
+            return {"partner_id": pair[0], "store_id": pair[1], "status": status, **extra}
+
+        disconnect_results = []
+        seen = set()
+        removed = {}
+        for pair in disconnect_pairs:
+            if pair is None:
+                result = outcome(pair, "invalid")
+            elif pair in seen:
+                result = outcome(pair, "duplicate")
+            elif pair in current:
+                removed[pair] = current.pop(pair)
+                result = outcome(pair, "deleted", id=removed[pair])
+            else:
+                result = outcome(pair, "not_found")
+            if pair:
+                seen.add(pair)
+            disconnect_results.append(result)
+
+        connect_results = []
+        created = []
+        seen = set()
+        for pair in connect_pairs:
+            if pair is None:
+                result = outcome(pair, "invalid")
+            elif pair in seen:
+                result = outcome(pair, "duplicate")
+            elif pair in current:
+                result = outcome(pair, "exists", id=current[pair])
+            elif pair[0] not in partners:
+                result = outcome(pair, "partner_not_found")
+            elif pair[1] not in stores:
+                result = outcome(pair, "store_not_found")
+            else:
+                result = outcome(pair, "created")
+                created.append(result)
+            if pair:
+                seen.add(pair)
+            connect_results.append(result)
+
+        removed_ids = sorted(removed.values())
+        for batch in chunked(removed_ids, import_batch_size):
+            s.execute(delete(Connection).where(Connection.id.in_(batch)))
+        new_pairs = [{"partner_id": result["partner_id"], "store_id": result["store_id"]} for result in created]
+        for batch in chunked(new_pairs, import_batch_size):
+            s.execute(insert(Connection), batch)
+        if created:
+            # SQLite only batches inserts without RETURNING; read the new ids back.
+            new_ids = connection_ids(s, [(pair["partner_id"], pair["store_id"]) for pair in new_pairs])
+            for result in created:
+                result["id"] = new_ids[(result["partner_id"], result["store_id"])]
+        if removed_ids or created:
+            bump_data_version(s, "connections")
+
+        return {
+            "created": len(created),
+            "deleted": len(removed_ids),
+            "error_count": sum(
+                result["status"] not in ("created", "exists", "deleted")
+                for result in connect_results + disconnect_results
+            ),
+            "connect": connect_results,
+            "disconnect": disconnect_results,
+        }
+
+    connection_errors = {
+        "invalid": "Informe parceiro e loja válidos.",
+        "exists": "Essa conexão já existe.",
+        "partner_not_found": "Parceiro não encontrado.",
+        "store_not_found": "Loja não encontrada.",
+    }
+    connection_conflict_message = "Os vínculos foram alterados por outra operação. Tente novamente."
 
     @app.post("/api/connections")
     @login_required
@@ -1233,10 +2429,37 @@ def create_app():
     def create_connection():
         data = request.json or {}
         with Session() as s:
-            c = Connection(**data)
-            s.add(c)
-            s.commit()
-            return success_response({"id": c.id}, status=201)
+            result = apply_connection_changes(s, [data], [])["connect"][0]
+            if result["status"] != "created":
+                status = 409 if result["status"] == "exists" else 400
+                return error_response(connection_errors[result["status"]], status=status, code=result["status"])
+            try:
+                s.commit()
+            except IntegrityError:
+                s.rollback()
+                return error_response(connection_conflict_message, status=409, code="conflict")
+            return success_response({"id": result["id"]}, status=201)
+
+    @app.post("/api/connections/batch")
+    @login_required
+    @roles_allowed("operator")
+    def update_connections():
+        data = request.json or {}
+        connect = data.get("connect") or []
+        disconnect = data.get("disconnect") or []
+        if not isinstance(connect, list) or not isinstance(disconnect, list):
+            return error_response("Envie as listas 'connect' e 'disconnect' com pares partner_id/store_id.")
+        if len(connect) + len(disconnect) > connection_batch_limit:
+            return error_response(f"Envie no máximo {connection_batch_limit} pares por requisição.")
+
+        with Session() as s:
+            summary = apply_connection_changes(s, connect, disconnect)
+            try:
+                s.commit()
+            except IntegrityError:
+                s.rollback()
+                return error_response(connection_conflict_message, status=409, code="conflict")
+        return success_response(summary)
 
     @app.delete("/api/connections/<int:cid>")
     @login_required
@@ -1247,39 +2470,80 @@ def create_app():
             if not c:
                 return error_response("Vínculo não encontrado.", status=404, code="not_found")
             s.delete(c)
+            bump_data_version(s, "connections")
             s.commit()
             return success_response({"ok": True})
 
     # Report entries
+    report_entry_columns = (
+        ReportEntry.id,
+        ReportEntry.marca,
+        ReportEntry.loja,
+        ReportEntry.data,
+        ReportEntry.valor_20l,
+        ReportEntry.valor_10l,
+        ReportEntry.valor_1500ml,
+        ReportEntry.valor_cx_copo,
+        ReportEntry.valor_vasilhame,
+    )
+
+    def parse_filter_date(value):
+        """``date`` for a ``startDate``/``endDate`` filter, ``None`` when empty."""
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError("Data inválida. Use o formato AAAA-MM-DD.") from None
+
+    def filter_report_query(query, args):
+        """Apply the ``startDate``/``endDate``/``marca`` filters shared by the
+        report endpoints. Raises ``ValueError`` for malformed dates."""
+        start = parse_filter_date(args.get("startDate"))
+        end = parse_filter_date(args.get("endDate"))
+        marca = args.get("marca")
+        if start:
+            query = query.where(ReportEntry.data >= start)
+        if end:
+            query = query.where(ReportEntry.data <= end)
+        if marca:
+            query = query.where(ReportEntry.marca == marca)
+        return query
+
+    def serialize_report_row(row):
+        item = dict(row._mapping)
+        item["data"] = item["data"].isoformat()
+        return item
+
     @app.get("/api/report-data")
     @login_required
+    @conditional_on("report_entries")
     def get_report_data():
-        start = request.args.get("startDate")
-        end = request.args.get("endDate")
-        marca = request.args.get("marca")
+        try:
+            query = filter_report_query(select(*report_entry_columns), request.args)
+        except ValueError as exc:
+            return error_response(str(exc))
+        return streaming_response(query.order_by(ReportEntry.id), serialize_report_row)
+
+    @app.get("/api/report-data/summary")
+    @login_required
+    @conditional_on("report_entries")
+    def get_report_summary():
+        try:
+            group_by = parse_group_by(request.args.get("group_by"))
+            start = parse_filter_date(request.args.get("startDate"))
+            end = parse_filter_date(request.args.get("endDate"))
+        except ValueError as exc:
+            return error_response(str(exc))
+        marca = request.args.get("marca") or None
         with Session() as s:
-            q = s.query(ReportEntry)
-            if start:
-                q = q.filter(ReportEntry.data >= date.fromisoformat(start))
-            if end:
-                q = q.filter(ReportEntry.data <= date.fromisoformat(end))
-            if marca:
-                q = q.filter(ReportEntry.marca == marca)
-            rows = q.all()
-            return success_response([
-                {
-                    "id": r.id,
-                    "marca": r.marca,
-                    "loja": r.loja,
-                    "data": r.data.isoformat(),
-                    "valor_20l": r.valor_20l,
-                    "valor_10l": r.valor_10l,
-                    "valor_1500ml": r.valor_1500ml,
-                    "valor_cx_copo": r.valor_cx_copo,
-                    "valor_vasilhame": r.valor_vasilhame,
-                }
-                for r in rows
-            ])
+            groups = aggregate_report_entries(s, group_by, start=start, end=end, marca=marca)
+        meta = {
+            "group_by": group_by,
+            "groups": len(groups),
+            "source": "rollup" if can_use_rollup(group_by) else "entries",
+        }
+        return success_response(groups, meta=meta)
 
     @app.post("/api/report-data/seed")
     @login_required
@@ -1293,6 +2557,7 @@ def create_app():
             if not brands or not stores:
                 return error_response("Cadastre marcas e lojas antes.")
             today = datetime.utcnow().date()
+            entries = []
             for _ in range(n):
                 brand = random.choice(brands)
                 brand_stores = [st for st in stores if st.marca_id == brand.id]
@@ -1308,10 +2573,81 @@ def create_app():
                     valor_cx_copo=round(random.random()*120, 2),
                     valor_vasilhame=round(random.random()*30, 2),
                 )
-                s.add(e)
+                entries.append(e)
+            s.add_all(entries)
+            apply_rollup(s, entries)
+            bump_data_version(s, "report_entries")
             s.commit()
         return success_response({"ok": True, "seeded": n})
 
+    @app.post("/api/report-data/import")
+    @login_required
+    @roles_allowed("operator")
+    def import_report_data():
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            return error_response("Selecione um arquivo para importar.")
+        file_format = request.args.get("format") or request.form.get("format") or None
+        decimal = request.args.get("decimal") or request.form.get("decimal") or None
+        try:
+            file_format = detect_format(upload.filename, file_format)
+            decimal = check_decimal(decimal)
+        except ReportIngestError as exc:
+            return error_response(str(exc))
+
+        if import_option("async"):
+            return start_import_job("report_entries_import", upload, file_format=file_format, decimal=decimal)
+
+        try:
+            summary = run_report_entry_import(upload, file_format=file_format, decimal=decimal)
+        except ReportIngestError as exc:
+            return error_response(str(exc))
+        return success_response(summary)
+
+    @app.cli.command("import-report-entries")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "file_format", type=click.Choice(["csv", "jsonl"]), help="Padrão: pela extensão.")
+    @click.option(
+        "--decimal",
+        type=click.Choice([",", "."]),
+        help="Separador decimal. Padrão: ',' em CSV separado por ';' e '.' nos demais arquivos.",
+    )
+    def import_report_entries_command(path, file_format, decimal):
+        """Ingest report entries from a CSV or JSON Lines file."""
+        def report_progress(processed, inserted, rejected):
+            click.echo(f"{processed} linhas lidas, {inserted} gravadas, {rejected} rejeitadas.")
+
+        with open(path, "rb") as stream:
+            try:
+                file_format = detect_format(path, file_format)
+                with Session() as s:
+                    summary = ingest_report_entries(
+                        s,
+                        read_report_records(stream, file_format, decimal),
+                        before_commit=lambda session: bump_data_version(session, "report_entries"),
+                        progress=report_progress,
+                    )
+            except ReportIngestError as exc:
+                raise click.ClickException(str(exc))
+
+        for rejection in summary["rejections"][:20]:
+            click.echo(f"Linha {rejection['line']}: {rejection['message']}", err=True)
+        if summary["rejected"] > 20:
+            click.echo(f"... e mais {summary['rejected'] - 20} linhas rejeitadas.", err=True)
+        click.echo(
+            f"{summary['inserted']} registros gravados e {summary['rejected']} rejeitados de {summary['total']} linhas "
+            f"em {summary['seconds']:.1f} s ({summary['rows_per_second']} linhas/s)."
+        )
+
+    @app.cli.command("rebuild-report-rollup")
+    def rebuild_report_rollup_command():
+        """Recompute the daily report rollup from report_entries."""
+        with Session() as s:
+            total = rebuild_rollup(s)
+            bump_data_version(s, "report_entries")
+            s.commit()
+        click.echo(f"Rollup diário reconstruído: {total} linhas.")
+
     # Upload images
     @app.post("/api/upload")
     @login_required
@@ -1347,11 +2683,13 @@ def create_app():
                     "size_bytes": size_bytes,
                     "brand_id": rec.brand_id
                 })
+            bump_data_version(s, "receipt_images")
             s.commit()
         return success_response({"saved": saved})
 
     @app.get("/api/receipts")
     @login_required
+    @conditional_on("receipt_images", "brands")
     def list_receipts():
         with Session() as s:
             rows = s.execute(
@@ -1414,47 +2752,177 @@ def create_app():
                         return error_response("Não foi possível renomear o arquivo.", status=500)
                     rec.filename = new_name
 
+            bump_data_version(s, "receipt_images")
             s.commit()
             return success_response({"ok": True})
 
     # Export
-    @app.get("/api/report-data/export")
-    @login_required
-    def export_report():
-        fmt = request.args.get("format", "excel")
-        start = request.args.get("startDate")
-        end = request.args.get("endDate")
-        marca = request.args.get("marca")
+    def report_export_rows(query):
         with Session() as s:
-            q = s.query(ReportEntry)
-            if start: q = q.filter(ReportEntry.data >= date.fromisoformat(start))
-            if end: q = q.filter(ReportEntry.data <= date.fromisoformat(end))
-            if marca: q = q.filter(ReportEntry.marca == marca)
-            rows = q.all()
-            data = [{
-                "Marca": r.marca,
-                "Loja": r.loja,
-                "Data": r.data.isoformat(),
-                "Valor 20L": r.valor_20l,
-                "Valor 10L": r.valor_10l,
-                "Valor 1500ML": r.valor_1500ml,
-                "Valor CX Copo": r.valor_cx_copo,
-                "Valor Vasilhame": r.valor_vasilhame,
-                "Total": (r.valor_20l + r.valor_10l + r.valor_1500ml + r.valor_cx_copo + r.valor_vasilhame)
-            } for r in rows]
+            yield from s.execute(query.execution_options(yield_per=stream_batch_size))
+
+    def parse_export_filters(args):
+        """Filters of an export from ``args``. Raises ``ValueError`` for
+        malformed dates and for values that are not text (JSON bodies)."""
+        for field in ("startDate", "endDate", "marca"):
+            if not isinstance(args.get(field) or "", str):
+                raise ValueError(f"Campo '{field}' deve ser texto.")
+        return {
+            "start": parse_filter_date(args.get("startDate")),
+            "end": parse_filter_date(args.get("endDate")),
+            "marca": args.get("marca") or None,
+        }
+
+    def plan_report_export(fmt, filters):
+        """Return the manager, the cache and the result the export will have.
 
+        The file name identifies the export in the cache (format, filters and
+        the current data version). Raises ``ValueError`` for unknown formats.
+        """
         manager = ExportManager()
-        try:
-            result = manager.export(data, fmt)
-        except ValueError as exc:
-            return error_response(str(exc))
+        cache = ExportCache(manager.export_dir)
+        with Session() as s:
+            version = read_data_versions(s, ("report_entries",))["report_entries"]
+        planned = manager.result_for(fmt, cache.filename(fmt, version=version, **filters))
+        return manager, cache, planned
 
-        return send_file(
-            result.buffer,
+    def export_file_response(result, status):
+        response = send_file(
+            result.path,
             as_attachment=True,
             download_name=result.filename,
             mimetype=result.mimetype,
         )
+        response.headers["X-Export-Cache"] = status
+        return response
+
+    @app.get("/api/report-data/export")
+    @login_required
+    def export_report_file():
+        fmt = (request.args.get("format") or "excel").strip().lower()
+        try:
+            filters = parse_export_filters(request.args)
+            manager, cache, planned = plan_report_export(fmt, filters)
+        except ValueError as exc:
+            return error_response(str(exc))
+
+        if cache.hit(planned.path):
+            return export_file_response(planned, "hit")
+
+        cache.evict()
+        try:
+            if fmt == "pdf":
+                # Layout is CPU bound; it runs in a worker process.
+                result = report_renderer.render(fmt, export_dir=manager.export_dir, filename=planned.filename, **filters)
+            elif fmt in manager.STREAMED_FORMATS:
+                # CSV and JSON Lines leave as the query yields the rows.
+                rows = report_export_rows(report_export_query(**filters))
+                result, chunks = manager.stream(rows, fmt, filename=planned.filename, columns=EXPORT_COLUMNS)
+                response = app.response_class(stream_with_context(chunks), mimetype=result.mimetype)
+                response.headers.set("Content-Disposition", "attachment", filename=result.filename)
+                response.headers["X-Export-Cache"] = "miss"
+                return response
+            else:
+                rows = report_export_rows(report_export_query(**filters))
+                result = manager.export(rows, fmt, filename=planned.filename, columns=EXPORT_COLUMNS)
+        except ValueError as exc:
+            return error_response(str(exc))
+        return export_file_response(result, "miss")
+
+    # Export jobs
+    export_job_lock = threading.Lock()
+
+    def run_report_export_job(progress, job_id, fmt, filters, download_url):
+        """Write the export of a job and return its summary.
+
+        The job records the rows to export and the rows written so far; PDF
+        exports report them from the renderer's worker process.
+        """
+        manager, cache, planned = plan_report_export(fmt, filters)
+        cached = cache.hit(planned.path)
+        if not cached:
+            cache.evict()
+            options = {"export_dir": manager.export_dir, "filename": planned.filename, "job_id": job_id, **filters}
+            if fmt == "pdf":
+                report_renderer.render(fmt, **options)
+            else:
+                export_report(DB_PATH, fmt, profile=STORAGE_PROFILE, **options)
+        return {
+            "format": fmt,
+            "filename": planned.filename,
+            "cached": cached,
+            "download_url": download_url,
+        }
+
+    def find_export_job(job_id):
+        """The export job ``job_id`` if the current user may see it, else ``None``."""
+        job = export_job_runner.get(job_id)
+        if (
+            job is None
+            or job.kind != "report_export"
+            or (job.created_by != current_user.user_id and current_user.role != "admin")
+        ):
+            return None
+        return job
+
+    @app.post("/api/report-data/export-jobs")
+    @login_required
+    def create_report_export_job():
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return error_response("Envie o formato e os filtros da exportação em um objeto JSON.")
+        fmt = payload.get("format") or "excel"
+        if not isinstance(fmt, str):
+            return error_response("Campo 'format' deve ser texto.")
+        fmt = fmt.strip().lower()
+        try:
+            filters = parse_export_filters(payload)
+            ExportManager().result_for(fmt)
+        except ValueError as exc:
+            return error_response(str(exc))
+
+        # Counting and creating under one lock keeps simultaneous requests
+        # from the same user from both passing the limit.
+        with export_job_lock:
+            active = export_job_runner.count_active("report_export", created_by=current_user.user_id)
+            if active >= EXPORT_JOBS_PER_USER:
+                return error_response(
+                    f"Você já tem {active} exportação(ões) em andamento. Aguarde a conclusão para solicitar outra.",
+                    status=429,
+                    code="too_many_jobs",
+                )
+            job = export_job_runner.create("report_export", created_by=current_user.user_id)
+        # Built here: the worker thread has no request to build URLs from.
+        download_url = url_for("download_report_export_job", job_id=job["id"])
+        export_job_runner.submit(job["id"], run_report_export_job, job["id"], fmt, filters, download_url)
+        return success_response(job, status=202)
+
+    @app.get("/api/report-data/export-jobs/<job_id>")
+    @login_required
+    def get_report_export_job(job_id):
+        job = find_export_job(job_id)
+        if job is None:
+            return error_response("Exportação não encontrada.", status=404, code="not_found")
+        return success_response(serialize_job(job))
+
+    @app.get("/api/report-data/export-jobs/<job_id>/download")
+    @login_required
+    def download_report_export_job(job_id):
+        job = find_export_job(job_id)
+        if job is None:
+            return error_response("Exportação não encontrada.", status=404, code="not_found")
+        if job.status != "succeeded":
+            return error_response("A exportação ainda não foi concluída.", status=409, code="not_ready")
+        summary = json.loads(job.result)
+        manager = ExportManager()
+        result = manager.result_for(summary["format"], summary["filename"])
+        if not ExportCache(manager.export_dir).hit(result.path):
+            return error_response(
+                "O arquivo desta exportação não está mais disponível. Solicite-a novamente.",
+                status=410,
+                code="gone",
+            )
+        return export_file_response(result, "hit")
 
     # Users API
     @app.get("/api/users")
@@ -1502,6 +2970,7 @@ def create_app():
             if "is_active" in data:
                 u.is_active = bool(data["is_active"])
             s.commit()
+            invalidate_identity(uid)
             return success_response({"ok": True})
 
     @app.put("/api/users/<int:uid>/password")
@@ -1519,6 +2988,7 @@ def create_app():
                 return error_response("Usuário não encontrado.", status=404, code="not_found")
             u.password_hash = generate_password_hash(new_pwd)
             s.commit()
+            invalidate_identity(uid)
             return success_response({"ok": True})
 
     @app.delete("/api/users/<int:uid>")
@@ -1533,6 +3003,7 @@ def create_app():
                 return error_response("não é permitido excluir o administrador padrão")
             s.delete(u)
             s.commit()
+            invalidate_identity(uid)
             return success_response({"ok": True})
 
     @app.get("/uploads/<path:filename>")
@@ -1,5 +1,6 @@
 """Project-wide configuration settings."""
 
+import os
 from pathlib import Path
 
 # Base directory of the project (repository root)
@@ -9,4 +10,70 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 EXPORT_DIR = BASE_DIR / "exports"
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 
-__all__ = ["BASE_DIR", "EXPORT_DIR"]
+# Report exports are reused while the report data does not change. Least
+# recently used files are removed from EXPORT_DIR once they are older than
+# EXPORT_CACHE_MAX_AGE seconds or the directory exceeds EXPORT_CACHE_MAX_MB.
+EXPORT_CACHE_MAX_AGE = float(os.environ.get("EXPORT_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+EXPORT_CACHE_MAX_MB = float(os.environ.get("EXPORT_CACHE_MAX_MB", "1024"))
+
+# Seconds an authenticated identity (role and active flag) is reused between
+# requests before being reloaded from the database. Use 0 to disable the cache.
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "30"))
+
+# Worker threads processing background jobs (asynchronous imports). Jobs
+# beyond this limit wait in the queue.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Worker threads running asynchronous report exports, and how many of them a
+# single user may have queued or running at once.
+EXPORT_JOB_WORKERS = int(os.environ.get("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOBS_PER_USER = int(os.environ.get("EXPORT_JOBS_PER_USER", "2"))
+
+# Worker processes rendering PDF exports. Exports beyond this limit wait in
+# the queue.
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "2"))
+
+# SQLite storage profiles. ``pragmas`` are applied to every new DBAPI
+# connection and ``pool`` is forwarded to ``create_engine``. The "legacy"
+# profile reproduces SQLite/SQLAlchemy defaults (rollback journal).
+STORAGE_PROFILES = {
+    "legacy": {
+        "pragmas": {},
+        "pool": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -32000,  # negative values are KiB (~32 MB)
+            "mmap_size": 268435456,
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+            # Kept off until the models declare ON DELETE rules: deleting a
+            # partner or store that still has connections would start failing.
+            "foreign_keys": "OFF",
+        },
+        "pool": {
+            "pool_size": 8,
+            "max_overflow": 8,
+            "pool_timeout": 30,
+        },
+    },
+}
+
+# Name of the profile used by ``create_app``.
+STORAGE_PROFILE = os.environ.get("STORAGE_PROFILE", "production")
+
+__all__ = [
+    "BASE_DIR",
+    "EXPORT_DIR",
+    "EXPORT_CACHE_MAX_AGE",
+    "EXPORT_CACHE_MAX_MB",
+    "AUTH_CACHE_TTL",
+    "JOB_WORKERS",
+    "EXPORT_JOB_WORKERS",
+    "EXPORT_JOBS_PER_USER",
+    "PDF_WORKERS",
+    "STORAGE_PROFILES",
+    "STORAGE_PROFILE",
+]
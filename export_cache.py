@@ -0,0 +1,109 @@
+"""Reuse of report exports kept in ``config.settings.EXPORT_DIR``.
+
+An export is named after its format, its filters and the data version of the
+exported table. While the version does not change, the file written for the
+first request is served again to the following ones; any write bumps the
+version and the next request produces a new file. Files are evicted least
+recently used first, once they are older than ``max_age`` or the directory
+grows beyond ``max_bytes``, so the directory stays bounded. Files written or
+used in the last ``grace_period`` seconds are never evicted: they may be
+about to be sent by another request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from config.settings import EXPORT_CACHE_MAX_AGE, EXPORT_CACHE_MAX_MB, EXPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+# Files still being written (see ``ExportManager``).
+PARTIAL_SUFFIX = ".part"
+
+
+class ExportCache:
+    """Name, look up and evict the files of ``export_dir``."""
+
+    BASENAME = "relatorio"
+    # Covers the gap between an export being renamed into place (or found by
+    # ``hit``) and its file being opened for the download.
+    GRACE_PERIOD = 60.0
+
+    def __init__(
+        self,
+        export_dir: Path | str = EXPORT_DIR,
+        *,
+        max_bytes: int = int(EXPORT_CACHE_MAX_MB * 1024 * 1024),
+        max_age: float = EXPORT_CACHE_MAX_AGE,
+        grace_period: float = GRACE_PERIOD,
+    ) -> None:
+        self.export_dir = Path(export_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace_period = grace_period
+
+    def filename(self, fmt: str, **key) -> str:
+        """Return the file name (without extension) of the export identified
+        by ``fmt`` and ``key`` (filters and data version)."""
+
+        fingerprint = json.dumps({"format": fmt, **key}, sort_keys=True, default=str)
+        return f"{self.BASENAME}_{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:24]}"
+
+    def hit(self, path: Path) -> bool:
+        """Return whether ``path`` is cached, marking it as recently used."""
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return path.is_file()
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Remove expired files, then the least recently used ones until the
+        directory fits ``max_bytes``. Returns how many files were removed.
+
+        Files younger than ``grace_period`` are kept even if the directory
+        stays over ``max_bytes``, and partial files are only removed once
+        expired: younger ones belong to exports in progress.
+        """
+
+        now = time.time() if now is None else now
+        entries = []
+        for entry in os.scandir(self.export_dir):
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name.endswith(PARTIAL_SUFFIX)))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+
+        removed = 0
+        total = sum(size for _, size, _, _ in entries)
+        for modified, size, path, partial in entries:
+            if now - modified < self.grace_period:
+                continue
+            expired = now - modified > self.max_age
+            if not expired and (partial or total <= self.max_bytes):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # E.g. a file still being downloaded on Windows; retried next time.
+                logger.warning("Could not remove export %s", path, exc_info=True)
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+__all__ = ["ExportCache"]
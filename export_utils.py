@@ -1,12 +1,27 @@
-"""Utilities to generate report exports in different formats."""
+"""Utilities to generate report exports in different formats.
+
+Exports are written straight into ``config.settings.EXPORT_DIR`` while the
+rows are consumed, so an export never holds the whole report in memory:
+Excel files are produced by a small streaming xlsx writer (see
+:class:`XlsxStreamWriter`) instead of a DataFrame, Parquet files are written
+one row group at a time, and CSV/JSON Lines exports can also be sent to the
+client while they are written (:meth:`ExportManager.stream`).
+"""
 
 from __future__ import annotations
 
+import csv
+import io
+import json
+import math
+import os
+import uuid
+import zipfile
 from dataclasses import dataclass
 from datetime import datetime
-from io import BytesIO
+from itertools import chain
 from pathlib import Path
-from typing import Iterable, List, Mapping, MutableMapping, Optional
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from config.settings import EXPORT_DIR
 
@@ -15,128 +30,568 @@ from config.settings import EXPORT_DIR
 class ExportResult:
     """Container for a generated export file."""
 
-    buffer: BytesIO
     filename: str
     mimetype: str
     path: Path
 
 
+_XML_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = (
+    _XML_DECLARATION
+    + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "{sheets}</Types>"
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    _XML_DECLARATION + f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+)
+# Regular and bold (header) cell formats.
+_STYLES = (
+    _XML_DECLARATION + f'<styleSheet xmlns="{_XML_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+# Markup characters are escaped and the control characters XML cannot carry
+# are dropped.
+_XML_TEXT = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        **{chr(code): None for code in range(32) if chr(code) not in "\t\n\r"},
+    }
+)
+
+
+# ``1,234.56`` -> ``1.234,56``
+_BR_NUMBER = str.maketrans({",": ".", ".": ","})
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class XlsxStreamWriter:
+    """Write rows to an ``.xlsx`` file as they arrive.
+
+    Each worksheet is compressed into the zip file while it is written, so
+    memory use does not depend on the number of rows. Values are stored as
+    numbers (``int``/``float``), booleans or inline strings; ``None`` leaves
+    the cell empty. Rows past Excel's limit continue on a new worksheet that
+    repeats the header.
+    """
+
+    MAX_ROWS = 1048576
+    FLUSH_ROWS = 1000
+
+    def __init__(self, output: IO[bytes], sheet_name: str, columns: Sequence[str]) -> None:
+        self._archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet_name = sheet_name
+        self._columns = list(columns)
+        self._letters = [_column_letter(index) for index in range(len(self._columns))]
+        self._sheets = 0
+        self._sheet = None
+        self._row = 0
+        self._pending: List[str] = []
+
+    def append(self, values: Sequence[object]) -> None:
+        if self._sheet is None or self._row >= self.MAX_ROWS:
+            self._start_sheet()
+        self._row += 1
+        self._pending.append(self._row_xml(self._row, values))
+        if len(self._pending) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def close(self) -> None:
+        if self._sheet is None:
+            self._start_sheet()
+        self._finish_sheet()
+        sheets = range(1, self._sheets + 1)
+        self._archive.writestr(
+            "[Content_Types].xml",
+            _CONTENT_TYPES.format(sheets="".join(_SHEET_CONTENT_TYPE.format(index=index) for index in sheets)),
+        )
+        self._archive.writestr("_rels/.rels", _ROOT_RELS)
+        self._archive.writestr("xl/styles.xml", _STYLES)
+        self._archive.writestr(
+            "xl/workbook.xml",
+            _XML_DECLARATION + f'<workbook xmlns="{_XML_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            + "".join(
+                f'<sheet name="{self._title(index)}" sheetId="{index}" r:id="rId{index}"/>' for index in sheets
+            )
+            + "</sheets></workbook>",
+        )
+        self._archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            _XML_DECLARATION + f'<Relationships xmlns="{_PKG_REL_NS}">'
+            + "".join(
+                f'<Relationship Id="rId{index}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{index}.xml"/>'
+                for index in sheets
+            )
+            + f'<Relationship Id="rId{self._sheets + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+            "</Relationships>",
+        )
+        self._archive.close()
+
+    def _title(self, index: int) -> str:
+        title = self._sheet_name if index == 1 else f"{self._sheet_name} ({index})"
+        return title.translate(_XML_TEXT).replace('"', "&quot;")
+
+    def _start_sheet(self) -> None:
+        if self._sheet is not None:
+            self._finish_sheet()
+        self._sheets += 1
+        self._sheet = self._archive.open(f"xl/worksheets/sheet{self._sheets}.xml", "w", force_zip64=True)
+        self._sheet.write((_XML_DECLARATION + f'<worksheet xmlns="{_XML_NS}"><sheetData>').encode("utf-8"))
+        self._row = 1
+        header = "".join(
+            f'<c r="{letter}1" t="inlineStr" s="1"><is><t>{str(name).translate(_XML_TEXT)}</t></is></c>'
+            for letter, name in zip(self._letters, self._columns)
+        )
+        self._pending.append(f'<row r="1">{header}</row>')
+
+    def _finish_sheet(self) -> None:
+        self._flush()
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._sheet.write("".join(self._pending).encode("utf-8"))
+            self._pending.clear()
+
+    def _row_xml(self, row: int, values: Sequence[object]) -> str:
+        cells = []
+        for letter, value in zip(self._letters, values):
+            kind = type(value)
+            if value is None:
+                continue
+            if kind is str:
+                cells.append(f'<c r="{letter}{row}" t="inlineStr"><is><t xml:space="preserve">{value.translate(_XML_TEXT)}</t></is></c>')
+            elif kind is float or kind is int:
+                if kind is int or math.isfinite(value):
+                    cells.append(f'<c r="{letter}{row}"><v>{value!r}</v></c>')
+                else:
+                    cells.append(f'<c r="{letter}{row}" t="inlineStr"><is><t>{value!r}</t></is></c>')
+            elif isinstance(value, bool):
+                cells.append(f'<c r="{letter}{row}" t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)) and math.isfinite(value):
+                cells.append(f'<c r="{letter}{row}"><v>{float(value)!r}</v></c>')
+            else:
+                text = str(value).translate(_XML_TEXT)
+                cells.append(f'<c r="{letter}{row}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        return f'<row r="{row}">{"".join(cells)}</row>'
+
+
 class ExportManager:
-    """Create binary exports for report data.
+    """Create exports of report data.
 
-    The manager centralises the creation of Excel and PDF files and stores a
-    copy of the generated file under ``config.settings.EXPORT_DIR`` so that the
-    backend keeps an audit trail of exported documents.
+    Every file is written under ``config.settings.EXPORT_DIR`` so that the
+    backend keeps an audit trail of exported documents, and is served from
+    there. ``FORMATS`` maps each format to its file extension and mimetype.
     """
 
     DEFAULT_BASENAME = "relatorio"
     EXCEL_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     PDF_MIMETYPE = "application/pdf"
+    FORMATS = {
+        "excel": ("xlsx", EXCEL_MIMETYPE),
+        "pdf": ("pdf", PDF_MIMETYPE),
+        "csv": ("csv", "text/csv"),
+        "jsonl": ("jsonl", "application/x-ndjson"),
+        "parquet": ("parquet", "application/vnd.apache.parquet"),
+    }
+    # Text formats that :meth:`stream` can send while they are written.
+    STREAMED_FORMATS = ("csv", "jsonl")
+    SHEET_NAME = "Relatório"
+    PDF_TITLE = "Relatório de Marcas e Lojas"
+    # Rows per PDF page, each page closed by its subtotal row.
+    PDF_ROWS_PER_PAGE = 30
+    # Rows per chunk of the text formats and per Parquet row group.
+    CHUNK_ROWS = 1000
+    PARQUET_ROW_GROUP = 65536
 
     def __init__(self, export_dir: Path | str = EXPORT_DIR) -> None:
         self.export_dir = Path(export_dir)
         self.export_dir.mkdir(parents=True, exist_ok=True)
 
-    def export(self, data: Iterable[Mapping[str, object]], fmt: str, *, filename: Optional[str] = None) -> ExportResult:
+    def export(
+        self,
+        data: Iterable[object],
+        fmt: str,
+        *,
+        filename: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> ExportResult:
         """Export ``data`` to ``fmt`` and return a :class:`ExportResult`.
 
         Parameters
         ----------
         data:
-            Iterable of dictionaries containing the rows that should be exported.
+            Iterable of rows, consumed once. Rows are dictionaries or, when
+            ``columns`` is given, sequences of values in that order (e.g.
+            rows of a SQLAlchemy result).
         fmt:
-            Either ``"excel"`` or ``"pdf"`` (case-insensitive).
+            One of ``FORMATS`` (case-insensitive).
         filename:
             Optional filename (with or without extension). When omitted a
             timestamped name is generated automatically.
+        columns:
+            Column headers for sequence rows. Without it the keys of the
+            first dictionary are used.
         """
 
-        normalized = [dict(row) for row in data]
-        fmt = (fmt or "").strip().lower()
-        if fmt not in {"excel", "pdf"}:
-            raise ValueError("Formato de exportação inválido. Use 'excel' ou 'pdf'.")
+        fmt, result = self._prepare(fmt, filename)
+        if fmt == "parquet":
+            self._require_pyarrow()
+        columns, rows = self._rows(data, columns)
+        partial_path = self._partial_path(result.path)
+        try:
+            with partial_path.open("wb") as output:
+                if fmt in self.STREAMED_FORMATS:
+                    output.writelines(self._text_chunks(fmt, columns, rows))
+                elif fmt == "excel":
+                    self._export_excel(columns, rows, output)
+                elif fmt == "parquet":
+                    self._export_parquet(columns, rows, output)
+                else:
+                    self._export_pdf(columns, rows, output)
+            os.replace(partial_path, result.path)
+        finally:
+            if partial_path.exists():
+                partial_path.unlink()
+        return result
+
+    def stream(
+        self,
+        data: Iterable[object],
+        fmt: str,
+        *,
+        filename: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Tuple[ExportResult, Iterator[bytes]]:
+        """Return the result and the chunks of a CSV or JSON Lines export.
+
+        Nothing is read from ``data`` until the chunks are iterated. Each
+        chunk is written to the export file as it is yielded; the file is
+        complete once the iterator is exhausted and is discarded if the
+        iterator is closed early (e.g. the client went away).
+        """
+
+        fmt, result = self._prepare(fmt, filename)
+        if fmt not in self.STREAMED_FORMATS:
+            raise ValueError("Somente as exportações CSV e JSON Lines podem ser enviadas em streaming.")
+
+        def chunks() -> Iterator[bytes]:
+            partial_path = self._partial_path(result.path)
+            try:
+                with partial_path.open("wb") as output:
+                    for chunk in self._text_chunks(fmt, *self._rows(data, columns)):
+                        output.write(chunk)
+                        yield chunk
+                os.replace(partial_path, result.path)
+            finally:
+                if partial_path.exists():
+                    partial_path.unlink()
+
+        return result, chunks()
+
+    def result_for(self, fmt: str, filename: Optional[str] = None) -> ExportResult:
+        """Return the :class:`ExportResult` an export to ``fmt`` named
+        ``filename`` produces, without exporting anything.
+
+        Raises ``ValueError`` for unknown formats.
+        """
 
+        return self._prepare(fmt, filename)[1]
+
+    # ------------------------------------------------------------------
+    # Helpers
+    def _prepare(self, fmt: str, filename: Optional[str]) -> Tuple[str, ExportResult]:
+        fmt = (fmt or "").strip().lower()
+        if fmt not in self.FORMATS:
+            raise ValueError("Formato de exportação inválido. Use " + ", ".join(f"'{name}'" for name in self.FORMATS) + ".")
         if filename:
             filename = self._ensure_extension(filename, fmt)
         else:
             filename = self._default_filename(fmt)
+        return fmt, ExportResult(filename=filename, mimetype=self.FORMATS[fmt][1], path=self.export_dir / filename)
 
-        if fmt == "excel":
-            buffer = self._export_excel(normalized)
-            mimetype = self.EXCEL_MIMETYPE
-        else:
-            buffer = self._export_pdf(normalized)
-            mimetype = self.PDF_MIMETYPE
-
-        path = self._persist_copy(buffer, filename)
-        buffer.seek(0)
-        return ExportResult(buffer=buffer, filename=filename, mimetype=mimetype, path=path)
+    @staticmethod
+    def _partial_path(path: Path) -> Path:
+        # Unique per export: concurrent requests may write the same file.
+        return path.with_name(f"{path.name}.{uuid.uuid4().hex[:12]}.part")
 
-    # ------------------------------------------------------------------
-    # Helpers
     def _default_filename(self, fmt: str) -> str:
-        extension = "xlsx" if fmt == "excel" else "pdf"
+        extension = self.FORMATS[fmt][0]
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         return f"{self.DEFAULT_BASENAME}_{timestamp}.{extension}"
 
     def _ensure_extension(self, filename: str, fmt: str) -> str:
         filename = filename.strip()
-        expected_ext = ".xlsx" if fmt == "excel" else ".pdf"
+        expected_ext = "." + self.FORMATS[fmt][0]
         if not filename.lower().endswith(expected_ext):
             filename = f"{filename}{expected_ext}"
         return filename
 
-    def _export_excel(self, data: List[MutableMapping[str, object]]) -> BytesIO:
-        from pandas import DataFrame, ExcelWriter
+    def _rows(
+        self, data: Iterable[object], columns: Optional[Sequence[str]]
+    ) -> Tuple[List[str], Iterator[Sequence[object]]]:
+        """Return the headers and the rows as value sequences, lazily."""
 
-        buffer = BytesIO()
-        columns = list(data[0].keys()) if data else []
-        df = DataFrame(data if data else [], columns=columns)
-        with ExcelWriter(buffer, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Relatório")
-        buffer.seek(0)
-        return buffer
+        if columns is not None:
+            return list(columns), iter(data)
+        records = iter(data)
+        first = next(records, None)
+        if first is None:
+            return [], iter(())
+        headers = list(first.keys())
+        return headers, ([row.get(column) for column in headers] for row in chain([first], records))
 
-    def _export_pdf(self, data: List[MutableMapping[str, object]]) -> BytesIO:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
-
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        elements = [Paragraph("Relatório de Marcas e Lojas", styles["Title"]), Spacer(1, 12)]
-
-        if data:
-            headers = list(data[0].keys())
-            rows = [[str(row.get(col, "")) for col in headers] for row in data]
-            table_data = [headers] + rows
+    @staticmethod
+    def _batches(rows: Iterator[Sequence[object]], size: int) -> Iterator[List[Sequence[object]]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _text_chunks(self, fmt: str, columns: List[str], rows: Iterator[Sequence[object]]) -> Iterator[bytes]:
+        """Yield the encoded CSV or JSON Lines export, ``CHUNK_ROWS`` rows at a time."""
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(columns)
+            for batch in self._batches(rows, self.CHUNK_ROWS):
+                writer.writerows(batch)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
         else:
-            table_data = [["Sem dados disponíveis"]]
-
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
-                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                ]
-            )
-        )
-        elements.append(table)
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer
+            dumps = json.JSONEncoder(ensure_ascii=False, default=str).encode
+            for batch in self._batches(rows, self.CHUNK_ROWS):
+                yield "".join(dumps(dict(zip(columns, row))) + "\n" for row in batch).encode("utf-8")
+
+    def _export_excel(self, columns: List[str], rows: Iterator[Sequence[object]], output: IO[bytes]) -> None:
+        writer = XlsxStreamWriter(output, self.SHEET_NAME, columns)
+        for row in rows:
+            writer.append(row)
+        writer.close()
+
+    @staticmethod
+    def _require_pyarrow() -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:  # pragma: no cover - depende do ambiente
+            raise ValueError("A exportação em Parquet exige o pacote 'pyarrow' instalado no servidor.") from exc
+
+    def _export_parquet(self, columns: List[str], rows: Iterator[Sequence[object]], output: IO[bytes]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Rows become Arrow record batches every ``CHUNK_ROWS`` rows, which are
+        # far smaller than the Python tuples, and a row group is written
+        # whenever ``PARQUET_ROW_GROUP`` rows are buffered. Column types are
+        # inferred from the first batch; a column that is empty there is
+        # stored as text.
+        schema = None
+        writer = None
+        pending = []
+        pending_rows = 0
+        try:
+            for batch in self._batches(rows, self.CHUNK_ROWS):
+                values = list(zip(*batch))
+                if schema is None:
+                    arrays = [pa.array(column) for column in values]
+                    schema = pa.schema(
+                        pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                        for name, array in zip(columns, arrays)
+                    )
+                    writer = pq.ParquetWriter(output, schema)
+                pending.append(
+                    pa.record_batch([pa.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema)
+                )
+                pending_rows += len(batch)
+                if pending_rows >= self.PARQUET_ROW_GROUP:
+                    writer.write_table(pa.Table.from_batches(pending), row_group_size=pending_rows)
+                    pending, pending_rows = [], 0
+            if writer is None:
+                writer = pq.ParquetWriter(output, pa.schema(pa.field(name, pa.string()) for name in columns))
+            elif pending:
+                writer.write_table(pa.Table.from_batches(pending), row_group_size=pending_rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _export_pdf(self, columns: List[str], rows: Iterator[Sequence[object]], output: IO[bytes]) -> None:
+        """Draw the rows as one fixed-size table per page.
+
+        Every page holds at most ``PDF_ROWS_PER_PAGE`` rows and ends with the
+        page subtotal of the numeric columns; the last page also carries the
+        grand total. Pages are drawn and released one at a time, so the time
+        grows linearly with the number of rows and memory stays flat. Rows are
+        set in a monospaced font, one text line per row, which keeps the
+        number of drawing operations per page small.
+        """
+
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        from reportlab.pdfgen.canvas import Canvas
+
+        font, bold, size = "Courier", "Courier-Bold", 8
+        page_width, page_height = landscape(A4)
+        margin = 36
+        row_height = 14
+        char_width = stringWidth("0", font, size)
+        count = max(len(columns), 1)
+        # Characters per column, including one blank on each side of the text.
+        width = int((page_width - 2 * margin) / char_width) // count
+        table_width = width * count * char_width
+        edges = [margin + index * width * char_width for index in range(count + 1)]
+
+        canvas = Canvas(output, pagesize=(page_width, page_height), pageCompression=1)
+        canvas.setTitle(self.PDF_TITLE)
+        numeric = [False] * len(columns)
+        totals = [0.0] * len(columns)
+
+        def fit(text: str, room: int) -> str:
+            return text if len(text) <= room else text[: room - 1] + "…"
+
+        def cell(index: int, text: str) -> str:
+            # One blank character on each side of the text.
+            text = fit(text, width - 2)
+            return " " + (text.rjust(width - 2) if numeric[index] else text.ljust(width - 2)) + " "
+
+        def line(values: Sequence[object], start: int = 0) -> str:
+            cells = []
+            for index, value in enumerate(values, start):
+                if value is None:
+                    text = ""
+                elif type(value) is float or type(value) is int:
+                    text = _format_number(value)
+                else:
+                    text = str(value)
+                cells.append(cell(index, text))
+            return "".join(cells)
+
+        def label_span() -> int:
+            # Footer labels take the leading text columns, which have no sums.
+            span = 0
+            while span < len(columns) and not numeric[span]:
+                span += 1
+            return span
+
+        def footer(label: str, sums: Sequence[float]) -> str:
+            span = label_span()
+            values = [total if numeric[index] else None for index, total in enumerate(sums)]
+            head = " " + fit(label, span * width - 2).ljust(span * width - 1) if span else ""
+            return head + line(values[span:], span)
+
+        def draw_page(number: int, page: List[Sequence[object]], last: bool) -> None:
+            sums = [0.0] * len(columns)
+            for row in page:
+                for index, value in enumerate(row):
+                    if (type(value) is float or type(value) is int) and math.isfinite(value):
+                        numeric[index] = True
+                        sums[index] += value
+            for index, total in enumerate(sums):
+                totals[index] += total
+
+            top = page_height - margin
+            canvas.setFont("Helvetica-Bold", 12)
+            canvas.drawString(margin, top - 12, self.PDF_TITLE)
+            header_y = top - 24 - row_height
+            footer_rows = 2 if last else 1
+            bottom = header_y - (len(page) + footer_rows) * row_height
+
+            # Backgrounds: header, zebra stripes, then the footer rows.
+            canvas.setFillColor(colors.lightgrey)
+            canvas.rect(margin, header_y, table_width, row_height, stroke=0, fill=1)
+            canvas.rect(margin, bottom, table_width, footer_rows * row_height, stroke=0, fill=1)
+            canvas.setFillColor(colors.whitesmoke)
+            for position in range(1, len(page), 2):
+                canvas.rect(margin, header_y - (position + 1) * row_height, table_width, row_height, stroke=0, fill=1)
+            canvas.setFillColor(colors.black)
+
+            text = canvas.beginText(margin, header_y + (row_height - size) / 2 + 1)
+            text.setFont(bold, size, row_height)
+            text.textLine(line([str(name) for name in columns]))
+            text.setFont(font, size, row_height)
+            for row in page:
+                text.textLine(line(row))
+            text.setFont(bold, size, row_height)
+            text.textLine(footer("Subtotal da página", sums))
+            if last:
+                text.textLine(footer("Total geral", totals))
+            canvas.drawText(text)
+
+            canvas.setStrokeColor(colors.grey)
+            canvas.setLineWidth(0.25)
+            lines = [header_y + row_height - step * row_height for step in range(len(page) + 2)]
+            canvas.grid(edges, lines)
+            canvas.grid([edges[0]] + edges[max(label_span(), 1) :], [lines[-1] - step * row_height for step in range(footer_rows + 1)])
+            canvas.setFont("Helvetica", size)
+            canvas.drawRightString(page_width - margin, margin / 2, f"Página {number}")
+            canvas.showPage()
+
+        number = 0
+        pages = self._batches(rows, self.PDF_ROWS_PER_PAGE)
+        page = next(pages, None)
+        if page is None:
+            canvas.setFont("Helvetica-Bold", 12)
+            canvas.drawString(margin, page_height - margin - 12, self.PDF_TITLE)
+            canvas.setFont("Helvetica", 10)
+            canvas.drawString(margin, page_height - margin - 36, "Sem dados disponíveis")
+            canvas.showPage()
+        while page is not None:
+            following = next(pages, None)
+            number += 1
+            draw_page(number, page, following is None)
+            page = following
+        canvas.save()
+
+
+def _format_number(value: float) -> str:
+    """Format ``value`` the Brazilian way (``1.234,56``)."""
 
-    def _persist_copy(self, buffer: BytesIO, filename: str) -> Path:
-        path = self.export_dir / filename
-        buffer.seek(0)
-        path.write_bytes(buffer.getvalue())
-        return path
+    if not math.isfinite(value):
+        return str(value)
+    return f"{value:,.2f}".translate(_BR_NUMBER)
 
 
-__all__ = ["ExportManager", "ExportResult"]
+__all__ = ["ExportManager", "ExportResult", "XlsxStreamWriter"]
@@ -7,7 +7,7 @@ import { FormField } from "@/components/ui/FormField";
 import { SelectInput } from "@/components/ui/SelectInput";
 import { TableSkeleton } from "@/components/ui/TableSkeleton";
 import { TextInput } from "@/components/ui/TextInput";
-import { listConnections, createConnection, deleteConnection } from "@/services/connections";
+import { listConnections, createConnection, deleteConnection, updateConnections } from "@/services/connections";
 import { listPartners, type PartnerRecord } from "@/services/partners";
 import { listStores, type StoreRecord } from "@/services/stores";
 import { useToast } from "@/contexts/ToastContext";
@@ -17,6 +17,8 @@ import styles from "./ConnectPage.module.css";
 
 type ConnectionView = {
   id: number;
+  partnerId: number;
+  storeId: number;
   partner: PartnerRecord | undefined;
   store: StoreRecord | undefined;
 };
@@ -107,6 +109,8 @@ export function ConnectPage() {
         setConnections(
           connectionList.map((connection) => ({
             id: connection.id,
+            partnerId: connection.partner_id,
+            storeId: connection.store_id,
             partner: partnerList.find((partner) => partner.id === connection.partner_id),
             store: storeList.find((store) => store.id === connection.store_id),
           })),
@@ -332,7 +336,12 @@ export function ConnectPage() {
 
       setIsBulkRemoving(true);
       try {
-        await Promise.all(selected.map((connection) => deleteConnection(connection.id)));
+        await updateConnections({
+          disconnect: selected.map((connection) => ({
+            partner_id: connection.partnerId,
+            store_id: connection.storeId,
+          })),
+        });
         const idsToRemove = new Set(selected.map((connection) => connection.id));
         setConnections((current) => current.filter((connection) => !idsToRemove.has(connection.id)));
         clearSelection();
@@ -1,4 +1,4 @@
-import { FormEvent, useCallback, useEffect, useMemo, useState } from "react";
+import { FormEvent, useCallback, useEffect, useMemo, useRef, useState } from "react";
 
 import { Button } from "@/components/ui/Button";
 import { Card } from "@/components/ui/Card";
@@ -20,7 +20,8 @@ import {
 import {
   createStore,
   deleteStore,
-  listStores,
+  listStorePage,
+  type StorePage,
   type StorePayload,
   type StoreRecord,
   updateStore,
@@ -132,6 +133,11 @@ function parseCurrency(value: string) {
 export function StoresPage() {
   const [brands, setBrands] = useState<BrandRecord[]>([]);
   const [stores, setStores] = useState<StoreRecord[]>([]);
+  const [storesCursor, setStoresCursor] = useState<string | null>(null);
+  const [isLoadingMoreStores, setIsLoadingMoreStores] = useState(false);
+  const [brandStores, setBrandStores] = useState<Record<number, StorePage>>({});
+  const loadingBrandIds = useRef<Set<number>>(new Set());
+  const brandStoresGeneration = useRef(0);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [brandForm, setBrandForm] = useState<BrandPayload>({ marca: "", cod_disagua: "" });
@@ -155,17 +161,23 @@ export function StoresPage() {
   const loadAll = useCallback(() => {
     setIsLoading(true);
     setError(null);
+    brandStoresGeneration.current += 1;
+    loadingBrandIds.current.clear();
 
-    return Promise.all([listBrands(), listStores()])
-      .then(([brandList, storeList]) => {
+    return Promise.all([listBrands(), listStorePage()])
+      .then(([brandList, storePage]) => {
         setBrands(brandList);
-        setStores(storeList);
+        setStores(storePage.stores);
+        setStoresCursor(storePage.hasMore ? storePage.nextCursor : null);
+        setBrandStores({});
       })
       .catch((err: unknown) => {
         const message = err instanceof Error ? err.message : "Não foi possível carregar marcas e lojas.";
         setError(message);
         setBrands([]);
         setStores([]);
+        setStoresCursor(null);
+        setBrandStores({});
         showError(message);
       })
       .finally(() => {
@@ -177,6 +189,61 @@ export function StoresPage() {
     loadAll();
   }, [loadAll]);
 
+  const handleLoadMoreStores = () => {
+    if (!storesCursor) {
+      return;
+    }
+    setIsLoadingMoreStores(true);
+    listStorePage({ cursor: storesCursor })
+      .then((storePage) => {
+        setStores((current) => [...current, ...storePage.stores]);
+        setStoresCursor(storePage.hasMore ? storePage.nextCursor : null);
+      })
+      .catch((err: unknown) => {
+        showError(err instanceof Error ? err.message : "Não foi possível carregar mais lojas.");
+      })
+      .finally(() => {
+        setIsLoadingMoreStores(false);
+      });
+  };
+
+  const loadBrandStores = useCallback(
+    (brandId: number, cursor: string | null = null) => {
+      if (loadingBrandIds.current.has(brandId)) {
+        return;
+      }
+      const generation = brandStoresGeneration.current;
+      loadingBrandIds.current.add(brandId);
+      listStorePage({ marcaId: brandId, cursor })
+        .then((storePage) => {
+          if (generation !== brandStoresGeneration.current) {
+            return;
+          }
+          setBrandStores((current) => {
+            const previous = cursor ? current[brandId]?.stores ?? [] : [];
+            return { ...current, [brandId]: { ...storePage, stores: [...previous, ...storePage.stores] } };
+          });
+        })
+        .catch((err: unknown) => {
+          showError(err instanceof Error ? err.message : "Não foi possível carregar as lojas da marca.");
+        })
+        .finally(() => {
+          if (generation === brandStoresGeneration.current) {
+            loadingBrandIds.current.delete(brandId);
+          }
+        });
+    },
+    [showError],
+  );
+
+  useEffect(() => {
+    expandedBrands.forEach((brandId) => {
+      if (!brandStores[brandId]) {
+        loadBrandStores(brandId);
+      }
+    });
+  }, [expandedBrands, brandStores, loadBrandStores]);
+
   const handleOpenImport = () => {
     setIsImportModalOpen(true);
   };
@@ -232,7 +299,7 @@ export function StoresPage() {
 
   const metrics = useMemo<SummaryMetric[]>(() => {
     const totalBrands = brands.length;
-    const totalStores = stores.length;
+    const totalStores = brands.reduce((total, brand) => total + brand.store_count, 0);
     const avgStoresPerBrand = totalBrands > 0 ? totalStores / totalBrands : 0;
     const topBrand = brands.reduce<BrandRecord | null>((prev, brand) => {
       if (!prev || brand.store_count > prev.store_count) {
@@ -241,16 +308,7 @@ export function StoresPage() {
       return prev;
     }, null);
 
-    const totalInvestimento = stores.reduce((total, store) => {
-      return (
-        total +
-        store.valor_20l +
-        store.valor_10l +
-        store.valor_1500ml +
-        store.valor_cx_copo +
-        store.valor_vasilhame
-      );
-    }, 0);
+    const totalInvestimento = brands.reduce((total, brand) => total + brand.store_value_total, 0);
 
     return [
       {
@@ -275,7 +333,7 @@ export function StoresPage() {
         icon: "💰",
       },
     ];
-  }, [brands, stores]);
+  }, [brands]);
 
   const storeColumns = useMemo<TableColumn<StoreRecord>[]>(
     () => [
@@ -634,7 +692,7 @@ export function StoresPage() {
 
             <div className={styles.brandList}>
               {orderedBrands.map((brand) => {
-                const brandStores = stores.filter((store) => store.marca_id === brand.id);
+                const brandPage = brandStores[brand.id];
                 const isExpanded = expandedBrands.has(brand.id);
                 return (
                   <details
@@ -664,7 +722,9 @@ export function StoresPage() {
                     </summary>
 
                     <div className={styles.storeContainer}>
-                      {brandStores.length === 0 ? (
+                      {!brandPage ? (
+                        <p className={styles.emptyState}>Carregando lojas...</p>
+                      ) : brandPage.stores.length === 0 ? (
                         <p className={styles.emptyState}>Nenhuma loja cadastrada para esta marca.</p>
                       ) : (
                         <table className={styles.storeTable}>
@@ -685,7 +745,7 @@ export function StoresPage() {
                             </tr>
                           </thead>
                           <tbody>
-                            {brandStores.map((store) => (
+                            {brandPage.stores.map((store) => (
                               <tr key={store.id}>
                                 <td>{store.loja}</td>
                                 <td>{store.cod_disagua ?? "—"}</td>
@@ -723,6 +783,18 @@ export function StoresPage() {
                           </tbody>
                         </table>
                       )}
+                      {brandPage?.hasMore ? (
+                        <div className={styles.loadMore}>
+                          <Button
+                            size="sm"
+                            variant="ghost"
+                            type="button"
+                            onClick={() => loadBrandStores(brand.id, brandPage.nextCursor)}
+                          >
+                            Carregar mais lojas
+                          </Button>
+                        </div>
+                      ) : null}
                     </div>
                   </details>
                 );
@@ -758,6 +830,19 @@ export function StoresPage() {
             {!isLoading && stores.length > 0 ? (
               <DataTable columns={storeColumns} data={stores} keyExtractor={(store) => store.id.toString()} />
             ) : null}
+            {!isLoading && storesCursor ? (
+              <div className={styles.loadMore}>
+                <Button
+                  type="button"
+                  variant="secondary"
+                  onClick={handleLoadMoreStores}
+                  isLoading={isLoadingMoreStores}
+                  loadingText="Carregando..."
+                >
+                  Carregar mais lojas
+                </Button>
+              </div>
+            ) : null}
           </Card>
         </section>
       </div>
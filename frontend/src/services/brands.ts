@@ -6,6 +6,7 @@ type BrandRecord = {
   marca: string;
   cod_disagua: string | null;
   store_count: number;
+  store_value_total: number;
 };
 
 type BrandPayload = {
@@ -42,3 +42,36 @@ export async function deleteConnection(id: number) {
   }
   return data;
 }
+
+export type ConnectionPair = {
+  partner_id: number;
+  store_id: number;
+};
+
+export type ConnectionOutcome = Partial<ConnectionPair> & {
+  status: string;
+  id?: number;
+};
+
+export type ConnectionBatchResult = {
+  created: number;
+  deleted: number;
+  error_count: number;
+  connect: ConnectionOutcome[];
+  disconnect: ConnectionOutcome[];
+};
+
+export async function updateConnections(changes: { connect?: ConnectionPair[]; disconnect?: ConnectionPair[] }) {
+  const response = await httpClient.post<ApiData<ConnectionBatchResult> | ConnectionBatchResult | null>(
+    "/api/connections/batch",
+    {
+      connect: changes.connect ?? [],
+      disconnect: changes.disconnect ?? [],
+    },
+  );
+  const data = unwrapData<ConnectionBatchResult>(response);
+  if (!data || typeof data !== "object") {
+    throw new Error("Resposta inválida ao atualizar conexões.");
+  }
+  return data;
+}
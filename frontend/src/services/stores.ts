@@ -41,6 +41,51 @@ export async function listStores() {
   return data;
 }
 
+export type StorePageFilters = {
+  marcaId?: number;
+  search?: string;
+  cursor?: string | null;
+  limit?: number;
+};
+
+export type StorePage = {
+  stores: StoreRecord[];
+  nextCursor: string | null;
+  hasMore: boolean;
+};
+
+type StorePageResponse = {
+  data: StoreRecord[];
+  meta?: { next_cursor?: string | null; has_more?: boolean };
+};
+
+export const STORE_PAGE_SIZE = 50;
+
+export async function listStorePage(filters: StorePageFilters = {}): Promise<StorePage> {
+  const params = new URLSearchParams();
+  params.set("sort", "loja");
+  params.set("limit", String(filters.limit ?? STORE_PAGE_SIZE));
+  if (filters.cursor) {
+    params.set("cursor", filters.cursor);
+  }
+  if (filters.marcaId !== undefined) {
+    params.set("marca_id", String(filters.marcaId));
+  }
+  if (filters.search) {
+    params.set("q", filters.search);
+  }
+
+  const response = await httpClient.get<StorePageResponse | null>(`/api/stores?${params.toString()}`);
+  if (!response || !Array.isArray(response.data)) {
+    throw new Error("Resposta inválida ao listar lojas.");
+  }
+  return {
+    stores: response.data,
+    nextCursor: response.meta?.next_cursor ?? null,
+    hasMore: Boolean(response.meta?.has_more),
+  };
+}
+
 export async function createStore(payload: StorePayload) {
   const response = await httpClient.post<ApiData<StoreRecord> | StoreRecord | null>("/api/stores", payload);
   const data = unwrapData<StoreRecord>(response);
@@ -0,0 +1,230 @@
+"""Streaming readers for the CSV and Excel files accepted by the imports.
+
+:func:`read_tabular_file` returns the header and a lazy iterator of rows
+(``{header: stripped value}``), so an import never holds the whole file as a
+DataFrame or as a list of rows. The readers reproduce what the previous
+pandas based loader returned:
+
+* CSV follows ``pandas.read_csv(sep=None, engine="python", dtype=str)``: the
+  delimiter is sniffed from the first line and blank lines are skipped.
+* ``.xlsx`` sheets are streamed with openpyxl in read-only mode and ``.xls``
+  files are read with xlrd; only the first sheet is imported and numbers are
+  rendered like pandas did (``5.0`` becomes ``"5"``).
+
+In both cases unnamed headers become ``Unnamed: <n>`` and repeated headers get
+``.1``, ``.2`` suffixes.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+READ_ERROR_MESSAGE = "Não foi possível ler o arquivo. Use um CSV ou Excel válido."
+
+
+class TabularFileError(ValueError):
+    """The upload cannot be read; the message is shown to the user."""
+
+
+Row = Dict[str, str]
+
+
+def _dedupe_headers(headers: Sequence[str]) -> List[str]:
+    names = []
+    counts: Dict[str, int] = defaultdict(int)
+    for position, name in enumerate(headers):
+        name = name if name != "" else f"Unnamed: {position}"
+        count = counts[name]
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts[name]
+        counts[name] = count + 1
+        names.append(name)
+    return names
+
+
+def _clean_value(value) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _rows(headers: Sequence[str], records: Iterable[Sequence[object]]) -> Iterator[Row]:
+    keys = [header.strip() for header in headers]
+    for values in records:
+        row = {}
+        for key, value in zip(keys, values):
+            if key:
+                row[key] = _clean_value(value)
+        # Missing trailing fields read as empty values.
+        for key in keys[len(values) :]:
+            if key:
+                row[key] = ""
+        if row:
+            yield row
+
+
+def _is_blank(record: Sequence[str]) -> bool:
+    return not record or (len(record) == 1 and not record[0].strip())
+
+
+def _read_csv(stream) -> Tuple[List[str], Iterator[Row]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        first_line = text.readline()
+        delimiter = csv.Sniffer().sniff(first_line).delimiter
+        header_reader = csv.reader([first_line], delimiter=delimiter, quotechar='"', doublequote=True, strict=True)
+        headers = next(header_reader, [])
+    except (csv.Error, UnicodeDecodeError) as exc:
+        text.detach()
+        raise TabularFileError(READ_ERROR_MESSAGE) from exc
+
+    headers = _dedupe_headers(headers)
+
+    def records() -> Iterator[List[str]]:
+        reader = csv.reader(text, delimiter=delimiter, quotechar='"', doublequote=True, strict=True)
+        try:
+            for record in reader:
+                if _is_blank(record):
+                    continue
+                if len(record) > len(headers):
+                    raise TabularFileError(READ_ERROR_MESSAGE)
+                yield record
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise TabularFileError(READ_ERROR_MESSAGE) from exc
+        finally:
+            # Leave the upload stream open for its owner.
+            text.detach()
+
+    return headers, _rows(headers, records())
+
+
+def _excel_value(value):
+    """Convert a cell value the way pandas' Excel readers did (``5.0`` becomes ``5``)."""
+
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        integer = int(value)
+        return integer if integer == value else value
+    return value
+
+
+def _excel_header(values: Sequence[object]) -> List[str]:
+    return _dedupe_headers([str(value) for value in values])
+
+
+def _read_xlsx(stream) -> Tuple[List[str], Iterator[Row]]:
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    def convert(value):
+        # ``values_only`` hands error cells (``#N/A``...) over as their code.
+        if isinstance(value, str) and value in ERROR_CODES:
+            return ""
+        return _excel_value(value)
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True, keep_links=False)
+        sheet = workbook.worksheets[0]
+        # Saved dimensions are often wrong; read each row up to its last cell.
+        sheet.reset_dimensions()
+        values = sheet.iter_rows(values_only=True)
+        header_values = next(values, ())
+    except Exception as exc:  # pragma: no cover - leitura de arquivo depende da entrada
+        raise TabularFileError(READ_ERROR_MESSAGE) from exc
+
+    headers = _excel_header([convert(value) for value in header_values])
+
+    def records() -> Iterator[List[object]]:
+        try:
+            for row in values:
+                yield [convert(value) for value in row]
+        except Exception as exc:  # pragma: no cover - leitura de arquivo depende da entrada
+            raise TabularFileError(READ_ERROR_MESSAGE) from exc
+        finally:
+            workbook.close()
+
+    return headers, _rows(headers, records())
+
+
+def _read_xls(stream) -> Tuple[List[str], Iterator[Row]]:
+    try:
+        import xlrd
+    except ImportError as exc:  # pragma: no cover - depende do ambiente
+        raise TabularFileError("Arquivos .xls exigem o pacote 'xlrd' instalado no servidor.") from exc
+
+    try:
+        # BIFF files need random access, so the whole file is read, but only
+        # the first sheet is parsed (``on_demand``).
+        book = xlrd.open_workbook(file_contents=stream.read(), on_demand=True)
+        sheet = book.sheet_by_index(0)
+    except Exception as exc:  # pragma: no cover - leitura de arquivo depende da entrada
+        raise TabularFileError(READ_ERROR_MESSAGE) from exc
+
+    def convert(cell):
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            moment = xlrd.xldate.xldate_as_datetime(cell.value, book.datemode)
+            # Time-only cells have no date part (serial below 1).
+            return moment.time() if 0 <= cell.value < 1 else moment
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return ""
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        return _excel_value(cell.value)
+
+    headers = _excel_header([convert(cell) for cell in sheet.row(0)] if sheet.nrows else [])
+
+    def records() -> Iterator[List[object]]:
+        try:
+            for index in range(1, sheet.nrows):
+                yield [convert(cell) for cell in sheet.row(index)]
+        finally:
+            book.release_resources()
+
+    return headers, _rows(headers, records())
+
+
+def file_digest(upload_file) -> str:
+    """Return the SHA-256 hex digest of the uploaded file's content."""
+
+    stream = upload_file.stream
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def read_tabular_file(upload_file) -> Tuple[List[str], Iterator[Row]]:
+    """Return ``(columns, rows)`` for an uploaded CSV or Excel file.
+
+    ``columns`` lists the non-blank headers. ``rows`` is consumed lazily from
+    the upload stream; it raises :class:`TabularFileError` if the file turns
+    out to be malformed further down.
+    """
+
+    filename = (upload_file.filename or "").lower()
+    if not filename:
+        raise TabularFileError("Selecione um arquivo válido para importar.")
+
+    upload_file.stream.seek(0)
+    if filename.endswith(".xlsx"):
+        headers, rows = _read_xlsx(upload_file.stream)
+    elif filename.endswith(".xls"):
+        headers, rows = _read_xls(upload_file.stream)
+    else:
+        headers, rows = _read_csv(upload_file.stream)
+    columns = [header.strip() for header in headers if header.strip()]
+    return columns, rows
+
+
+__all__ = ["READ_ERROR_MESSAGE", "TabularFileError", "file_digest", "read_tabular_file"]
@@ -0,0 +1,205 @@
+"""Background jobs persisted in the ``background_jobs`` table.
+
+A :class:`JobRunner` owns a bounded thread pool. Endpoints create a job row,
+hand the work to :meth:`JobRunner.submit` and answer right away with the job
+id; the work function reports its phase and counters through a
+:class:`JobProgress` and returns the final summary. Every state change is
+committed, so status polling (and a restarted server) sees the same data.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy import func, select, update
+
+from models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Minimum number of seconds between two progress writes of the same job.
+PROGRESS_INTERVAL = 0.5
+
+INTERRUPTED_MESSAGE = "Processamento interrompido pela reinicialização do servidor. Envie o arquivo novamente."
+UNEXPECTED_MESSAGE = "Falha inesperada durante o processamento."
+
+
+class JobError(ValueError):
+    """Expected failure whose message (and ``details``) is shown to the user."""
+
+    def __init__(self, message: str, *, details: Optional[object] = None) -> None:
+        super().__init__(message)
+        self.details = details
+
+
+def _load_json(value: Optional[str]):
+    return json.loads(value) if value else None
+
+
+def serialize_job(job: BackgroundJob) -> Dict[str, object]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "phase": job.phase,
+        "filename": job.filename,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "created": job.created_count,
+        "updated": job.updated_count,
+        "error_count": job.error_count,
+        "result": _load_json(job.result),
+        "error": _load_json(job.error),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobProgress:
+    """Handle given to a work function to report how far it got.
+
+    Phase changes are written immediately; counter updates at most every
+    :data:`PROGRESS_INTERVAL` seconds.
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str) -> None:
+        self._runner = runner
+        self._job_id = job_id
+        self._last_write = 0.0
+
+    def phase(self, name: str, *, total_rows: Optional[int] = None) -> None:
+        values = {"phase": name}
+        if total_rows is not None:
+            values["total_rows"] = total_rows
+        self._write(values)
+
+    def advance(
+        self,
+        processed_rows: int,
+        *,
+        created: Optional[int] = None,
+        updated: Optional[int] = None,
+        errors: Optional[int] = None,
+        force: bool = False,
+    ) -> None:
+        if not force and time.monotonic() - self._last_write < PROGRESS_INTERVAL:
+            return
+        values = {"processed_rows": processed_rows}
+        for column, value in (("created_count", created), ("updated_count", updated), ("error_count", errors)):
+            if value is not None:
+                values[column] = value
+        self._write(values)
+
+    def _write(self, values: Dict[str, object]) -> None:
+        self._runner.update(self._job_id, **values)
+        self._last_write = time.monotonic()
+
+
+class JobRunner:
+    """Run job functions on a bounded pool and keep their rows up to date.
+
+    ``session_factory`` must create independent sessions (not a
+    ``scoped_session``): bookkeeping commits must never touch the session the
+    work function itself is using in the same thread.
+    """
+
+    def __init__(self, session_factory, max_workers: int = 2) -> None:
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+
+    def create(self, kind: str, *, created_by: Optional[int] = None, filename: Optional[str] = None) -> Dict[str, object]:
+        with self._session_factory() as s:
+            job = BackgroundJob(
+                id=uuid.uuid4().hex,
+                kind=kind,
+                status="queued",
+                phase="queued",
+                filename=filename,
+                created_by=created_by,
+            )
+            s.add(job)
+            s.commit()
+            return serialize_job(job)
+
+    def submit(self, job_id: str, func: Callable[..., Dict[str, object]], *args, **kwargs) -> None:
+        """Run ``func(progress, *args, **kwargs)`` for ``job_id`` on the pool.
+
+        The returned value becomes the job ``result``; counters are whatever
+        ``func`` last reported through its :class:`JobProgress`.
+        """
+
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+
+    def get(self, job_id: str) -> Optional[BackgroundJob]:
+        with self._session_factory() as s:
+            job = s.get(BackgroundJob, job_id)
+            if job is not None:
+                s.expunge(job)
+            return job
+
+    def update(self, job_id: str, **values) -> None:
+        with self._session_factory() as s:
+            s.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+            s.commit()
+
+    def count_active(self, kind: str, *, created_by: Optional[int] = None) -> int:
+        """Number of ``kind`` jobs queued or running (for ``created_by``, if given)."""
+
+        query = select(func.count()).where(BackgroundJob.kind == kind, BackgroundJob.status.in_(ACTIVE_STATUSES))
+        if created_by is not None:
+            query = query.where(BackgroundJob.created_by == created_by)
+        with self._session_factory() as s:
+            return s.scalar(query)
+
+    def mark_interrupted(self, kinds: Optional[Sequence[str]] = None, message: str = INTERRUPTED_MESSAGE) -> int:
+        """Flag jobs left queued/running by a previous process (only ``kinds``,
+        if given). Returns how many."""
+
+        query = update(BackgroundJob).where(BackgroundJob.status.in_(ACTIVE_STATUSES))
+        if kinds is not None:
+            query = query.where(BackgroundJob.kind.in_(kinds))
+        with self._session_factory() as s:
+            result = s.execute(
+                query.values(
+                    status="interrupted",
+                    finished_at=datetime.utcnow(),
+                    error=json.dumps({"message": message}, ensure_ascii=False),
+                )
+            )
+            s.commit()
+            return result.rowcount
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id: str, func, args, kwargs) -> None:
+        self.update(job_id, status="running", phase="running", started_at=datetime.utcnow())
+        try:
+            summary = func(JobProgress(self, job_id), *args, **kwargs)
+        except ValueError as exc:
+            error = {"message": str(exc)}
+            if getattr(exc, "details", None) is not None:
+                error["details"] = exc.details
+            self._finish(job_id, status="failed", error=error)
+        except Exception:
+            logger.exception("Background job %s failed", job_id)
+            self._finish(job_id, status="failed", error={"message": UNEXPECTED_MESSAGE})
+        else:
+            self._finish(job_id, status="succeeded", result=json.dumps(summary, ensure_ascii=False, default=str))
+
+    def _finish(self, job_id: str, *, status: str, error: Optional[Dict[str, object]] = None, **values) -> None:
+        if error is not None:
+            values["error"] = json.dumps(error, ensure_ascii=False)
+        self.update(job_id, status=status, phase="done", finished_at=datetime.utcnow(), **values)
+
+
+__all__ = ["JobError", "JobProgress", "JobRunner", "serialize_job"]
@@ -1,6 +1,6 @@
 
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, DateTime, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, DateTime, UniqueConstraint, Boolean, Index, Text, func
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -24,7 +24,9 @@ class Partner(Base):
     vinte_litros = Column(Float, default=0.0)
     mil_quinhentos_ml = Column(Float, default=0.0)
     vasilhame = Column(Float, default=0.0)
+    content_hash = Column(String)  # fingerprint of the values last imported; cleared by manual edits
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_partners_cnpj_cpf", cnpj_cpf),)
 
 class Brand(Base):
     __tablename__ = "brands"
@@ -32,6 +34,10 @@ class Brand(Base):
     marca = Column(String, nullable=False, unique=True)
     cod_disagua = Column(String)
     stores = relationship("Store", back_populates="brand", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index("ix_brands_marca_lower", func.lower(marca)),
+        Index("ix_brands_cod_disagua", cod_disagua),
+    )
 
 class Store(Base):
     __tablename__ = "stores"
@@ -48,14 +54,22 @@ class Store(Base):
     valor_1500ml = Column(Float, default=0.0)
     valor_cx_copo = Column(Float, default=0.0)
     valor_vasilhame = Column(Float, default=0.0)
+    content_hash = Column(String)  # fingerprint of the values last imported; cleared by manual edits
     brand = relationship("Brand", back_populates="stores")
+    __table_args__ = (
+        Index("ix_stores_cod_disagua", cod_disagua),
+        Index("ix_stores_marca_id_loja_lower", marca_id, func.lower(loja)),
+    )
 
 class Connection(Base):
     __tablename__ = "connections"
     id = Column(Integer, primary_key=True)
     partner_id = Column(Integer, ForeignKey("partners.id"), nullable=False)
     store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
-    __table_args__ = (UniqueConstraint('partner_id', 'store_id', name='uq_partner_store'),)
+    __table_args__ = (
+        UniqueConstraint('partner_id', 'store_id', name='uq_partner_store'),
+        Index("ix_connections_store_id", store_id),
+    )
 
 class ReportEntry(Base):
     __tablename__ = "report_entries"
@@ -68,6 +82,24 @@ class ReportEntry(Base):
     valor_1500ml = Column(Float, default=0.0)
     valor_cx_copo = Column(Float, default=0.0)
     valor_vasilhame = Column(Float, default=0.0)
+    __table_args__ = (
+        Index("ix_report_entries_data", data),
+        Index("ix_report_entries_marca_data", marca, data),
+    )
+
+class ReportDailyRollup(Base):
+    """Per-day totals of ``report_entries`` for each (data, marca, loja)."""
+    __tablename__ = "report_daily_rollups"
+    data = Column(Date, primary_key=True)
+    marca = Column(String, primary_key=True)
+    loja = Column(String, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+    valor_20l = Column(Float, nullable=False, default=0.0)
+    valor_10l = Column(Float, nullable=False, default=0.0)
+    valor_1500ml = Column(Float, nullable=False, default=0.0)
+    valor_cx_copo = Column(Float, nullable=False, default=0.0)
+    valor_vasilhame = Column(Float, nullable=False, default=0.0)
+    __table_args__ = (Index("ix_report_daily_rollups_marca_data", marca, data),)
 
 class ReceiptImage(Base):
     __tablename__ = "receipt_images"
@@ -76,6 +108,7 @@ class ReceiptImage(Base):
     filename = Column(String, nullable=False)
     size_bytes = Column(Integer, default=0)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_receipt_images_uploaded_at", uploaded_at),)
 
 class User(Base):
     __tablename__ = "users"
@@ -84,3 +117,38 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     role = Column(String, default='operator')  # admin | operator | viewer
     is_active = Column(Boolean, default=True)
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class BackgroundJob(Base):
+    """Work processed outside the HTTP request (e.g. imports), see ``jobs.py``."""
+    __tablename__ = "background_jobs"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued | running | succeeded | failed | interrupted
+    phase = Column(String)
+    filename = Column(String)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    total_rows = Column(Integer)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    created_count = Column(Integer, nullable=False, default=0)
+    updated_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    result = Column(Text)  # JSON encoded summary
+    error = Column(Text)  # JSON encoded {"message": ..., "details": ...}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    __table_args__ = (Index("ix_background_jobs_status", status),)
+
+class ImportDigest(Base):
+    """Last file imported per import kind, to recognise it when sent again."""
+    __tablename__ = "import_digests"
+    kind = Column(String, primary_key=True)
+    digest = Column(String, nullable=False)  # SHA-256 of the file
+    data_versions = Column(Text, nullable=False)  # JSON encoded {table: version} right after the import
+    summary = Column(Text, nullable=False)  # JSON encoded summary of the import
+    imported_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,171 @@
+"""Report export query and the process pool that renders PDF exports.
+
+Laying out a PDF is CPU bound Python: rendered on a request thread it holds
+the GIL for the whole export and stalls every other request served by the
+process. :class:`ReportRenderPool` renders in worker processes instead. Each
+worker opens its own connection, runs :func:`report_export_query` and writes
+the file to the export directory, so only the filters and the resulting
+:class:`~export_utils.ExportResult` cross the process boundary.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.orm import Session, sessionmaker
+
+from config.settings import EXPORT_DIR, PDF_WORKERS
+from export_utils import ExportManager, ExportResult
+from jobs import JobProgress, JobRunner
+from models import ReportEntry
+from storage import create_storage_engine
+
+EXPORT_COLUMNS = (
+    "Marca",
+    "Loja",
+    "Data",
+    "Valor 20L",
+    "Valor 10L",
+    "Valor 1500ML",
+    "Valor CX Copo",
+    "Valor Vasilhame",
+    "Total",
+)
+
+# Rows fetched per round trip while an export is written.
+EXPORT_BATCH_SIZE = 1000
+
+
+def report_export_query(*, start: Optional[date] = None, end: Optional[date] = None, marca: Optional[str] = None):
+    """Return the select producing the ``EXPORT_COLUMNS`` rows, in entry order."""
+
+    values = [
+        ReportEntry.valor_20l,
+        ReportEntry.valor_10l,
+        ReportEntry.valor_1500ml,
+        ReportEntry.valor_cx_copo,
+        ReportEntry.valor_vasilhame,
+    ]
+    total = sum((func.coalesce(value, 0.0) for value in values[1:]), func.coalesce(values[0], 0.0))
+    query = select(
+        ReportEntry.marca,
+        ReportEntry.loja,
+        # Dates are stored as ``YYYY-MM-DD`` text, which is already their isoformat().
+        type_coerce(ReportEntry.data, String),
+        *values,
+        total,
+    )
+    if start:
+        query = query.where(ReportEntry.data >= start)
+    if end:
+        query = query.where(ReportEntry.data <= end)
+    if marca:
+        query = query.where(ReportEntry.marca == marca)
+    return query.order_by(ReportEntry.id)
+
+
+@lru_cache(maxsize=None)
+def _engine(db_path: str, profile: Optional[str]):
+    # One engine per worker process and database.
+    return create_storage_engine(db_path, profile)
+
+
+@lru_cache(maxsize=None)
+def _job_runner(db_path: str, profile: Optional[str]) -> JobRunner:
+    # Only used to record progress; nothing is submitted to its pool.
+    return JobRunner(sessionmaker(bind=_engine(db_path, profile), future=True), 1)
+
+
+def _counted(rows, progress: JobProgress):
+    processed = 0
+    for processed, row in enumerate(rows, start=1):
+        yield row
+        if processed % EXPORT_BATCH_SIZE == 0:
+            progress.advance(processed)
+    progress.advance(processed, force=True)
+
+
+def export_report(
+    db_path: str,
+    fmt: str,
+    *,
+    profile: Optional[str] = None,
+    export_dir: Path | str = EXPORT_DIR,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    marca: Optional[str] = None,
+    filename: Optional[str] = None,
+    job_id: Optional[str] = None,
+) -> ExportResult:
+    """Export the filtered report entries of ``db_path`` to ``fmt``.
+
+    Runs in the calling process; :class:`ReportRenderPool` calls it in a
+    worker process. With ``job_id`` the matching background job gets the
+    number of rows to export (``total_rows``) and, as the export goes, the
+    number of rows written (``processed_rows``).
+    """
+
+    query = report_export_query(start=start, end=end, marca=marca)
+    with Session(_engine(db_path, profile)) as s:
+        progress = None
+        if job_id is not None:
+            # Counted in the same read transaction as the rows themselves.
+            progress = JobProgress(_job_runner(db_path, profile), job_id)
+            total = s.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+            progress.phase("rendering", total_rows=total)
+        rows = s.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if progress is not None:
+            rows = _counted(rows, progress)
+        return ExportManager(export_dir).export(rows, fmt, filename=filename, columns=EXPORT_COLUMNS)
+
+
+class ReportRenderPool:
+    """Run :func:`export_report` on a bounded pool of worker processes.
+
+    Workers are started with ``spawn`` (forking a threaded server is unsafe)
+    on first use and are reused afterwards. Exports beyond ``max_workers``
+    wait in the queue.
+    """
+
+    def __init__(self, db_path: str, profile: Optional[str] = None, max_workers: int = PDF_WORKERS) -> None:
+        self._db_path = db_path
+        self._profile = profile
+        self._max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def submit(self, fmt: str, *, export_dir: Path | str = EXPORT_DIR, **options) -> "Future[ExportResult]":
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            executor = self._executor
+        return executor.submit(
+            export_report, self._db_path, fmt, profile=self._profile, export_dir=str(export_dir), **options
+        )
+
+    def render(self, fmt: str, *, export_dir: Path | str = EXPORT_DIR, **options) -> ExportResult:
+        """Export in a worker process and wait for the result.
+
+        The calling thread only waits, without holding the GIL. Errors raised
+        by the export (e.g. ``ValueError``) are re-raised here.
+        """
+
+        return self.submit(fmt, export_dir=export_dir, **options).result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+__all__ = ["EXPORT_COLUMNS", "ReportRenderPool", "export_report", "report_export_query"]
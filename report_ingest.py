@@ -0,0 +1,304 @@
+"""Bulk ingestion of report entries from CSV or JSON Lines files.
+
+:func:`read_report_records` walks the file once and yields every non-blank
+line as a record (or the reason it cannot be read). :func:`ingest_report_entries`
+checks each record against the registered brands and stores and inserts the
+accepted ones in large transactions, adding them to the daily rollup in the
+same transaction. Memory use is bounded by the transaction size, not by the
+size of the file.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from models import Brand, ReportEntry, Store
+from reporting import VALUE_COLUMNS, apply_rollup
+
+FORMATS = ("csv", "jsonl")
+DECIMAL_SEPARATORS = (",", ".")
+REQUIRED_FIELDS = ("marca", "loja", "data")
+
+# Rows inserted (and added to the rollup) per transaction.
+TRANSACTION_SIZE = 20000
+# Rejected lines listed in the summary; ``rejected`` always has the full count.
+MAX_LISTED_REJECTIONS = 1000
+
+Record = Dict[str, object]
+
+# The decimal separator is chosen once per file, never guessed per value: a
+# CSV separated by ``;`` is Brazilian (``1.234,56``: ``.`` groups thousands),
+# any other file uses a decimal point (``12.345``, as the CSV export writes).
+_SPACES = str.maketrans({"\u00a0": None, " ": None})
+_COMMA_DECIMAL = str.maketrans({".": None, ",": "."})
+
+
+class ReportIngestError(ValueError):
+    """The file cannot be ingested; the message is shown to the user."""
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    """Return ``"csv"`` or ``"jsonl"`` from ``requested`` or the file extension."""
+
+    if requested:
+        requested = requested.strip().lower()
+        if requested not in FORMATS:
+            raise ReportIngestError("Formato inválido. Use 'csv' ou 'jsonl'.")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith((".csv", ".txt")):
+        return "csv"
+    raise ReportIngestError("Envie um arquivo .csv ou .jsonl.")
+
+
+def _column_name(name) -> str:
+    # ``Valor 20L`` (the export's header) and ``valor_20l`` name the same column.
+    return "_".join(str(name).lower().split())
+
+
+def check_decimal(requested: Optional[str]) -> Optional[str]:
+    """Return the decimal separator ``requested`` by the user, ``None`` if empty."""
+
+    if not requested:
+        return None
+    requested = requested.strip()
+    if requested not in DECIMAL_SEPARATORS:
+        raise ReportIngestError("Separador decimal inválido. Use ',' ou '.'.")
+    return requested
+
+
+def _with_dot_decimals(record: Record) -> Record:
+    # Rewrite the text values of a comma-decimal file as ``float()`` reads them.
+    for column in VALUE_COLUMNS:
+        value = record.get(column)
+        if isinstance(value, str):
+            record[column] = value.translate(_COMMA_DECIMAL)
+    return record
+
+
+def _csv_records(text, decimal) -> Iterator[Tuple[int, Optional[Record], Optional[str]]]:
+    first_line = text.readline()
+    try:
+        delimiter = csv.Sniffer().sniff(first_line, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    if decimal is None:
+        decimal = "," if delimiter == ";" else "."
+    headers = [_column_name(name) for name in next(csv.reader([first_line], delimiter=delimiter), [])]
+    missing = [field for field in REQUIRED_FIELDS if field not in headers]
+    if missing:
+        raise ReportIngestError("Colunas obrigatórias ausentes no arquivo: " + ", ".join(missing))
+
+    reader = csv.reader(text, delimiter=delimiter)
+    consumed = 1
+    for values in reader:
+        # ``line_num`` counts physical lines (quoted line breaks included).
+        line, consumed = consumed + 1, reader.line_num + 1
+        if not values or (len(values) == 1 and not values[0].strip()):
+            continue
+        if len(values) > len(headers):
+            yield line, None, "Linha com mais colunas que o cabeçalho."
+            continue
+        record = dict(zip(headers, values))
+        yield line, _with_dot_decimals(record) if decimal == "," else record, None
+
+
+def _jsonl_records(text, decimal) -> Iterator[Tuple[int, Optional[Record], Optional[str]]]:
+    for line, content in enumerate(text, start=1):
+        if not content.strip():
+            continue
+        try:
+            record = json.loads(content)
+        except ValueError:
+            yield line, None, "JSON inválido."
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "Cada linha deve conter um objeto JSON."
+            continue
+        record = {_column_name(key): value for key, value in record.items()}
+        yield line, _with_dot_decimals(record) if decimal == "," else record, None
+
+
+def read_report_records(
+    stream, file_format: str, decimal: Optional[str] = None
+) -> Iterator[Tuple[int, Optional[Record], Optional[str]]]:
+    """Yield ``(line, record, error)`` for every non-blank line of ``stream``.
+
+    ``stream`` is a binary file object read as UTF-8; ``error`` is set (and
+    ``record`` is ``None``) for lines that cannot be parsed at all. Numbers in
+    text use ``decimal`` as the decimal separator; by default ``,`` for CSV
+    files separated by ``;`` and ``.`` for everything else.
+    """
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    records = _csv_records(text, decimal) if file_format == "csv" else _jsonl_records(text, decimal)
+    try:
+        yield from records
+    except UnicodeDecodeError as exc:
+        raise ReportIngestError("O arquivo deve estar codificado em UTF-8.") from exc
+    finally:
+        # Leave the upload stream open for its owner.
+        text.detach()
+
+
+def _fold(value: str) -> str:
+    # Same folding as SQLite's lower(): ASCII letters only.
+    if value.isascii():
+        return value.lower()
+    return "".join(ch.lower() if ch.isascii() else ch for ch in value)
+
+
+def load_store_names(session: Session) -> Tuple[set, Dict[Tuple[str, str], Tuple[str, str]]]:
+    """Return the folded brand names and ``{(marca, loja): registered names}``."""
+
+    brands = {_fold(name) for name in session.execute(select(Brand.marca)).scalars() if name}
+    stores = {}
+    for marca, loja in session.execute(select(Brand.marca, Store.loja).join(Store, Store.marca_id == Brand.id)):
+        if marca and loja:
+            stores.setdefault((_fold(marca), _fold(loja)), (marca, loja))
+    return brands, stores
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    return value.strip() if isinstance(value, str) else str(value).strip()
+
+
+def _parse_date(value) -> date:
+    value = _text(value)
+    if "/" in value:
+        return datetime.strptime(value, "%d/%m/%Y").date()
+    # ``2024-01-31``, optionally followed by a time (``2024-01-31T00:00:00``).
+    return date.fromisoformat(value[:10] if len(value) > 10 and value[10] in "T " else value)
+
+
+def _parse_value(value) -> float:
+    if value is None:
+        return 0.0
+    if type(value) is str:
+        value = value.strip()
+        if not value:
+            return 0.0
+        value = value.translate(_SPACES)
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(value)
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+def parse_report_record(record: Record, brands: set, stores: Dict) -> Tuple[Optional[Record], Optional[str]]:
+    """Return ``(entry, None)`` for a valid record or ``(None, message)``."""
+
+    marca = _text(record.get("marca"))
+    loja = _text(record.get("loja"))
+    missing = [field for field, value in (("marca", marca), ("loja", loja)) if not value]
+    if not _text(record.get("data")):
+        missing.append("data")
+    if missing:
+        return None, "Campos obrigatórios ausentes: " + ", ".join(missing)
+
+    names = stores.get((_fold(marca), _fold(loja)))
+    if names is None:
+        if _fold(marca) not in brands:
+            return None, f"Marca '{marca}' não cadastrada."
+        return None, f"Loja '{loja}' não cadastrada para a marca '{marca}'."
+
+    try:
+        day = _parse_date(record.get("data"))
+    except ValueError:
+        return None, "Campo 'data' deve estar no formato AAAA-MM-DD ou DD/MM/AAAA."
+
+    entry: Record = {"marca": names[0], "loja": names[1], "data": day}
+    for column in VALUE_COLUMNS:
+        try:
+            entry[column] = _parse_value(record.get(column))
+        except (TypeError, ValueError):
+            return None, f"Campo '{column}' deve ser numérico."
+    return entry, None
+
+
+def ingest_report_entries(
+    session: Session,
+    records: Iterable[Tuple[int, Optional[Record], Optional[str]]],
+    *,
+    transaction_size: int = TRANSACTION_SIZE,
+    before_commit: Optional[Callable[[Session], None]] = None,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> Dict[str, object]:
+    """Validate ``records`` and insert the accepted entries.
+
+    Every ``transaction_size`` accepted rows are inserted with one
+    ``executemany``, added to the rollup and committed; ``before_commit``
+    runs right before each commit (e.g. to bump data versions) and
+    ``progress(processed, inserted, rejected)`` right after it. Transactions
+    already committed stay in place if the file turns out to be unreadable
+    further down.
+    """
+
+    brands, stores = load_store_names(session)
+    started = time.perf_counter()
+    pending = []
+    rejections = []
+    counts = {"total": 0, "inserted": 0, "rejected": 0}
+
+    def commit():
+        # Core insert: the ORM bulk path adds per-row bookkeeping.
+        session.connection().execute(insert(ReportEntry.__table__), pending)
+        apply_rollup(session, pending)
+        if before_commit:
+            before_commit(session)
+        session.commit()
+        counts["inserted"] += len(pending)
+        pending.clear()
+        if progress:
+            progress(counts["total"], counts["inserted"], counts["rejected"])
+
+    for line, record, error in records:
+        counts["total"] += 1
+        if error is None:
+            entry, error = parse_report_record(record, brands, stores)
+        if error is not None:
+            counts["rejected"] += 1
+            if len(rejections) < MAX_LISTED_REJECTIONS:
+                rejections.append({"line": line, "message": error})
+            continue
+        pending.append(entry)
+        if len(pending) >= transaction_size:
+            commit()
+    if pending:
+        commit()
+
+    seconds = time.perf_counter() - started
+    return {
+        **counts,
+        "rejections": rejections,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(counts["total"] / seconds) if seconds > 0 else counts["total"],
+    }
+
+
+__all__ = [
+    "FORMATS",
+    "DECIMAL_SEPARATORS",
+    "ReportIngestError",
+    "detect_format",
+    "check_decimal",
+    "read_report_records",
+    "load_store_names",
+    "parse_report_record",
+    "ingest_report_entries",
+]
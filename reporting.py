@@ -0,0 +1,221 @@
+"""Aggregations over report entries computed in SQL.
+
+Report queries read from ``report_daily_rollups`` (one row per day, brand and
+store) whenever the requested grouping is not finer than a day. The rollup is
+maintained incrementally by :func:`apply_rollup` on every ingestion path and
+can be recomputed from scratch with :func:`rebuild_rollup`.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, cast, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import ReportDailyRollup, ReportEntry
+
+VALUE_COLUMNS = ("valor_20l", "valor_10l", "valor_1500ml", "valor_cx_copo", "valor_vasilhame")
+
+# ``strftime`` patterns for the day and month dimensions. Weeks are ISO 8601
+# weeks (``2025-W01``), see :func:`_iso_week`.
+PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+PERIOD_DIMENSIONS = ("day", "week", "month")
+
+GROUP_DIMENSIONS = ("marca", "loja") + PERIOD_DIMENSIONS
+
+# Dimensions that can be answered from the daily rollup. Anything added later
+# that is finer than a day must stay out of this set.
+ROLLUP_DIMENSIONS = frozenset(GROUP_DIMENSIONS)
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def parse_group_by(value: Optional[str]) -> List[str]:
+    """Parse a comma separated ``group_by`` parameter, keeping its order."""
+
+    dimensions: List[str] = []
+    for item in (value or "").split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item not in GROUP_DIMENSIONS:
+            raise ValueError(
+                "Agrupamento inválido. Use uma combinação de: " + ", ".join(GROUP_DIMENSIONS) + "."
+            )
+        if item not in dimensions:
+            dimensions.append(item)
+    return dimensions
+
+
+def can_use_rollup(group_by: Sequence[str]) -> bool:
+    return set(group_by) <= ROLLUP_DIMENSIONS
+
+
+def _iso_week(column):
+    # SQLite's ``%W`` is not ISO (it has a week 00 and splits weeks at the
+    # turn of the year). An ISO week belongs to the year of its Thursday and
+    # is numbered from that year's first Thursday, so both come from there.
+    thursday = func.date(column, "-3 days", "weekday 4")
+    day_of_year = cast(func.strftime("%j", thursday), Integer)
+    return func.printf("%s-W%02d", func.strftime("%Y", thursday), (day_of_year - 1) // 7 + 1)
+
+
+def _dimension_expression(source, dimension: str):
+    if dimension == "week":
+        return _iso_week(source.data)
+    if dimension in PERIOD_FORMATS:
+        return func.strftime(PERIOD_FORMATS[dimension], source.data)
+    return getattr(source, dimension)
+
+
+def aggregate_report_entries(
+    session: Session,
+    group_by: Sequence[str],
+    *,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    marca: Optional[str] = None,
+    use_rollup: bool = True,
+) -> List[Dict[str, object]]:
+    """Return one row per group with counts, sums and averages.
+
+    Each value column (and the ``total`` of all of them) is reported as
+    ``{"sum": ..., "avg": ...}``. Without ``group_by`` a single grand total row
+    is returned. The daily rollup is used when ``use_rollup`` is set and the
+    grouping allows it; both sources produce identical results.
+    """
+
+    if use_rollup and can_use_rollup(group_by):
+        source = ReportDailyRollup
+        count_column = func.sum(source.entry_count)
+        values = [getattr(source, column) for column in VALUE_COLUMNS]
+    else:
+        source = ReportEntry
+        count_column = func.count()
+        values = [func.coalesce(getattr(source, column), 0.0) for column in VALUE_COLUMNS]
+
+    keys = [_dimension_expression(source, dimension).label(dimension) for dimension in group_by]
+    row_total = sum(values[1:], values[0])
+
+    columns = list(keys) + [count_column.label("count")]
+    for column, value in zip(VALUE_COLUMNS, values):
+        columns.append(func.sum(value).label(f"{column}_sum"))
+    columns.append(func.sum(row_total).label("total_sum"))
+
+    query = select(*columns)
+    if start:
+        query = query.where(source.data >= start)
+    if end:
+        query = query.where(source.data <= end)
+    if marca:
+        query = query.where(source.marca == marca)
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    results = []
+    for row in session.execute(query):
+        mapping = row._mapping
+        count = mapping["count"] or 0
+        if not count and not keys:
+            # Aggregating an empty range still yields one row of NULLs.
+            continue
+        item: Dict[str, object] = {dimension: mapping[dimension] for dimension in group_by}
+        item["count"] = count
+        for column in VALUE_COLUMNS + ("total",):
+            total = mapping[f"{column}_sum"] or 0.0
+            item[column] = {"sum": total, "avg": total / count if count else 0.0}
+        results.append(item)
+    return results
+
+
+def _entry_getter(entry):
+    # Resolved once per entry: the ``Mapping`` check is slow on large batches.
+    if isinstance(entry, dict) or isinstance(entry, Mapping):
+        return entry.get
+    return lambda name: getattr(entry, name)
+
+
+def apply_rollup(session: Session, entries: Iterable[object]) -> int:
+    """Add ``entries`` (ORM objects or mappings) to the daily rollup.
+
+    Must run in the same transaction that inserts the entries. Returns the
+    number of rollup rows touched.
+    """
+
+    deltas: Dict[Tuple[date, str, str], Dict[str, float]] = {}
+    for entry in entries:
+        value = _entry_getter(entry)
+        key = (value("data"), value("marca"), value("loja"))
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = {"entry_count": 0, **{column: 0.0 for column in VALUE_COLUMNS}}
+        delta["entry_count"] += 1
+        for column in VALUE_COLUMNS:
+            delta[column] += value(column) or 0.0
+
+    if not deltas:
+        return 0
+
+    statement = sqlite_insert(ReportDailyRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReportDailyRollup.data, ReportDailyRollup.marca, ReportDailyRollup.loja],
+        set_={
+            column: getattr(ReportDailyRollup, column) + getattr(statement.excluded, column)
+            for column in ("entry_count",) + VALUE_COLUMNS
+        },
+    )
+    rows = [
+        {"data": data, "marca": marca, "loja": loja, **delta}
+        for (data, marca, loja), delta in deltas.items()
+    ]
+    for offset in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        session.execute(statement, rows[offset : offset + ROLLUP_BATCH_SIZE])
+    return len(rows)
+
+
+def rebuild_rollup(session: Session) -> int:
+    """Recompute the whole rollup from ``report_entries``. Returns its row count."""
+
+    session.execute(delete(ReportDailyRollup))
+    aggregated = select(
+        ReportEntry.data,
+        ReportEntry.marca,
+        ReportEntry.loja,
+        func.count(),
+        *[func.sum(func.coalesce(getattr(ReportEntry, column), 0.0)) for column in VALUE_COLUMNS],
+    ).group_by(ReportEntry.data, ReportEntry.marca, ReportEntry.loja)
+    session.execute(
+        insert(ReportDailyRollup).from_select(
+            ["data", "marca", "loja", "entry_count", *VALUE_COLUMNS],
+            aggregated,
+        )
+    )
+    return session.execute(select(func.count()).select_from(ReportDailyRollup)).scalar_one()
+
+
+def rollup_needs_backfill(session: Session) -> bool:
+    """True when entries exist but the rollup is empty (e.g. an older database)."""
+
+    has_rollup = session.execute(select(ReportDailyRollup.data).limit(1)).first() is not None
+    if has_rollup:
+        return False
+    return session.execute(select(ReportEntry.id).limit(1)).first() is not None
+
+
+__all__ = [
+    "VALUE_COLUMNS",
+    "GROUP_DIMENSIONS",
+    "parse_group_by",
+    "can_use_rollup",
+    "aggregate_report_entries",
+    "apply_rollup",
+    "rebuild_rollup",
+    "rollup_needs_backfill",
+]
@@ -0,0 +1,206 @@
+"""Measure time and peak memory of the report export.
+
+The script fills a throwaway SQLite database with report entries and exports
+them once per mode, each in a fresh process so peak memory is comparable:
+
+* ``legacy``: the previous implementation (ORM objects and a list of dicts,
+  then a pandas DataFrame and ``ExcelWriter(engine="openpyxl")`` or a single
+  reportlab ``Table`` for PDF, built in memory);
+* ``streaming``: ``GET /api/report-data/export?format=<--format>`` as served
+  by the application (query rows streamed into the export file; PDF pages are
+  drawn in the renderer's worker processes, whose peak is included).
+
+Peak memory is the process RSS. With the ``production`` storage profile it
+also counts the database pages SQLite maps into memory (``mmap_size``); use
+``--profile legacy`` to see the memory used by the export itself.
+
+Usage::
+
+    python scripts/benchmark_export.py --rows 1000000
+    python scripts/benchmark_export.py --rows 1000000 --modes streaming --profile legacy
+    python scripts/benchmark_export.py --rows 1000000 --modes streaming --format parquet
+    python scripts/benchmark_export.py --rows 100000 --format pdf
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import insert  # noqa: E402
+
+from models import Base, ReportEntry  # noqa: E402
+from storage import create_storage_engine  # noqa: E402
+
+
+def seed(db_path: Path, rows: int, batch: int = 10_000) -> None:
+    engine = create_storage_engine(str(db_path))
+    Base.metadata.create_all(engine)
+    first_day = date(2024, 1, 1)
+    with engine.begin() as conn:
+        for start in range(0, rows, batch):
+            conn.execute(
+                insert(ReportEntry),
+                [
+                    {
+                        "marca": f"Marca {index % 40}",
+                        "loja": f"Loja {index % 700}",
+                        "data": first_day + timedelta(days=index % 366),
+                        "valor_20l": (index % 97) * 1.5,
+                        "valor_10l": (index % 89) * 1.25,
+                        "valor_1500ml": float(index % 50),
+                        "valor_cx_copo": (index % 31) * 2.75,
+                        "valor_vasilhame": float(index % 7),
+                    }
+                    for index in range(start, min(start + batch, rows))
+                ],
+            )
+    engine.dispose()
+
+
+def peak_rss_mb() -> float:
+    # ``ru_maxrss`` is in KiB on Linux and in bytes on macOS. Child processes
+    # (the PDF workers) count once they have exited.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def export_legacy(db_path: Path, export_dir: Path, profile: str, fmt: str) -> int:
+    from io import BytesIO
+
+    from pandas import DataFrame, ExcelWriter
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_storage_engine(str(db_path), profile)
+    with sessionmaker(bind=engine)() as s:
+        data = [
+            {
+                "Marca": r.marca,
+                "Loja": r.loja,
+                "Data": r.data.isoformat(),
+                "Valor 20L": r.valor_20l,
+                "Valor 10L": r.valor_10l,
+                "Valor 1500ML": r.valor_1500ml,
+                "Valor CX Copo": r.valor_cx_copo,
+                "Valor Vasilhame": r.valor_vasilhame,
+                "Total": (r.valor_20l + r.valor_10l + r.valor_1500ml + r.valor_cx_copo + r.valor_vasilhame),
+            }
+            for r in s.query(ReportEntry).all()
+        ]
+    normalized = [dict(row) for row in data]
+    buffer = BytesIO()
+    if fmt == "pdf":
+        export_legacy_pdf(normalized, buffer)
+    else:
+        frame = DataFrame(normalized, columns=list(normalized[0].keys()))
+        with ExcelWriter(buffer, engine="openpyxl") as writer:
+            frame.to_excel(writer, index=False, sheet_name="Relatório")
+    (export_dir / f"legacy.{fmt}").write_bytes(buffer.getvalue())
+    return len(buffer.getvalue())
+
+
+def export_legacy_pdf(data, buffer) -> None:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    headers = list(data[0].keys())
+    table = Table([headers] + [[str(row.get(col, "")) for col in headers] for row in data], repeatRows=1)
+    table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+                ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+                ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ]
+        )
+    )
+    doc.build([Paragraph("Relatório de Marcas e Lojas", styles["Title"]), Spacer(1, 12), table])
+
+
+def export_streaming(db_path: Path, export_dir: Path, profile: str, fmt: str) -> int:
+    import app as app_module
+    from export_utils import ExportManager
+
+    app_module.STORAGE_PROFILE = profile
+    app_module.DB_PATH = str(db_path)
+    app_module.UPLOAD_DIR = str(export_dir / "uploads")
+    app_module.ExportManager = lambda: ExportManager(export_dir)
+    flask_app = app_module.create_app()
+    size = 0
+    with flask_app.test_client() as client:
+        client.post("/api/login", json={"username": "admin", "password": "admin"})
+        response = client.get(f"/api/report-data/export?format={fmt}", buffered=False)
+        for chunk in response.response:
+            size += len(chunk)
+        response.close()
+    flask_app.extensions["report_renderer"].shutdown()
+    return size
+
+
+MODES = {"legacy": export_legacy, "streaming": export_streaming}
+
+
+def run_mode(mode: str, db_path: Path, export_dir: Path, profile: str, fmt: str, results) -> None:
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    size = MODES[mode](db_path, export_dir, profile, fmt)
+    results.put((mode, time.perf_counter() - started, baseline, peak_rss_mb(), size))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="report entries to export")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["legacy", "streaming"])
+    parser.add_argument("--profile", default="production", help="storage profile used to read the entries")
+    parser.add_argument(
+        "--format",
+        default="excel",
+        choices=["excel", "pdf", "csv", "jsonl", "parquet"],
+        help="export format (legacy supports excel and pdf)",
+    )
+    args = parser.parse_args()
+    if "legacy" in args.modes and args.format not in ("excel", "pdf"):
+        parser.error("legacy mode supports only --format excel or pdf")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "bench.db"
+        seed(db_path, args.rows)
+
+        header = f"{'mode':<12}{'seconds':>10}{'rows/s':>10}{'peak MB':>10}{'growth MB':>11}{'file MB':>10}"
+        print(header)
+        print("-" * len(header))
+        results = multiprocessing.Queue()
+        for mode in args.modes:
+            process = multiprocessing.Process(target=run_mode, args=(mode, db_path, Path(tmp_dir), args.profile, args.format, results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{mode:<12} falhou (código {process.exitcode})")
+                continue
+            mode, seconds, baseline, peak, size = results.get()
+            print(
+                f"{mode:<12}{seconds:>10.2f}{args.rows / seconds:>10.0f}{peak:>10.1f}"
+                f"{peak - baseline:>11.1f}{size / 1024 / 1024:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
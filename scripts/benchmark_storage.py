@@ -0,0 +1,132 @@
+"""Measure read latency while a large import holds the write lock.
+
+The script creates a throwaway SQLite database for each storage profile,
+starts a writer thread that imports partners in a single long transaction
+(like ``/api/partners/import``) and, meanwhile, runs reader threads issuing
+the paginated partner listing query. It prints latency percentiles and the
+number of failed reads ("database is locked") per profile.
+
+Usage::
+
+    python scripts/benchmark_storage.py --rows 100000 --readers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from models import Base, Partner  # noqa: E402
+from storage import create_storage_engine  # noqa: E402
+
+
+def partner_rows(start: int, count: int) -> list[dict]:
+    return [
+        {
+            "cidade": "São Paulo",
+            "estado": "SP",
+            "parceiro": f"Parceiro {index}",
+            "cnpj_cpf": f"{index:014d}",
+            "telefone": "11999999999",
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def run_profile(profile: str, rows: int, readers: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_storage_engine(str(Path(tmp_dir) / "bench.db"), profile)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Partner), partner_rows(0, 10_000))
+
+        import_done = threading.Event()
+        latencies: list[float] = []
+        failures = 0
+        lock = threading.Lock()
+
+        def writer() -> None:
+            try:
+                with engine.begin() as conn:
+                    for start in range(10_000, 10_000 + rows, batch):
+                        conn.execute(insert(Partner), partner_rows(start, batch))
+            finally:
+                import_done.set()
+
+        def reader() -> None:
+            nonlocal failures
+            query = select(Partner).order_by(Partner.id).limit(50)
+            while not import_done.is_set():
+                started = time.perf_counter()
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(query).all()
+                except OperationalError:
+                    with lock:
+                        failures += 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total = time.perf_counter() - started
+        engine.dispose()
+
+    latencies.sort()
+
+    def percentile(value: float) -> float:
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(len(latencies) * value))]
+
+    return {
+        "profile": profile,
+        "import_seconds": total,
+        "reads": len(latencies),
+        "failed_reads": failures,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": latencies[-1] if latencies else float("nan"),
+        "mean_ms": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="rows written by the concurrent import")
+    parser.add_argument("--readers", type=int, default=4, help="number of concurrent reader threads")
+    parser.add_argument("--batch", type=int, default=1_000, help="rows per executemany batch")
+    parser.add_argument("--profiles", nargs="+", default=["legacy", "production"])
+    args = parser.parse_args()
+
+    header = f"{'profile':<12}{'import s':>10}{'reads':>8}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for profile in args.profiles:
+        result = run_profile(profile, args.rows, args.readers, args.batch)
+        print(
+            f"{result['profile']:<12}{result['import_seconds']:>10.2f}{result['reads']:>8}"
+            f"{result['failed_reads']:>8}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['max_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,8 +18,15 @@ IGNORED_PATTERNS = ("__pycache__", "*.pyc", "*.pyo")
 ITEMS_TO_INCLUDE = (
     ("app.py", "app.py"),
     ("desktop.py", "desktop.py"),
+    ("export_cache.py", "export_cache.py"),
     ("export_utils.py", "export_utils.py"),
+    ("import_utils.py", "import_utils.py"),
+    ("jobs.py", "jobs.py"),
     ("models.py", "models.py"),
+    ("report_export.py", "report_export.py"),
+    ("report_ingest.py", "report_ingest.py"),
+    ("reporting.py", "reporting.py"),
+    ("storage.py", "storage.py"),
     ("requirements.txt", "requirements.txt"),
     ("config", "config"),
     ("templates", "templates"),
@@ -0,0 +1,86 @@
+"""SQLite engine factory applying the configured storage profile.
+
+Every connection also gets a ``casefold(text)`` SQL function: SQLite's own
+``lower()`` only folds ASCII letters, so case-insensitive filters on names
+with accents (``SÃO PAULO``) fold both sides with Python's ``str.casefold``.
+"""
+
+from __future__ import annotations
+
+from typing import Mapping, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from config.settings import STORAGE_PROFILE, STORAGE_PROFILES
+
+# Order matters: ``journal_mode`` must be switched before anything else touches
+# the file and ``busy_timeout`` should be active for the remaining statements.
+PRAGMA_ORDER = ("busy_timeout", "journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "foreign_keys")
+
+
+def resolve_profile(profile: Optional[str | Mapping[str, object]] = None) -> Mapping[str, object]:
+    """Return the profile mapping for ``profile`` (a name or an explicit mapping)."""
+
+    if profile is None:
+        profile = STORAGE_PROFILE
+    if isinstance(profile, str):
+        try:
+            return STORAGE_PROFILES[profile]
+        except KeyError:
+            raise ValueError(
+                f"Perfil de armazenamento desconhecido: {profile!r}. "
+                f"Use um de: {', '.join(sorted(STORAGE_PROFILES))}."
+            ) from None
+    return profile
+
+
+def apply_pragmas(dbapi_connection, pragmas: Mapping[str, object]) -> None:
+    """Run ``PRAGMA name = value`` for each configured pragma."""
+
+    ordered = [name for name in PRAGMA_ORDER if name in pragmas]
+    ordered += [name for name in pragmas if name not in PRAGMA_ORDER]
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in ordered:
+            cursor.execute(f"PRAGMA {name} = {pragmas[name]}")
+            # ``journal_mode`` and a few others return a row; drain it.
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+def register_functions(dbapi_connection) -> None:
+    """Register the SQL functions the application's queries rely on."""
+
+    dbapi_connection.create_function("casefold", 1, _casefold, deterministic=True)
+
+
+def create_storage_engine(db_path: str, profile: Optional[str | Mapping[str, object]] = None) -> Engine:
+    """Create the SQLAlchemy engine for ``db_path`` using ``profile``."""
+
+    settings = resolve_profile(profile)
+    pragmas = dict(settings.get("pragmas") or {})
+    pool_options = dict(settings.get("pool") or {})
+
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        future=True,
+        connect_args={"check_same_thread": False},
+        **pool_options,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _prepare_connection(dbapi_connection, connection_record):
+        if pragmas:
+            apply_pragmas(dbapi_connection, pragmas)
+        register_functions(dbapi_connection)
+
+    return engine
+
+
+__all__ = ["create_storage_engine", "resolve_profile", "apply_pragmas", "register_functions"]
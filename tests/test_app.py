@@ -1,8 +1,13 @@
+import base64
 import io
+import json
 import os
 import sys
 from pathlib import Path
-from sqlalchemy import create_engine
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -10,7 +15,7 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 import app
-from models import User, Partner, Brand, Store
+from models import User, Partner, Brand, Store, ReportEntry
 
 
 def _create_test_app(tmp_path, monkeypatch):
@@ -320,3 +325,1617 @@ def test_brand_store_import_creates_and_updates(tmp_path, monkeypatch):
             assert brand.cod_disagua == "BR-001"
             assert store.valor_20l == 16.10
             assert store.valor_10l == 8.0
+
+
+def test_partner_listing_supports_keyset_pagination_and_filters(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        for index in range(7):
+            session.add(
+                Partner(
+                    cidade="Campinas" if index % 2 else "Santos",
+                    estado="SP" if index < 5 else "RJ",
+                    parceiro=f"Parceiro {index:02d}",
+                    cnpj_cpf=f"1234567800{index:04d}",
+                    telefone="11999999999",
+                    dia_pagamento=10 if index % 3 == 0 else 20,
+                )
+            )
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        first_page = client.get("/api/partners?limit=3&sort=-parceiro")
+        assert first_page.status_code == 200
+        body = first_page.get_json()
+        assert [row["parceiro"] for row in body["data"]] == ["Parceiro 06", "Parceiro 05", "Parceiro 04"]
+        assert body["meta"]["has_more"] is True
+
+        names = [row["parceiro"] for row in body["data"]]
+        cursor = body["meta"]["next_cursor"]
+        while cursor:
+            page = client.get(f"/api/partners?limit=3&sort=-parceiro&cursor={cursor}").get_json()
+            names.extend(row["parceiro"] for row in page["data"])
+            cursor = page["meta"]["next_cursor"]
+        assert names == [f"Parceiro {index:02d}" for index in range(6, -1, -1)]
+
+        filtered = client.get("/api/partners?estado=sp&cidade=campinas&limit=10").get_json()
+        assert [row["parceiro"] for row in filtered["data"]] == ["Parceiro 01", "Parceiro 03"]
+        assert filtered["meta"]["has_more"] is False
+        assert filtered["meta"]["next_cursor"] is None
+
+        by_day = client.get("/api/partners?dia_pagamento=10").get_json()
+        assert [row["parceiro"] for row in by_day["data"]] == ["Parceiro 00", "Parceiro 03", "Parceiro 06"]
+        assert "meta" not in by_day
+
+        by_document = client.get("/api/partners?q=12.345.678/00-0005").get_json()
+        assert [row["parceiro"] for row in by_document["data"]] == ["Parceiro 05"]
+
+        invalid_cursor = client.get("/api/partners?limit=3&sort=parceiro&cursor=" + body["meta"]["next_cursor"])
+        assert invalid_cursor.status_code == 400
+
+        invalid_sort = client.get("/api/partners?sort=telefone")
+        assert invalid_sort.status_code == 400
+
+        # Tampered cursors and out-of-range integers are rejected, not bound.
+        for cursor in ({"sort": "id", "id": {"a": 1}}, {"sort": "parceiro", "id": 1, "value": [1]}, {"sort": "id", "id": 2**63}):
+            token = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            assert client.get(f"/api/partners?sort={cursor['sort']}&cursor={token}").status_code == 400
+        assert client.get("/api/partners?dia_pagamento=99999999999999999999999").status_code == 400
+
+        # Case-insensitive filters also fold accented letters.
+        with Session() as session:
+            session.add(
+                Partner(
+                    cidade="SÃO PAULO",
+                    distribuidora="ÁGUA BOA",
+                    estado="SP",
+                    parceiro="Ótica Central",
+                    cnpj_cpf="99999999000199",
+                    telefone="1",
+                )
+            )
+            session.commit()
+        for query in ("cidade=SÃO PAULO", "cidade=são paulo", "cidade=São Paulo", "distribuidora=água boa", "q=ótica"):
+            found = client.get(f"/api/partners?{query}").get_json()["data"]
+            assert [row["parceiro"] for row in found] == ["Ótica Central"], query
+
+
+def test_store_listing_is_paginated_and_filterable(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        first = Brand(marca="Marca A")
+        second = Brand(marca="Marca B")
+        session.add_all([first, second])
+        session.flush()
+        for index in range(5):
+            session.add(
+                Store(
+                    marca_id=first.id if index < 4 else second.id,
+                    loja=f"Loja {index}",
+                    cod_disagua=f"L{index}",
+                    local_entrega="Central",
+                    municipio="Uberlândia" if index % 2 else "Uberaba",
+                    uf="MG",
+                    valor_20l=10.0 + index,
+                )
+            )
+        session.commit()
+        first_id = first.id
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        full = client.get("/api/stores").get_json()
+        assert len(full["data"]) == 5
+        assert full["data"][0] == {
+            "id": full["data"][0]["id"],
+            "marca_id": first_id,
+            "marca": "Marca A",
+            "loja": "Loja 0",
+            "cod_disagua": "L0",
+            "local_entrega": "Central",
+            "endereco": None,
+            "municipio": "Uberaba",
+            "uf": "MG",
+            "valor_20l": 10.0,
+            "valor_10l": 0.0,
+            "valor_1500ml": 0.0,
+            "valor_cx_copo": 0.0,
+            "valor_vasilhame": 0.0,
+        }
+
+        page = client.get(f"/api/stores?marca_id={first_id}&limit=3").get_json()
+        assert [row["loja"] for row in page["data"]] == ["Loja 0", "Loja 1", "Loja 2"]
+        next_page = client.get(
+            f"/api/stores?marca_id={first_id}&limit=3&cursor={page['meta']['next_cursor']}"
+        ).get_json()
+        assert [row["loja"] for row in next_page["data"]] == ["Loja 3"]
+        assert next_page["meta"]["has_more"] is False
+
+        by_city = client.get("/api/stores?municipio=uberlândia&uf=mg").get_json()
+        assert [row["loja"] for row in by_city["data"]] == ["Loja 1", "Loja 3"]
+
+        by_code = client.get("/api/stores?cod_disagua=L4").get_json()
+        assert [row["marca"] for row in by_code["data"]] == ["Marca B"]
+
+        by_name = client.get("/api/stores?q=LOJA 2").get_json()
+        assert [row["cod_disagua"] for row in by_name["data"]] == ["L2"]
+
+        # Accented letters are folded too, whatever their case.
+        with Session() as session:
+            session.add(
+                Store(marca_id=first_id, loja="LOJA ÁGUIA", local_entrega="Central", municipio="JOSÉ BONIFÁCIO", uf="SP")
+            )
+            session.commit()
+        for query in ("municipio=josé bonifácio", "municipio=José Bonifácio", "q=águia"):
+            assert [row["loja"] for row in client.get(f"/api/stores?{query}").get_json()["data"]] == ["LOJA ÁGUIA"], query
+
+        assert client.get("/api/stores?marca_id=99999999999999999999999").status_code == 400
+
+
+def _count_statements(callback):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = callback()
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+    return result, statements
+
+
+def test_brand_listing_uses_constant_number_of_queries(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    def add_brands(start, count):
+        with Session() as session:
+            for index in range(start, start + count):
+                brand = Brand(marca=f"Marca {index}")
+                session.add(brand)
+                session.flush()
+                for store_index in range(index % 3):
+                    session.add(
+                        Store(
+                            marca_id=brand.id,
+                            loja=f"Loja {index}-{store_index}",
+                            local_entrega="Central",
+                            municipio="Uberaba",
+                            uf="MG",
+                            valor_20l=10.0,
+                            valor_vasilhame=2.5,
+                        )
+                    )
+            session.commit()
+
+    flask_app.config["AUTH_CACHE_TTL"] = 0
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        add_brands(0, 2)
+        small_response, small_statements = _count_statements(lambda: client.get("/api/brands"))
+        assert small_response.status_code == 200
+        assert [brand["store_count"] for brand in small_response.get_json()["data"]] == [0, 1]
+
+        add_brands(2, 20)
+        large_response, large_statements = _count_statements(lambda: client.get("/api/brands"))
+        brands = large_response.get_json()["data"]
+        assert len(brands) == 22
+        assert [brand["store_count"] for brand in brands] == [index % 3 for index in range(22)]
+        assert [brand["store_value_total"] for brand in brands] == [12.5 * (index % 3) for index in range(22)]
+        assert len(large_statements) == len(small_statements)
+
+        created = client.post("/api/brands", json={"marca": "Marca Nova"}).get_json()["data"]
+        assert created["store_count"] == 0
+        assert created["store_value_total"] == 0.0
+        updated = client.put(f"/api/brands/{brands[2]['id']}", json={"cod_disagua": "X1"}).get_json()["data"]
+        assert updated["store_count"] == 2
+        assert updated["store_value_total"] == 25.0
+
+
+def test_list_endpoints_answer_if_none_match_with_304(tmp_path, monkeypatch):
+    flask_app, _ = _create_test_app(tmp_path, monkeypatch)
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        first = client.get("/api/partners")
+        assert first.status_code == 200
+        assert first.get_json()["data"] == []
+        etag = first.headers["ETag"]
+        assert not etag.startswith("W/")
+
+        cached, statements = _count_statements(
+            lambda: client.get("/api/partners", headers={"If-None-Match": etag})
+        )
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+        assert not any("FROM partners" in statement for statement in statements)
+
+        paginated = client.get("/api/partners?limit=10")
+        assert paginated.headers["ETag"] != etag
+
+        csv_content = "Parceiro,Documento,Cidade,UF,Telefone\nAzul,12345678000199,Santos,SP,11999999999\n"
+        client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(csv_content.encode("utf-8")), "partners.csv")},
+            content_type="multipart/form-data",
+        )
+        after_import = client.get("/api/partners", headers={"If-None-Match": etag})
+        assert after_import.status_code == 200
+        assert len(after_import.get_json()["data"]) == 1
+
+        stores = client.get("/api/stores")
+        assert stores.get_json()["data"] == []
+        stores_etag = stores.headers["ETag"]
+        assert client.get("/api/stores", headers={"If-None-Match": stores_etag}).status_code == 304
+
+        brand = client.post("/api/brands", json={"marca": "Marca"}).get_json()["data"]
+        changed = client.get("/api/stores", headers={"If-None-Match": stores_etag})
+        assert changed.status_code == 200
+        assert changed.get_json()["data"] == []
+
+        brands_etag = client.get("/api/brands").headers["ETag"]
+        client.post(
+            "/api/stores",
+            json={"marca_id": brand["id"], "loja": "Loja", "local_entrega": "Central", "municipio": "Santos", "uf": "SP"},
+        )
+        refreshed = client.get("/api/brands", headers={"If-None-Match": brands_etag})
+        assert refreshed.status_code == 200
+        assert refreshed.get_json()["data"][0]["store_count"] == 1
+
+
+def test_authenticated_identity_is_loaded_once_and_invalidated_on_change(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    from werkzeug.security import generate_password_hash
+
+    with Session() as session:
+        session.add(User(username="admin", password_hash=generate_password_hash("admin"), role="admin"))
+        operator = User(username="operador", password_hash=generate_password_hash("segredo"), role="operator")
+        session.add(operator)
+        session.commit()
+        operator_id = operator.id
+
+    def user_queries(statements):
+        return [statement for statement in statements if "FROM users" in statement]
+
+    # Plain clients (no ``with`` block) so each request gets a fresh ``g``.
+    admin_client = flask_app.test_client()
+    operator_client = flask_app.test_client()
+    _api_login(admin_client)
+    _api_login(operator_client, "operador", "segredo")
+
+    flask_app.config["AUTH_CACHE_TTL"] = 0
+    response, statements = _count_statements(lambda: operator_client.post("/api/brands", json={"marca": "A"}))
+    assert response.status_code == 201
+    assert len(user_queries(statements)) == 1
+
+    flask_app.config["AUTH_CACHE_TTL"] = 60
+    operator_client.get("/api/me")
+    response, statements = _count_statements(lambda: operator_client.get("/api/me"))
+    assert response.get_json()["data"] == {"id": operator_id, "username": "operador", "role": "operator"}
+    assert user_queries(statements) == []
+
+    assert admin_client.put(f"/api/users/{operator_id}", json={"role": "viewer"}).status_code == 200
+    denied = operator_client.post("/api/brands", json={"marca": "B"})
+    assert denied.status_code == 403
+    assert operator_client.get("/api/me").get_json()["data"]["role"] == "viewer"
+
+    assert admin_client.delete(f"/api/users/{operator_id}").status_code == 200
+    # ``login_required`` redirects anonymous users to the login page.
+    assert operator_client.get("/api/me").status_code == 302
+
+
+def test_storage_profile_configures_each_connection(tmp_path, monkeypatch):
+    from storage import create_storage_engine
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+
+    engine = create_storage_engine(str(db_path), "production")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -32000
+    assert engine.pool.size() == 8
+    engine.dispose()
+
+    legacy = create_storage_engine(str(tmp_path / "legacy.db"), "legacy")
+    with legacy.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    legacy.dispose()
+
+
+def test_hot_lookups_use_indexes(tmp_path, monkeypatch):
+    from datetime import date
+    from sqlalchemy import func, select
+    from models import Connection, ReceiptImage, ReportEntry
+
+    _create_test_app(tmp_path, monkeypatch)
+    db_path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+
+    # Simulate a database created before the indexes existed.
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_stores_marca_id_loja_lower")
+        conn.exec_driver_sql("DROP INDEX ix_partners_cnpj_cpf")
+    engine.dispose()
+    _create_test_app(tmp_path, monkeypatch)
+
+    lookups = {
+        "ix_partners_cnpj_cpf": select(Partner.id).where(Partner.cnpj_cpf == "123"),
+        "ix_brands_marca_lower": select(Brand).where(func.lower(Brand.marca) == "marca"),
+        "ix_brands_cod_disagua": select(Brand).where(Brand.cod_disagua == "BR001"),
+        "ix_stores_cod_disagua": select(Store).where(Store.cod_disagua == "L1"),
+        "ix_stores_marca_id_loja_lower": select(Store).where(Store.marca_id == 1, func.lower(Store.loja) == "loja"),
+        "ix_connections_store_id": select(Connection).where(Connection.store_id == 1),
+        "ix_report_entries_data": select(ReportEntry).where(
+            ReportEntry.data >= date(2024, 1, 1), ReportEntry.data <= date(2024, 12, 31)
+        ),
+        "ix_report_entries_marca_data": select(ReportEntry).where(
+            ReportEntry.marca == "Marca", ReportEntry.data >= date(2024, 1, 1)
+        ),
+        "ix_receipt_images_uploaded_at": select(ReceiptImage).order_by(ReceiptImage.uploaded_at.desc()),
+    }
+
+    with engine.connect() as conn:
+        for index_name, statement in lookups.items():
+            compiled = statement.compile(dialect=engine.dialect)
+            parameters = tuple(
+                compiled.construct_params()[key] for key in (compiled.positiontup or [])
+            )
+            plan = " | ".join(
+                row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, parameters)
+            )
+            assert index_name in plan, f"{index_name} not used: {plan}"
+    engine.dispose()
+
+
+def test_report_summary_aggregates_in_sql(tmp_path, monkeypatch):
+    from datetime import date
+    from models import ReportEntry
+    from reporting import apply_rollup
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        entries = [
+            ReportEntry(marca="A", loja="L1", data=date(2024, 1, 3), valor_20l=10, valor_10l=1),
+            ReportEntry(marca="A", loja="L1", data=date(2024, 1, 20), valor_20l=20, valor_10l=3),
+            ReportEntry(marca="A", loja="L2", data=date(2024, 2, 1), valor_20l=5),
+            ReportEntry(marca="B", loja="L9", data=date(2024, 2, 15), valor_20l=7, valor_vasilhame=2),
+        ]
+        session.add_all(entries)
+        apply_rollup(session, entries)
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        response = client.get("/api/report-data/summary?group_by=marca,month")
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["meta"] == {"group_by": ["marca", "month"], "groups": 3, "source": "rollup"}
+        first = body["data"][0]
+        assert (first["marca"], first["month"], first["count"]) == ("A", "2024-01", 2)
+        assert first["valor_20l"] == {"sum": 30.0, "avg": 15.0}
+        assert first["valor_10l"] == {"sum": 4.0, "avg": 2.0}
+        assert first["total"] == {"sum": 34.0, "avg": 17.0}
+        assert [(row["marca"], row["month"]) for row in body["data"][1:]] == [("A", "2024-02"), ("B", "2024-02")]
+
+        totals = client.get("/api/report-data/summary?startDate=2024-02-01").get_json()["data"]
+        assert totals == [
+            {
+                "count": 2,
+                "valor_20l": {"sum": 12.0, "avg": 6.0},
+                "valor_10l": {"sum": 0.0, "avg": 0.0},
+                "valor_1500ml": {"sum": 0.0, "avg": 0.0},
+                "valor_cx_copo": {"sum": 0.0, "avg": 0.0},
+                "valor_vasilhame": {"sum": 2.0, "avg": 1.0},
+                "total": {"sum": 14.0, "avg": 7.0},
+            }
+        ]
+
+        by_store = client.get("/api/report-data/summary?group_by=loja,week&marca=A").get_json()["data"]
+        assert [(row["loja"], row["week"]) for row in by_store] == [("L1", "2024-W01"), ("L1", "2024-W03"), ("L2", "2024-W05")]
+
+        empty = client.get("/api/report-data/summary?startDate=2030-01-01").get_json()
+        assert empty["data"] == []
+
+        assert client.get("/api/report-data/summary?group_by=ano").status_code == 400
+        invalid_month = client.get("/api/report-data/summary?endDate=2024-13-01")
+        assert invalid_month.status_code == 400
+        assert invalid_month.get_json()["error"]["message"] == "Data inválida. Use o formato AAAA-MM-DD."
+
+
+def test_report_summary_weeks_are_iso_weeks_across_year_boundaries(tmp_path, monkeypatch):
+    from datetime import date
+    from models import ReportEntry
+    from reporting import aggregate_report_entries, apply_rollup
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    days = [date(2024, 12, 29), date(2024, 12, 30), date(2025, 1, 1), date(2025, 1, 5), date(2027, 1, 1)]
+    with Session() as session:
+        entries = [ReportEntry(marca="A", loja="L1", data=day, valor_20l=1) for day in days]
+        session.add_all(entries)
+        apply_rollup(session, entries)
+        session.commit()
+
+        for use_rollup in (True, False):
+            weeks = aggregate_report_entries(session, ["week"], use_rollup=use_rollup)
+            # Monday 2024-12-30 starts 2025-W01; Friday 2027-01-01 is still in 2026-W53.
+            assert [(row["week"], row["count"]) for row in weeks] == [("2024-W52", 1), ("2025-W01", 3), ("2026-W53", 1)]
+
+
+def test_report_rollup_is_maintained_and_rebuildable(tmp_path, monkeypatch):
+    from datetime import date
+    from models import ReportDailyRollup, ReportEntry
+    from reporting import aggregate_report_entries
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        brand = Brand(marca="Marca")
+        session.add(brand)
+        session.flush()
+        session.add_all(
+            [
+                Store(marca_id=brand.id, loja=f"Loja {index}", local_entrega="Central", municipio="Santos", uf="SP")
+                for index in range(3)
+            ]
+        )
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        assert client.post("/api/report-data/seed?n=200").status_code == 200
+        assert client.post("/api/report-data/seed?n=50").status_code == 200
+
+        summary = client.get("/api/report-data/summary?group_by=loja,day").get_json()
+        assert summary["meta"]["source"] == "rollup"
+
+    with Session() as session:
+        for group_by in ([], ["marca"], ["loja", "day"], ["week"], ["marca", "month"]):
+            from_rollup = aggregate_report_entries(session, group_by)
+            from_entries = aggregate_report_entries(session, group_by, use_rollup=False)
+            assert len(from_rollup) == len(from_entries)
+            for rolled, raw in zip(from_rollup, from_entries):
+                assert rolled["count"] == raw["count"]
+                assert {key: rolled[key] for key in group_by} == {key: raw[key] for key in group_by}
+                assert abs(rolled["total"]["sum"] - raw["total"]["sum"]) < 1e-6
+        assert aggregate_report_entries(session, [])[0]["count"] == 250
+
+        # Rows written behind the application's back are picked up by the rebuild command.
+        session.add(ReportEntry(marca="Marca", loja="Loja 0", data=date(2020, 1, 1), valor_20l=5))
+        session.commit()
+
+    result = flask_app.test_cli_runner().invoke(args=["rebuild-report-rollup"])
+    assert result.exit_code == 0, result.output
+
+    with Session() as session:
+        assert aggregate_report_entries(session, [])[0]["count"] == 251
+        rollup = session.query(ReportDailyRollup).filter_by(data=date(2020, 1, 1)).one()
+        assert (rollup.entry_count, rollup.valor_20l) == (1, 5.0)
+
+
+def test_report_data_is_streamed_in_batches(tmp_path, monkeypatch):
+    from datetime import date, timedelta
+    from models import ReportEntry
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add_all(
+            [
+                ReportEntry(
+                    marca="A" if index % 2 else "B",
+                    loja="Loja",
+                    data=date(2024, 1, 1) + timedelta(days=index % 30),
+                    valor_20l=float(index),
+                )
+                for index in range(2500)
+            ]
+        )
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        response = client.get("/api/report-data?marca=A&startDate=2024-01-10")
+        assert response.is_streamed
+        assert response.mimetype == "application/json"
+        rows = response.get_json()["data"]
+        expected = [
+            index for index in range(2500) if index % 2 and (index % 30) >= 9
+        ]
+        assert [row["valor_20l"] for row in rows] == [float(index) for index in expected]
+        assert rows[0] == {
+            "id": expected[0] + 1,
+            "marca": "A",
+            "loja": "Loja",
+            "data": "2024-01-10",
+            "valor_20l": float(expected[0]),
+            "valor_10l": 0.0,
+            "valor_1500ml": 0.0,
+            "valor_cx_copo": 0.0,
+            "valor_vasilhame": 0.0,
+        }
+
+        empty = client.get("/api/report-data?startDate=2030-01-01")
+        assert empty.get_json() == {"data": []}
+
+        invalid = client.get("/api/report-data?startDate=ontem")
+        assert invalid.status_code == 400
+        assert invalid.get_json()["error"]["message"] == "Data inválida. Use o formato AAAA-MM-DD."
+
+
+def test_streamed_listing_reports_query_errors_before_sending_data(tmp_path, monkeypatch):
+    import sqlite3
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    flask_app.config["PROPAGATE_EXCEPTIONS"] = False
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        assert client.get("/api/report-data").get_json() == {"data": []}
+
+        with sqlite3.connect(db_path) as connection:
+            connection.execute("DROP TABLE report_entries")
+
+        response = client.get("/api/report-data")
+        assert response.status_code == 500
+        assert not response.get_data(as_text=True).startswith('{"data"')
+
+
+def test_partner_import_applies_rows_in_batches(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add(
+            Partner(cidade="Santos", estado="SP", parceiro="Legado", cnpj_cpf="11.111.111/0001-11", telefone="1")
+        )
+        session.commit()
+
+    lines = ["Parceiro,Documento,Cidade,UF,Telefone,Dia de Pagamento"]
+    lines.append("Legado Atualizado,11111111000111,Santos,SP,11999999999,5")
+    for index in range(300):
+        lines.append(f"Parceiro {index},{index:014d},Campinas,SP,11999999999,10")
+    lines.append("Parceiro 7 Renomeado,00000000000007,Campinas,SP,11999999999,12")
+    lines.append("Sem Documento,,Campinas,SP,11999999999,10")
+    lines.append("UF Longa,99999999999999,Campinas,SPX,11999999999,10")
+    lines.append("Dia Invalido,99999999999998,Campinas,SP,11999999999,40")
+    csv_content = "\n".join(lines) + "\n"
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response, statements = _count_statements(
+            lambda: client.post(
+                "/api/partners/import",
+                data={"file": (io.BytesIO(csv_content.encode("utf-8")), "partners.csv")},
+                content_type="multipart/form-data",
+            )
+        )
+
+    summary = response.get_json()["data"]
+    assert summary == {
+        "total": 305,
+        "created": 300,
+        "updated": 1,
+        "skipped": 0,
+        "error_count": 3,
+        "errors": [
+            {"row": 304, "message": "Informe o CPF ou CNPJ do parceiro."},
+            {"row": 305, "message": "Informe a UF com dois caracteres."},
+            {"row": 306, "message": "Campo 'dia_pagamento' deve estar entre 1 e 31."},
+        ],
+    }
+    partner_writes = [
+        statement for statement in statements if statement.startswith(("INSERT INTO partners", "UPDATE partners"))
+    ]
+    assert len(partner_writes) <= 2
+
+    with Session() as session:
+        assert session.query(Partner).count() == 301
+        legacy = session.query(Partner).filter_by(parceiro="Legado Atualizado").one()
+        assert (legacy.cnpj_cpf, legacy.dia_pagamento) == ("11111111000111", 5)
+        renamed = session.query(Partner).filter_by(cnpj_cpf="00000000000007").one()
+        assert (renamed.parceiro, renamed.dia_pagamento) == ("Parceiro 7 Renomeado", 12)
+        assert renamed.created_at is not None
+
+
+def test_brand_store_import_resolves_rows_in_memory(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        existing = Brand(marca="Agua Azul", cod_disagua="AZ")
+        session.add(existing)
+        session.flush()
+        session.add(
+            Store(marca_id=existing.id, loja="Loja Antiga", cod_disagua="S-1", local_entrega="Doca", municipio="Santos", uf="SP")
+        )
+        session.commit()
+
+    lines = ["Marca,Código Marca,Loja,Código Loja,Local de Entrega,Município,UF,Valor 20L"]
+    # Existing brand found by code and renamed; existing store found by code.
+    lines.append('Azul Premium,AZ,Loja Nova,S-1,Doca,Santos,sp,"10,00"')
+    for index in range(120):
+        lines.append(f'Marca Nova,NV,Loja {index},,Central,Campinas,SP,"{index},50"')
+    # Same store as above, matched by (marca, lower(loja)) and updated.
+    lines.append('Marca Nova,NV,LOJA 3,,Central,Campinas,SP,"99,00"')
+    # Unchanged repetition is skipped.
+    lines.append('Marca Nova,NV,Loja 4,,Central,Campinas,SP,"4,50"')
+    lines.append(",,Loja Sem Marca,,Central,Campinas,SP,1")
+    lines.append("Marca Nova,NV,Loja Ruim,,Central,Campinas,SP,abc")
+    lines.append("Marca Nova,NV,Loja Incompleta,,,Campinas,SP,1")
+    csv_content = "\n".join(lines) + "\n"
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response, statements = _count_statements(
+            lambda: client.post(
+                "/api/brands/import",
+                data={"file": (io.BytesIO(csv_content.encode("utf-8")), "brands.csv")},
+                content_type="multipart/form-data",
+            )
+        )
+
+    summary = response.get_json()["data"]
+    assert summary == {
+        "total": 126,
+        "created_brands": 1,
+        "updated_brands": 1,
+        "created_stores": 120,
+        "updated_stores": 1,
+        "skipped": 1,
+        "error_count": 3,
+        "errors": [
+            {"row": 125, "message": "Informe o nome da marca."},
+            {"row": 126, "message": "Campo 'valor_20l' deve ser numérico."},
+            {"row": 127, "message": "Campos obrigatórios da loja ausentes: local_entrega"},
+        ],
+    }
+    lookups = [statement for statement in statements if "FROM brands" in statement or "FROM stores" in statement]
+    assert len(lookups) <= 2
+    writes = [
+        statement
+        for statement in statements
+        if statement.startswith(("INSERT INTO brands", "INSERT INTO stores", "UPDATE brands", "UPDATE stores"))
+    ]
+    assert len(writes) <= 4
+
+    with Session() as session:
+        renamed = session.query(Brand).filter_by(cod_disagua="AZ").one()
+        assert renamed.marca == "Azul Premium"
+        old_store = session.query(Store).filter_by(cod_disagua="S-1").one()
+        assert (old_store.loja, old_store.marca_id, old_store.valor_20l) == ("Loja Nova", renamed.id, 10.0)
+        new_brand = session.query(Brand).filter_by(marca="Marca Nova").one()
+        assert session.query(Store).filter_by(marca_id=new_brand.id).count() == 120
+        updated = session.query(Store).filter_by(marca_id=new_brand.id, loja="LOJA 3").one()
+        assert updated.valor_20l == 99.0
+
+
+def test_brand_store_import_reuses_and_swaps_renamed_brand_names(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add_all([Brand(marca="X", cod_disagua="C1"), Brand(marca="A", cod_disagua="A1"), Brand(marca="B", cod_disagua="B1")])
+        session.commit()
+
+    def send(client, lines):
+        content = "\n".join(["Marca,Código Marca", *lines]) + "\n"
+        return client.post(
+            "/api/brands/import",
+            data={"file": (io.BytesIO(content.encode("utf-8")), "brands.csv")},
+            content_type="multipart/form-data",
+        )
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        # X is renamed to Y by its code, then a new brand takes the name X.
+        recreated = send(client, ["Y,C1", "X,C2"])
+        assert recreated.status_code == 200
+        assert (recreated.get_json()["data"]["updated_brands"], recreated.get_json()["data"]["created_brands"]) == (1, 1)
+
+        # A and B swap names through a temporary one.
+        swapped = send(client, ["Z,A1", "A,B1", "B,A1"])
+        assert swapped.status_code == 200
+        assert swapped.get_json()["data"]["updated_brands"] == 2
+
+    with Session() as session:
+        brands = dict(session.query(Brand.cod_disagua, Brand.marca))
+    assert brands == {"C1": "Y", "C2": "X", "A1": "B", "B1": "A"}
+
+
+def test_imports_can_run_as_background_jobs(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+    runner = flask_app.extensions["job_runner"]
+
+    lines = ["Parceiro,Documento,Cidade,UF,Telefone"]
+    for index in range(50):
+        lines.append(f"Parceiro {index},{index:014d},Campinas,SP,11999999999")
+    lines.append("UF Longa,99999999999999,Campinas,SPX,11999999999")
+    csv_content = "\n".join(lines) + "\n"
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post(
+            "/api/partners/import?async=1",
+            data={"file": (io.BytesIO(csv_content.encode("utf-8")), "partners.csv")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 202
+        job = response.get_json()["data"]
+        assert (job["kind"], job["status"], job["filename"]) == ("partners_import", "queued", "partners.csv")
+
+        failing = client.post(
+            "/api/brands/import",
+            data={"file": (io.BytesIO(b"Loja\nSem marca\n"), "brands.csv"), "async": "1"},
+            content_type="multipart/form-data",
+        )
+        assert failing.status_code == 202
+        failing_id = failing.get_json()["data"]["id"]
+
+        runner.shutdown(wait=True)
+
+        finished = client.get(f"/api/import-jobs/{job['id']}").get_json()["data"]
+        assert (finished["status"], finished["phase"]) == ("succeeded", "done")
+        assert (finished["total_rows"], finished["processed_rows"]) == (51, 51)
+        assert (finished["created"], finished["updated"], finished["error_count"]) == (50, 0, 1)
+        assert finished["result"]["created"] == 50
+        assert finished["result"]["errors"] == [{"row": 52, "message": "Informe a UF com dois caracteres."}]
+
+        failed = client.get(f"/api/import-jobs/{failing_id}").get_json()["data"]
+        assert failed["status"] == "failed"
+        assert failed["error"] == {"message": "O arquivo precisa conter a coluna 'marca'."}
+
+        assert client.get("/api/import-jobs/unknown").status_code == 404
+
+    from werkzeug.security import generate_password_hash
+
+    with Session() as session:
+        assert session.query(Partner).count() == 50
+        session.add(User(username="outro", password_hash=generate_password_hash("secret1"), role="operator"))
+        session.execute(text("UPDATE background_jobs SET status = 'running' WHERE id = :id"), {"id": job["id"]})
+        session.commit()
+
+    other_client = flask_app.test_client()
+    _api_login(other_client, "outro", "secret1")
+    assert other_client.get(f"/api/import-jobs/{job['id']}").status_code == 404
+
+    # A restart marks jobs that never finished as interrupted.
+    restarted = app.create_app()
+    restarted.config["TESTING"] = True
+    client = restarted.test_client()
+    _api_login(client)
+    interrupted = client.get(f"/api/import-jobs/{job['id']}").get_json()["data"]
+    assert interrupted["status"] == "interrupted"
+    assert interrupted["error"]["message"].startswith("Processamento interrompido")
+
+
+def test_import_reads_csv_rows_lazily(tmp_path, monkeypatch):
+    from werkzeug.datastructures import FileStorage
+    from import_utils import read_tabular_file
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    lines = ["Parceiro;Documento;Cidade;UF;Telefone;Parceiro", ""]
+    for index in range(5000):
+        lines.append(f'"Parceiro; {index}";{index:014d};Campinas;SP;11999999999;ignorado')
+    lines.append("Curta;99999999999999;Campinas")
+    content = ("\ufeff" + "\r\n".join(lines) + "\r\n").encode("utf-8")
+
+    stream = io.BytesIO(content)
+    columns, rows = read_tabular_file(FileStorage(stream, filename="partners.csv"))
+    assert columns == ["Parceiro", "Documento", "Cidade", "UF", "Telefone", "Parceiro.1"]
+    first = next(rows)
+    assert first == {
+        "Parceiro": "Parceiro; 0",
+        "Documento": "00000000000000",
+        "Cidade": "Campinas",
+        "UF": "SP",
+        "Telefone": "11999999999",
+        "Parceiro.1": "ignorado",
+    }
+    assert stream.tell() < len(content) // 2
+    assert list(rows)[-1] == {
+        "Parceiro": "Curta",
+        "Documento": "99999999999999",
+        "Cidade": "Campinas",
+        "UF": "",
+        "Telefone": "",
+        "Parceiro.1": "",
+    }
+    assert not stream.closed
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(content), "partners.csv")},
+            content_type="multipart/form-data",
+        )
+        summary = response.get_json()["data"]
+        assert (summary["total"], summary["created"], summary["error_count"]) == (5001, 5000, 1)
+        # Blank lines are not counted, so the last row is reported as row 5002.
+        assert summary["errors"] == [{"row": 5002, "message": "Campos obrigatórios ausentes: estado, telefone"}]
+
+        broken = "Parceiro,Documento,Cidade,UF,Telefone\nNovo,12345678000199,Santos,SP,1\nA,B,C,D,E,F,G\n"
+        response = client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(broken.encode("utf-8")), "broken.csv")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 400
+        assert response.get_json()["error"]["message"] == "Não foi possível ler o arquivo. Use um CSV ou Excel válido."
+
+    with Session() as session:
+        assert session.query(Partner).count() == 5000
+        assert session.query(Partner).filter_by(cnpj_cpf="12345678000199").count() == 0
+
+
+def test_partner_import_streams_xlsx_rows(tmp_path, monkeypatch):
+    from openpyxl import Workbook
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Parceiros")
+    sheet.append(["Parceiro", "Documento", "Cidade", "UF", "Telefone", "Dia de Pagamento", "Email"])
+    sheet.append(["Numérico", 12345678000199, "Santos", "SP", 11999999999, 5.0, "#N/A"])
+    sheet.append([])
+    sheet.append(["Sem UF", "98765432000155", "Santos", None, "11", 10])
+    workbook.create_sheet("Ignorada").append(["Parceiro"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(buffer.getvalue()), "parceiros.xlsx")},
+            content_type="multipart/form-data",
+        )
+
+    summary = response.get_json()["data"]
+    assert (summary["total"], summary["created"]) == (2, 1)
+    # Blank rows inside a sheet keep counting, as in the spreadsheet itself.
+    assert summary["errors"] == [{"row": 4, "message": "Campos obrigatórios ausentes: estado"}]
+
+    with Session() as session:
+        partner = session.query(Partner).one()
+        assert (partner.cnpj_cpf, partner.telefone) == ("12345678000199", "11999999999")
+        assert partner.dia_pagamento == 5
+        assert not partner.email
+
+
+def test_import_validation_reports_first_error_per_row(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    partners_csv = "\n".join(
+        [
+            "Parceiro;Documento;Cidade;UF;Telefone;Dia de Pagamento;CX Copo;20L",
+            "Sem documento;;Santos;SP;11;5;1;1",
+            "Texto;111;Santos;SPX;11;5;abc;1",
+            "UF longa;222;Santos;SPX;11;5;1;1",
+            "Dia;333;Santos;SP;11;40;1;1",
+            "Dia texto;444;Santos;SP;11;cinco;1;1",
+            ";555;;sp;(11) 4000-0000;;;",
+            "Válido;12.345.678/0001-99;Santos;sp;(11) 4000-0000;+7;1.234,5;1_000",
+        ]
+    )
+    stores_csv = "\n".join(
+        [
+            "Marca;Loja;Local de Entrega;Município;UF;Valor 20L",
+            "Marca A;Loja 1;;;sp;x",
+            "Marca A;Loja 2;;Santos;sp;1",
+            "Marca A;Loja 3;Doca;Santos;sp;2,5",
+        ]
+    )
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(partners_csv.encode("utf-8")), "partners.csv")},
+            content_type="multipart/form-data",
+        )
+        summary = response.get_json()["data"]
+        assert (summary["total"], summary["created"]) == (7, 1)
+        assert summary["errors"] == [
+            {"row": 2, "message": "Informe o CPF ou CNPJ do parceiro."},
+            {"row": 3, "message": "Campo 'cx_copo' deve ser numérico."},
+            {"row": 4, "message": "Informe a UF com dois caracteres."},
+            {"row": 5, "message": "Campo 'dia_pagamento' deve estar entre 1 e 31."},
+            {"row": 6, "message": "Campo 'dia_pagamento' deve ser um número inteiro."},
+            {"row": 7, "message": "Campos obrigatórios ausentes: cidade, parceiro"},
+        ]
+
+        # The same values sent to the single-record endpoint are stored alike.
+        response = client.post(
+            "/api/partners",
+            json={
+                "parceiro": "Válido",
+                "cnpj_cpf": "98.765.432/0001-11",
+                "cidade": "Santos",
+                "estado": "sp",
+                "telefone": "(11) 4000-0000",
+                "dia_pagamento": "+7",
+                "cx_copo": "1.234,5",
+                "vinte_litros": "1_000",
+            },
+        )
+        assert response.status_code == 201
+
+        response = client.post(
+            "/api/brands/import",
+            data={"file": (io.BytesIO(stores_csv.encode("utf-8")), "stores.csv")},
+            content_type="multipart/form-data",
+        )
+        summary = response.get_json()["data"]
+        assert summary["errors"] == [
+            {"row": 2, "message": "Campo 'valor_20l' deve ser numérico."},
+            {"row": 3, "message": "Campos obrigatórios da loja ausentes: local_entrega"},
+        ]
+
+    with Session() as session:
+        imported, created = session.query(Partner).order_by(Partner.id).all()
+        assert (imported.cnpj_cpf, imported.telefone, imported.estado) == ("12345678000199", "1140000000", "SP")
+        assert (imported.dia_pagamento, imported.cx_copo, imported.vinte_litros) == (7, 1234.5, 1000.0)
+        for field in ("parceiro", "cidade", "estado", "telefone", "dia_pagamento", "cx_copo", "vinte_litros", "vasilhame"):
+            assert getattr(imported, field) == getattr(created, field)
+
+        store = session.query(Store).one()
+        assert (store.loja, store.uf, store.valor_20l, store.valor_10l) == ("Loja 3", "SP", 2.5, 0.0)
+
+
+def test_reimport_skips_unchanged_rows_and_files(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    header = "Parceiro,Documento,Cidade,UF,Telefone,Dia de Pagamento"
+    rows = [f"Parceiro {index},{index:014d},Campinas,SP,11999999999,10" for index in range(3)]
+    stores_csv = "Marca,Loja,Local de Entrega,Município,UF,Valor 20L\nMarca A,Loja 1,Doca,Santos,SP,10\n"
+
+    def send(client, url, content, name):
+        return _count_statements(
+            lambda: client.post(
+                url,
+                data={"file": (io.BytesIO(content.encode("utf-8")), name)},
+                content_type="multipart/form-data",
+            )
+        )
+
+    def data_writes(statements):
+        return [
+            statement
+            for statement in statements
+            if statement.startswith(("INSERT INTO partners", "UPDATE partners", "INSERT INTO stores", "UPDATE stores"))
+        ]
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        original = "\n".join([header, *rows]) + "\n"
+        response, _ = send(client, "/api/partners/import", original, "partners.csv")
+        assert response.get_json()["data"]["created"] == 3
+
+        # The same file again: nothing is validated nor written.
+        response, statements = send(client, "/api/partners/import", original, "partners.csv")
+        summary = response.get_json()["data"]
+        assert (summary["created"], summary["updated"], summary["skipped"]) == (0, 0, 3)
+        assert summary["unchanged_file"] is True
+        assert not data_writes(statements)
+
+        # Only the changed row is written.
+        rows[1] = rows[1].replace("Parceiro 1", "Parceiro Um")
+        changed = "\n".join([header, *rows]) + "\n"
+        response, statements = send(client, "/api/partners/import", changed, "partners.csv")
+        summary = response.get_json()["data"]
+        assert (summary["created"], summary["updated"], summary["skipped"]) == (0, 1, 2)
+        assert "unchanged_file" not in summary
+        assert len(data_writes(statements)) == 1
+
+        # A manual edit clears the fingerprint, so the next import restores the row.
+        with Session() as session:
+            edited = session.query(Partner).filter_by(cnpj_cpf="00000000000002").one()
+        response = client.put(f"/api/partners/{edited.id}", json={"cidade": "Santos"})
+        assert response.status_code == 200
+        with Session() as session:
+            assert session.get(Partner, edited.id).content_hash is None
+        response, _ = send(client, "/api/partners/import", changed, "partners.csv")
+        summary = response.get_json()["data"]
+        assert (summary["updated"], summary["skipped"]) == (1, 2)
+        with Session() as session:
+            restored = session.get(Partner, edited.id)
+            assert (restored.cidade, restored.content_hash is not None) == ("Campinas", True)
+
+        # Stores compare fingerprints too, even when the file itself differs.
+        response, _ = send(client, "/api/brands/import", stores_csv, "stores.csv")
+        assert response.get_json()["data"]["created_stores"] == 1
+        response, statements = send(client, "/api/brands/import", stores_csv + "\n", "stores.csv")
+        summary = response.get_json()["data"]
+        assert (summary["updated_stores"], summary["skipped"]) == (0, 1)
+        assert not data_writes(statements)
+
+
+def test_import_preview_reports_diff_without_writing(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        brand = Brand(marca="Agua Azul", cod_disagua="AZ")
+        session.add(brand)
+        session.flush()
+        session.add(Store(marca_id=brand.id, loja="Loja 1", cod_disagua="S-1", local_entrega="Doca", municipio="Santos", uf="SP"))
+        session.add(Partner(cidade="Santos", estado="SP", parceiro="Legado", cnpj_cpf="11111111000111", telefone="1"))
+        session.commit()
+
+    partners_csv = (
+        "Parceiro,Documento,Cidade,UF,Telefone\n"
+        "Legado,11111111000111,Campinas,SP,1\n"
+        "Novo,22222222000122,Santos,sp,2\n"
+        "Sem UF,33333333000133,Santos,SPX,3\n"
+    )
+    stores_csv = (
+        "Marca,Código Marca,Loja,Código Loja,Local de Entrega,Município,UF\n"
+        "Marca Nova,NV,Loja 1,S-1,Doca,Santos,SP\n"
+        "Agua Azul,AZ,Loja 2,,Doca,Santos,SP\n"
+    )
+
+    def preview(client, url, content):
+        return _count_statements(
+            lambda: client.post(
+                f"{url}?preview=1",
+                data={"file": (io.BytesIO(content.encode("utf-8")), "file.csv")},
+                content_type="multipart/form-data",
+            )
+        )
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response, statements = preview(client, "/api/partners/import", partners_csv)
+        assert response.status_code == 200
+        summary = response.get_json()["data"]
+        assert (summary["preview"], summary["created"], summary["updated"], summary["error_count"]) == (True, 1, 1, 1)
+        partners = summary["diff"]["partners"]
+        assert [entry["cnpj_cpf"] for entry in partners["create"]] == ["22222222000122"]
+        assert partners["update"][0]["changes"] == {"cidade": {"from": "Santos", "to": "Campinas"}}
+
+        response, more = preview(client, "/api/brands/import", stores_csv)
+        statements += more
+        summary = response.get_json()["data"]
+        assert (summary["created_brands"], summary["created_stores"], summary["updated_stores"]) == (1, 1, 1)
+        diff = summary["diff"]
+        assert diff["brands"]["create"] == [{"marca": "Marca Nova", "cod_disagua": "NV"}]
+        assert diff["stores"]["create"][0]["marca"] == "Agua Azul"
+        assert diff["stores"]["update"][0]["changes"] == {"marca": {"from": "Agua Azul", "to": "Marca Nova"}}
+
+        assert not [statement for statement in statements if statement.startswith(("INSERT", "UPDATE", "DELETE"))]
+        with Session() as session:
+            assert (session.query(Partner).count(), session.query(Brand).count(), session.query(Store).count()) == (1, 1, 1)
+
+        # The connections go back to the pool writable.
+        response = client.post(
+            "/api/partners/import",
+            data={"file": (io.BytesIO(partners_csv.encode("utf-8")), "file.csv")},
+            content_type="multipart/form-data",
+        )
+        assert response.get_json()["data"]["created"] == 1
+
+
+def test_connections_batch_reports_outcome_per_pair(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        partner = Partner(cidade="Santos", estado="SP", parceiro="Parceiro", cnpj_cpf="1", telefone="1")
+        brand = Brand(marca="Marca")
+        session.add_all([partner, brand])
+        session.flush()
+        stores = [Store(marca_id=brand.id, loja=f"Loja {index}", local_entrega="Doca", municipio="Santos", uf="SP") for index in range(300)]
+        session.add_all(stores)
+        session.commit()
+        partner_id = partner.id
+        store_ids = [store.id for store in stores]
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post("/api/connections", json={"partner_id": partner_id, "store_id": store_ids[0]})
+        assert response.status_code == 201
+        # A repeated pair is reported instead of failing on the unique constraint.
+        response = client.post("/api/connections", json={"partner_id": partner_id, "store_id": store_ids[0]})
+        assert (response.status_code, response.get_json()["error"]["code"]) == (409, "exists")
+
+        pairs = [{"partner_id": partner_id, "store_id": store_id} for store_id in store_ids]
+        pairs += [pairs[1], {"partner_id": 999, "store_id": store_ids[0]}, {"partner_id": partner_id, "store_id": 999}, {"partner_id": "x"}]
+        response, statements = _count_statements(lambda: client.post("/api/connections/batch", json={"connect": pairs}))
+        summary = response.get_json()["data"]
+        assert (summary["created"], summary["deleted"], summary["error_count"]) == (299, 0, 4)
+        statuses = [result["status"] for result in summary["connect"]]
+        assert statuses[:2] == ["exists", "created"]
+        assert statuses[300:] == ["duplicate", "partner_not_found", "store_not_found", "invalid"]
+        assert len([statement for statement in statements if statement.startswith("INSERT INTO connections")]) == 1
+
+        response = client.post(
+            "/api/connections/batch",
+            json={"disconnect": pairs[:2] + [{"partner_id": partner_id, "store_id": 999}]},
+        )
+        summary = response.get_json()["data"]
+        assert [result["status"] for result in summary["disconnect"]] == ["deleted", "deleted", "not_found"]
+
+        response = client.post("/api/connections/batch", json={"connect": {"partner_id": partner_id}})
+        assert response.status_code == 400
+
+    with Session() as session:
+        assert session.execute(text("SELECT COUNT(*) FROM connections")).scalar() == 298
+
+
+def test_report_entries_ingestion_from_csv_jsonl_and_cli(tmp_path, monkeypatch):
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        brand = Brand(marca="Agua Azul")
+        session.add(brand)
+        session.flush()
+        session.add(Store(marca_id=brand.id, loja="Centro", local_entrega="Doca", municipio="Santos", uf="SP"))
+        session.commit()
+
+    csv_content = (
+        "marca;loja;data;valor_20l;valor_10l\n"
+        "agua azul;CENTRO;2024-01-05;1.234,50;2\n"
+        "Agua Azul;Centro;05/01/2024;10;\n"
+        "\n"
+        "Outra;Centro;2024-01-05;1;1\n"
+        "Agua Azul;Norte;2024-01-05;1;1\n"
+        "Agua Azul;Centro;ontem;1;1\n"
+        "Agua Azul;Centro;2024-01-06;abc;1\n"
+    )
+    jsonl_content = (
+        '{"marca": "Agua Azul", "loja": "Centro", "data": "2024-01-06", "valor_20l": 5.5}\n'
+        "nada\n"
+        '{"marca": "Agua Azul", "data": "2024-01-06"}\n'
+    )
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+        response = client.post(
+            "/api/report-data/import",
+            data={"file": (io.BytesIO(csv_content.encode("utf-8")), "entradas.csv")},
+            content_type="multipart/form-data",
+        )
+        summary = response.get_json()["data"]
+        assert (summary["total"], summary["inserted"], summary["rejected"]) == (6, 2, 4)
+        assert summary["rejections"] == [
+            {"line": 5, "message": "Marca 'Outra' não cadastrada."},
+            {"line": 6, "message": "Loja 'Norte' não cadastrada para a marca 'Agua Azul'."},
+            {"line": 7, "message": "Campo 'data' deve estar no formato AAAA-MM-DD ou DD/MM/AAAA."},
+            {"line": 8, "message": "Campo 'valor_20l' deve ser numérico."},
+        ]
+        assert summary["rows_per_second"] > 0
+
+        response = client.post(
+            "/api/report-data/import",
+            data={"file": (io.BytesIO(jsonl_content.encode("utf-8")), "entradas.jsonl")},
+            content_type="multipart/form-data",
+        )
+        summary = response.get_json()["data"]
+        assert (summary["inserted"], [item["line"] for item in summary["rejections"]]) == (1, [2, 3])
+
+        response = client.post(
+            "/api/report-data/import",
+            data={"file": (io.BytesIO(b"a,b\n"), "entradas.xlsx")},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 400
+
+        groups = client.get("/api/report-data/summary?group_by=day").get_json()["data"]
+        assert [(group["day"], group["count"], group["valor_20l"]["sum"]) for group in groups] == [
+            ("2024-01-05", 2, 1244.5),
+            ("2024-01-06", 1, 5.5),
+        ]
+
+    source = tmp_path / "entradas.jsonl"
+    source.write_text(jsonl_content, encoding="utf-8")
+    result = flask_app.test_cli_runner().invoke(args=["import-report-entries", str(source)])
+    assert result.exit_code == 0
+    assert "1 registros gravados e 2 rejeitados de 3 linhas" in result.output
+    with Session() as session:
+        stored = session.query(ReportEntry).filter_by(loja="Centro").count()
+        assert stored == 4
+
+
+def test_report_entries_ingestion_uses_one_decimal_separator_per_file(tmp_path, monkeypatch):
+    from datetime import date
+    from export_utils import ExportManager
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(tmp_path / "exports"))
+    Session = _get_session(db_path)
+
+    exported = [(12.345, 0.0), (999.125, 1.5), (100.0, 1234.5)]
+    with Session() as session:
+        brand = Brand(marca="Agua Azul")
+        session.add(brand)
+        session.flush()
+        session.add(Store(marca_id=brand.id, loja="Centro", local_entrega="Doca", municipio="Santos", uf="SP"))
+        session.add_all(
+            [
+                ReportEntry(marca="Agua Azul", loja="Centro", data=date(2024, 1, day), valor_20l=v20, valor_10l=v10)
+                for day, (v20, v10) in enumerate(exported, start=1)
+            ]
+        )
+        session.commit()
+
+    def post(content, filename="entradas.csv", **fields):
+        return client.post(
+            "/api/report-data/import",
+            data={"file": (io.BytesIO(content), filename), **fields},
+            content_type="multipart/form-data",
+        )
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        # The CSV export is comma separated with a decimal point: it comes back unchanged.
+        export = client.get("/api/report-data/export?format=csv")
+        assert export.status_code == 200
+        assert post(export.get_data(), "relatorio.csv").get_json()["data"]["inserted"] == 3
+
+        # Comma separated Brazilian values need ``decimal=,``; nothing is guessed per value.
+        brazilian = 'marca,loja,data,valor_20l\nAgua Azul,Centro,2024-02-01,"1.234,56"\n'.encode("utf-8")
+        rejected = post(brazilian).get_json()["data"]
+        assert rejected["rejections"] == [{"line": 2, "message": "Campo 'valor_20l' deve ser numérico."}]
+        assert post(brazilian, decimal=",").get_json()["data"]["inserted"] == 1
+
+        assert post(brazilian, decimal="x").status_code == 400
+
+    source = tmp_path / "entradas.csv"
+    source.write_text("marca;loja;data;valor_20l\nAgua Azul;Centro;2024-03-01;12.345\n", encoding="utf-8")
+    result = flask_app.test_cli_runner().invoke(args=["import-report-entries", str(source), "--decimal", "."])
+    assert result.exit_code == 0
+
+    with Session() as session:
+        values = [(row.valor_20l, row.valor_10l) for row in session.query(ReportEntry).order_by(ReportEntry.id)]
+    assert values == exported + exported + [(1234.56, 0.0), (12.345, 0.0)]
+
+
+def test_report_export_streams_rows_into_xlsx(tmp_path, monkeypatch):
+    from datetime import date
+    from openpyxl import load_workbook
+    from export_utils import ExportManager
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    export_dir = tmp_path / "exports"
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(export_dir))
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add_all(
+            [
+                ReportEntry(marca="A", loja="L1", data=date(2024, 1, 3), valor_20l=10, valor_10l=1.5),
+                ReportEntry(marca="A", loja="L<2>", data=date(2024, 2, 1), valor_20l=5, valor_vasilhame=2),
+                ReportEntry(marca="B", loja="L9", data=date(2024, 2, 15), valor_20l=7),
+            ]
+        )
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        response = client.get("/api/report-data/export?format=excel&marca=A")
+        assert response.status_code == 200
+        assert response.mimetype == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        content = response.get_data()
+
+        invalid = client.get("/api/report-data/export?format=excel&startDate=31/01/2024")
+        assert invalid.status_code == 400
+        assert invalid.get_json()["error"]["message"] == "Data inválida. Use o formato AAAA-MM-DD."
+
+    sheet = load_workbook(io.BytesIO(content), read_only=True).worksheets[0]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert sheet.title == "Relatório"
+    assert rows == [
+        ("Marca", "Loja", "Data", "Valor 20L", "Valor 10L", "Valor 1500ML", "Valor CX Copo", "Valor Vasilhame", "Total"),
+        ("A", "L1", "2024-01-03", 10, 1.5, 0, 0, 0, 11.5),
+        ("A", "L<2>", "2024-02-01", 5, 0, 0, 0, 2, 7),
+    ]
+    # The file is written next to the other exports, never half-written.
+    assert [path.suffix for path in export_dir.iterdir()] == [".xlsx"]
+
+
+def test_exports_with_the_same_name_write_separate_partial_files(tmp_path):
+    from openpyxl import load_workbook
+    from export_utils import ExportManager
+
+    manager = ExportManager(tmp_path)
+
+    def rows():
+        yield {"Valor": 1}
+        # A second export of the same file finishes while the first one runs.
+        manager.export([{"Valor": 2}], "excel", filename="relatorio")
+        yield {"Valor": 3}
+
+    result = manager.export(rows(), "excel", filename="relatorio")
+    sheet = load_workbook(result.path, read_only=True).worksheets[0]
+    assert list(sheet.iter_rows(values_only=True)) == [("Valor",), (1,), (3,)]
+    assert [path.name for path in tmp_path.iterdir()] == ["relatorio.xlsx"]
+
+
+def test_report_export_streams_csv_jsonl_and_writes_parquet(tmp_path, monkeypatch):
+    import csv
+    import json
+    from datetime import date
+    from export_utils import ExportManager
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    export_dir = tmp_path / "exports"
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(export_dir))
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add_all(
+            [
+                ReportEntry(marca="A", loja="Loja, Centro", data=date(2024, 1, 3), valor_20l=10, valor_10l=1.5),
+                ReportEntry(marca="A", loja="Lojão", data=date(2024, 2, 1), valor_20l=5, valor_vasilhame=2),
+                ReportEntry(marca="B", loja="L9", data=date(2024, 2, 15), valor_20l=7),
+            ]
+        )
+        session.commit()
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        response = client.get("/api/report-data/export?format=csv&marca=A")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "text/csv"
+        assert response.headers["Content-Disposition"].startswith("attachment; filename=relatorio_")
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows[0] == ["Marca", "Loja", "Data", "Valor 20L", "Valor 10L", "Valor 1500ML", "Valor CX Copo", "Valor Vasilhame", "Total"]
+        assert rows[1:] == [
+            ["A", "Loja, Centro", "2024-01-03", "10.0", "1.5", "0.0", "0.0", "0.0", "11.5"],
+            ["A", "Lojão", "2024-02-01", "5.0", "0.0", "0.0", "0.0", "2.0", "7.0"],
+        ]
+
+        response = client.get("/api/report-data/export?format=jsonl&startDate=2024-02-10")
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert lines == [
+            {
+                "Marca": "B",
+                "Loja": "L9",
+                "Data": "2024-02-15",
+                "Valor 20L": 7.0,
+                "Valor 10L": 0.0,
+                "Valor 1500ML": 0.0,
+                "Valor CX Copo": 0.0,
+                "Valor Vasilhame": 0.0,
+                "Total": 7.0,
+            }
+        ]
+
+        invalid = client.get("/api/report-data/export?format=xml")
+        assert invalid.status_code == 400
+
+        # The streamed files are kept next to the other exports once complete.
+        assert sorted(path.suffix for path in export_dir.iterdir()) == [".csv", ".jsonl"]
+
+        pq = pytest.importorskip("pyarrow.parquet")
+        response = client.get("/api/report-data/export?format=parquet")
+        assert response.status_code == 200
+        table = pq.read_table(io.BytesIO(response.get_data()))
+        assert table.column_names[:3] == ["Marca", "Loja", "Data"]
+        assert table.column("Loja").to_pylist() == ["Loja, Centro", "Lojão", "L9"]
+        assert table.column("Total").to_pylist() == [11.5, 7.0, 7.0]
+
+
+def test_report_pdf_export_is_rendered_per_page_in_worker_process(tmp_path, monkeypatch):
+    import re
+    from datetime import date
+    from export_utils import ExportManager
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    export_dir = tmp_path / "exports"
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(export_dir))
+    Session = _get_session(db_path)
+
+    with Session() as session:
+        session.add_all(
+            ReportEntry(marca="A" if index < 65 else "B", loja=f"L{index}", data=date(2024, 1, 1), valor_20l=index)
+            for index in range(70)
+        )
+        session.commit()
+
+    renderer = flask_app.extensions["report_renderer"]
+    try:
+        with flask_app.test_client() as client:
+            _api_login(client)
+
+            response = client.get("/api/report-data/export?format=pdf&marca=A")
+            assert response.status_code == 200
+            assert response.mimetype == "application/pdf"
+            content = response.get_data()
+            response.close()
+        # The layout ran in the renderer's worker processes.
+        assert renderer._executor is not None
+    finally:
+        renderer.shutdown()
+
+    assert content.startswith(b"%PDF")
+    # 65 rows at 30 rows per page.
+    assert re.findall(rb"/Count (\d+)", content) == [b"3"]
+    assert [path.suffix for path in export_dir.iterdir()] == [".pdf"]
+
+
+def test_report_export_is_cached_by_filters_and_data_version(tmp_path, monkeypatch):
+    import time
+    from datetime import date
+    from export_cache import ExportCache
+    from export_utils import ExportManager
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    export_dir = tmp_path / "exports"
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(export_dir))
+    Session = _get_session(db_path)
+
+    def add_entry(marca, valor):
+        with Session() as session:
+            session.add(ReportEntry(marca=marca, loja="L1", data=date(2024, 1, 1), valor_20l=valor))
+            session.execute(text("UPDATE data_versions SET version = version + 1 WHERE table_name = 'report_entries'"))
+            session.commit()
+
+    add_entry("A", 1)
+
+    with flask_app.test_client() as client:
+        _api_login(client)
+
+        first = client.get("/api/report-data/export?format=csv&marca=A")
+        first_body = first.get_data()
+        assert first.headers["X-Export-Cache"] == "miss"
+
+        again = client.get("/api/report-data/export?format=csv&marca=A")
+        assert again.headers["X-Export-Cache"] == "hit"
+        assert again.get_data() == first_body
+        again.close()
+
+        # Other filters or formats are separate entries.
+        for query in ("format=csv&marca=B", "format=jsonl&marca=A"):
+            response = client.get(f"/api/report-data/export?{query}")
+            assert response.headers["X-Export-Cache"] == "miss"
+            response.get_data()
+
+        add_entry("A", 2)
+        changed = client.get("/api/report-data/export?format=csv&marca=A")
+        assert changed.headers["X-Export-Cache"] == "miss"
+        assert changed.get_data().count(b"\n") == 3
+
+    assert len([path for path in export_dir.iterdir() if path.suffix == ".csv"]) == 3
+
+    # Eviction: expired files first, then the least recently used ones.
+    now = time.time()
+    for name, size, age in (("old.csv", 10, 7200), ("lru.csv", 100, 600), ("recent.csv", 100, 300), ("busy.csv.1.part", 500, 5)):
+        path = export_dir / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (now - age, now - age))
+    for path in export_dir.iterdir():
+        if path.name.startswith("relatorio_"):
+            path.unlink()
+
+    removed = ExportCache(export_dir, max_bytes=650, max_age=3600).evict(now)
+    assert removed == 2
+    assert sorted(path.name for path in export_dir.iterdir()) == ["busy.csv.1.part", "recent.csv"]
+
+    # A fresh export is kept even while the directory is over the limit: it
+    # may not have been opened for its download yet.
+    for name, size, age in (("older.csv", 100, 120), ("fresh.csv", 800, 1)):
+        path = export_dir / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (now - age, now - age))
+    assert ExportCache(export_dir, max_bytes=650, max_age=3600).evict(now) == 2
+    assert sorted(path.name for path in export_dir.iterdir()) == ["busy.csv.1.part", "fresh.csv"]
+
+
+def test_report_export_jobs_report_progress_and_serve_the_file(tmp_path, monkeypatch):
+    from datetime import date
+    from export_utils import ExportManager
+    from openpyxl import load_workbook
+    from werkzeug.security import generate_password_hash
+
+    flask_app, db_path = _create_test_app(tmp_path, monkeypatch)
+    export_dir = tmp_path / "exports"
+    monkeypatch.setattr(app, "ExportManager", lambda: ExportManager(export_dir))
+    Session = _get_session(db_path)
+    runner = flask_app.extensions["export_job_runner"]
+
+    with Session() as session:
+        session.add_all(
+            ReportEntry(marca="A" if index % 2 else "B", loja=f"L{index}", data=date(2024, 1, 1), valor_20l=index)
+            for index in range(2500)
+        )
+        session.commit()
+
+    try:
+        with flask_app.test_client() as client:
+            _api_login(client)
+            created = client.post("/api/report-data/export-jobs", json={"format": "excel", "marca": "A"})
+            assert created.status_code == 202
+            job = created.get_json()["data"]
+            assert (job["kind"], job["status"]) == ("report_export", "queued")
+            pdf = client.post("/api/report-data/export-jobs", json={"format": "pdf"}).get_json()["data"]
+
+            for payload in ({"format": "docx"}, {"startDate": "ontem"}, ["excel"], {"format": 1}, {"endDate": 20240101}, {"marca": ["A"]}):
+                assert client.post("/api/report-data/export-jobs", json=payload).status_code == 400
+            invalid_date = client.post("/api/report-data/export-jobs", json={"startDate": "ontem"}).get_json()
+            assert invalid_date["error"]["message"] == "Data inválida. Use o formato AAAA-MM-DD."
+
+            runner.shutdown(wait=True)
+
+            finished = client.get(f"/api/report-data/export-jobs/{job['id']}").get_json()["data"]
+            assert (finished["status"], finished["phase"]) == ("succeeded", "done")
+            assert (finished["total_rows"], finished["processed_rows"]) == (1250, 1250)
+            assert finished["result"]["download_url"] == f"/api/report-data/export-jobs/{job['id']}/download"
+
+            download = client.get(finished["result"]["download_url"])
+            assert download.status_code == 200
+            sheet = load_workbook(io.BytesIO(download.get_data()), read_only=True).active
+            assert sum(1 for _ in sheet.iter_rows()) == 1251
+
+            # PDF progress is reported from the renderer's worker process.
+            rendered = client.get(f"/api/report-data/export-jobs/{pdf['id']}").get_json()["data"]
+            assert (rendered["status"], rendered["total_rows"], rendered["processed_rows"]) == ("succeeded", 2500, 2500)
+            assert client.get(f"/api/report-data/export-jobs/{pdf['id']}/download").get_data().startswith(b"%PDF")
+
+            for path in export_dir.iterdir():
+                path.unlink()
+            assert client.get(finished["result"]["download_url"]).status_code == 410
+
+        # Other users neither see nor download the jobs.
+        with Session() as session:
+            session.add(User(username="outro", password_hash=generate_password_hash("secret1"), role="operator"))
+            session.commit()
+        other_client = flask_app.test_client()
+        _api_login(other_client, "outro", "secret1")
+        assert other_client.get(f"/api/report-data/export-jobs/{job['id']}").status_code == 404
+        assert other_client.get(f"/api/report-data/export-jobs/{job['id']}/download").status_code == 404
+    finally:
+        flask_app.extensions["report_renderer"].shutdown()
+
+    # Each user has a bounded number of exports queued or running.
+    restarted = app.create_app()
+    restarted.config["TESTING"] = True
+    with Session() as session:
+        assert session.execute(text("SELECT status FROM background_jobs WHERE id = :id"), {"id": job["id"]}).scalar() == "succeeded"
+        session.execute(text("UPDATE background_jobs SET status = 'running' WHERE kind = 'report_export'"))
+        session.commit()
+    with restarted.test_client() as client:
+        _api_login(client)
+        limited = client.post("/api/report-data/export-jobs", json={"format": "csv"})
+        assert limited.status_code == 429
+        assert limited.get_json()["error"]["code"] == "too_many_jobs"
+    restarted.extensions["export_job_runner"].shutdown()